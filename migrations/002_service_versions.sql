@@ -0,0 +1,10 @@
+-- Migration 002: Per-service version counters
+CREATE TABLE IF NOT EXISTS service_versions (
+    service VARCHAR(255) PRIMARY KEY,
+    last_version INTEGER NOT NULL
+);
+
+-- Backfill counters from existing configurations
+INSERT INTO service_versions (service, last_version)
+SELECT service, MAX(version) FROM configurations GROUP BY service
+ON CONFLICT (service) DO UPDATE SET last_version = GREATEST(service_versions.last_version, EXCLUDED.last_version);
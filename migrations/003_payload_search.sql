@@ -0,0 +1,5 @@
+-- Migration 003: Payload containment search
+-- migration: no-transaction
+-- Built CONCURRENTLY so writes to configurations are not blocked while the whole history is indexed
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_configurations_payload_path_ops
+    ON configurations USING GIN (payload jsonb_path_ops);
@@ -0,0 +1,15 @@
+-- Migration 004: Content-hash deduplication of payloads
+ALTER TABLE configurations ADD COLUMN IF NOT EXISTS content_hash CHAR(64);
+
+-- Shared content-addressed payload bodies; configurations.payload is NULL for such rows
+CREATE TABLE IF NOT EXISTS config_payloads (
+    hash CHAR(64) PRIMARY KEY,
+    payload JSONB NOT NULL,
+    created_at TIMESTAMP DEFAULT NOW()
+);
+
+ALTER TABLE configurations ALTER COLUMN payload DROP NOT NULL;
+
+CREATE INDEX IF NOT EXISTS idx_configurations_content_hash ON configurations(content_hash);
+CREATE INDEX IF NOT EXISTS idx_config_payloads_payload_path_ops
+    ON config_payloads USING GIN (payload jsonb_path_ops);
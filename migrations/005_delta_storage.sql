@@ -0,0 +1,4 @@
+-- Migration 005: Delta-compressed version storage
+-- A row with delta set stores the operations that turn version base_version into this version
+ALTER TABLE configurations ADD COLUMN IF NOT EXISTS delta JSONB;
+ALTER TABLE configurations ADD COLUMN IF NOT EXISTS base_version INTEGER;
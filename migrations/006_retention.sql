@@ -0,0 +1,19 @@
+-- Migration 006: Retention policies and pinned versions
+-- NULL means the service inherits the default from settings, 0 means unlimited
+CREATE TABLE IF NOT EXISTS retention_policies (
+    service VARCHAR(255) PRIMARY KEY,
+    keep_last INTEGER,
+    max_age_days INTEGER,
+    updated_at TIMESTAMP DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS pinned_versions (
+    service VARCHAR(255) NOT NULL,
+    version INTEGER NOT NULL,
+    created_at TIMESTAMP DEFAULT NOW(),
+    PRIMARY KEY (service, version)
+);
+
+CREATE INDEX IF NOT EXISTS idx_configurations_service_base_version
+    ON configurations(service, base_version) WHERE base_version IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_config_payloads_created_at ON config_payloads(created_at);
@@ -0,0 +1,3 @@
+-- Migration 007: Drop the redundant latest-version index
+-- The primary key on service_versions(service) already serves these lookups
+DROP INDEX IF EXISTS idx_service_versions_latest;
@@ -4,25 +4,113 @@ from twisted.internet import defer
 from twisted.web.resource import Resource
 from twisted.web.server import NOT_DONE_YET
 
+from src.utils.cache import LRUCache
+from src.utils.workers import worker_pool
+from src.utils.compression import compress, negotiate_encoding
+from src.config.settings import settings
 from src.validators.api_validator import APIValidator
+from src.validators.config_validator import ConfigValidator
 from src.services.configuration_service import ConfigService
+from src.services.change_stream_service import ChangeStreamService
+from src.services.import_service import ImportService
+from src.services.export_service import ConfigExportProducer
+from src.services.retention_service import RetentionService
+
+
+response_cache = LRUCache(settings.RESPONSE_CACHE_SIZE)
+
+
+def encode_json(data, pretty=False):
+    return json.dumps(data, indent=2 if pretty else None, ensure_ascii=False).encode('utf-8')
+
+
+def encode_response(data, pretty=False, encoding=None):
+    if isinstance(data, bytes):
+        body = encode_json(json.loads(data), True) if pretty else data
+    else:
+        body = encode_json(data, pretty)
+    if encoding and len(body) >= settings.RESPONSE_COMPRESSION_MIN_SIZE:
+        return compress(body, encoding), encoding
+    return body, None
+
+
+def representation_etag(etag, pretty=False, content_encoding=None):
+    # Сильный валидатор различает каждое представление: форматирование и кодирование меняют байты тела
+    suffix = ('-pretty' if pretty else '') + (f'-{content_encoding}' if content_encoding else '')
+    return f'{etag[:-1]}{suffix}"' if suffix else etag
 
 
 class BaseHandler(Resource):
-    def __init__(self, db_pool):
+    def __init__(self, db_pool, read_pool=None):
         Resource.__init__(self)
-        self.config_service = ConfigService(db_pool)
+        self.config_service = ConfigService(db_pool, read_pool)
 
-    def send_json(self, request, data, status=200):
+    def send_json(self, request, data, status=200, headers=None):
+        body, content_encoding = encode_response(data, self.wants_pretty(request), self.accepted_encoding(request))
+        self.send_body(request, body, status, headers, content_encoding)
+
+    @defer.inlineCallbacks
+    def send_large_json(self, request, data, size_hint, status=200, headers=None, cache_key=None, etag=None):
+        pretty = self.wants_pretty(request)
+        encoding = self.accepted_encoding(request)
+        key = (cache_key, pretty, encoding) if cache_key is not None else None
+
+        response = response_cache.get(key) if key is not None else None
+        if response is None:
+            response = yield worker_pool.run_in_thread(encode_response, data, pretty, encoding, size=size_hint)
+            if key is not None:
+                response_cache.set(key, response)
+
+        body, content_encoding = response
+        if etag is not None:
+            headers = dict(headers or {})
+            headers[b'ETag'] = representation_etag(etag, pretty, content_encoding).encode('utf-8')
+        self.send_body(request, body, status, headers, content_encoding)
+
+    def send_body(self, request, body, status=200, headers=None, content_encoding=None):
+        if request.finished:
+            return
         request.setResponseCode(status)
         request.setHeader(b'Content-Type', b'application/json')
-        response = json.dumps(data, indent=2, ensure_ascii=False).encode('utf-8')
-        request.write(response)
+        request.setHeader(b'Vary', b'Accept-Encoding')
+        if content_encoding:
+            request.setHeader(b'Content-Encoding', content_encoding.encode('ascii'))
+        for name, value in (headers or {}).items():
+            request.setHeader(name, value)
+        request.write(body)
         request.finish()
 
+    def wants_pretty(self, request):
+        return APIValidator.validate_flag_param(self.get_query_param(request, 'pretty'))
+
+    def accepted_encoding(self, request):
+        return negotiate_encoding(request.getHeader(b'accept-encoding'))
+
     def send_error(self, request, message, status=400):
         self.send_json(request, {'error': message}, status)
 
+    def send_not_modified(self, request, etag):
+        request.setResponseCode(304)
+        request.setHeader(b'ETag', etag.encode('utf-8'))
+        request.finish()
+
+    def etag_matches(self, request, etag):
+        # Возвращает совпавший тег представления, чтобы 304 повторил его
+        header = request.getHeader(b'if-none-match')
+        if not header:
+            return None
+        pretty = self.wants_pretty(request)
+        # Тело сжимается только начиная с порога размера, поэтому подходят оба варианта
+        variants = [representation_etag(etag, pretty, encoding)
+                    for encoding in (self.accepted_encoding(request), None)]
+        candidates = [tag.strip() for tag in header.decode('latin-1').split(',')]
+        if '*' in candidates:
+            return variants[-1]
+        for tag in candidates:
+            if tag.removeprefix('W/') in variants:
+                return tag.removeprefix('W/')
+        return None
+
     def get_query_param(self, request, name):
         args = request.args
         if name.encode() in args:
@@ -36,9 +124,25 @@ class BaseHandler(Resource):
 
 
 class ConfigHandler(BaseHandler):
+    def __init__(self, db_pool, read_pool=None):
+        BaseHandler.__init__(self, db_pool, read_pool)
+        self.change_stream = ChangeStreamService(self.config_service)
+        self.import_service = ImportService(
+            self.config_service, settings.IMPORT_CHUNK_SIZE, settings.IMPORT_BATCH_SIZE
+        )
+        self.retention = RetentionService(self.config_service)
+
     def getChild(self, path, request):
+        if path == b'_batch':
+            return BatchHandler(self.config_service)
+        if path == b'_import':
+            return ImportHandler(self.import_service)
+        if path == b'_export':
+            return ExportHandler(self.config_service)
+        if path == b'_search':
+            return SearchHandler(self.config_service)
         if path:
-            return ServiceHandler(self.config_service, path.decode('utf-8'))
+            return ServiceHandler(self.config_service, path.decode('utf-8'), self.change_stream)
         self.send_error(request, "Service name is required")
         return self
 
@@ -46,15 +150,225 @@ class ConfigHandler(BaseHandler):
         return b''
 
 
+class StatsHandler(BaseHandler):
+
+    def __init__(self, config_handler):
+        Resource.__init__(self)
+        self.config_handler = config_handler
+
+    def render_GET(self, request):
+        stats = self.config_handler.config_service.stats()
+        stats['change_stream'] = self.config_handler.change_stream.stats()
+        stats['retention'] = self.config_handler.retention.stats()
+        stats['response_cache'] = response_cache.stats()
+        self.send_json(request, stats)
+        return NOT_DONE_YET
+
+
+class BatchHandler(BaseHandler):
+
+    def __init__(self, config_service):
+        Resource.__init__(self)
+        self.config_service = config_service
+
+    def render_POST(self, request):
+        d = self._get_batch(request)
+        d.addErrback(self.handle_error, request)
+        return NOT_DONE_YET
+
+    @defer.inlineCallbacks
+    def _get_batch(self, request):
+        try:
+            content = request.content.read()
+            valid, error = APIValidator.validate_content_length(content)
+            if not valid:
+                self.send_error(request, error, 413)
+                return
+
+            try:
+                data = json.loads(content.decode('utf-8')) if content else None
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                self.send_error(request, "Request body must be valid JSON", 400)
+                return
+
+            valid, result = APIValidator.validate_batch_request(data, settings.BATCH_MAX_SERVICES)
+            if not valid:
+                self.send_error(request, result, 400)
+                return
+
+            configs = yield self.config_service.get_raw_configs(result)
+
+            # Собираем ответ из готовых байтов, не разбирая payload
+            parts = []
+            size = 0
+            for service, _ in result:
+                entry = configs[service]
+                key = json.dumps(service, ensure_ascii=False).encode('utf-8')
+                if 'error' in entry:
+                    value = json.dumps(entry, ensure_ascii=False).encode('utf-8')
+                else:
+                    value = b'{"version": ' + str(entry['version']).encode('ascii') + b', "config": ' + entry['body'] + b'}'
+                size += len(value)
+                parts.append(key + b': ' + value)
+
+            yield self.send_large_json(request, b'{' + b', '.join(parts) + b'}', size)
+
+        except ValueError as e:
+            self.send_error(request, str(e), 400)
+        except Exception as e:
+            log.err(f"Error getting config batch: {e}")
+            self.send_error(request, "Internal server error", 500)
+
+
+class ImportHandler(BaseHandler):
+
+    def __init__(self, import_service):
+        Resource.__init__(self)
+        self.import_service = import_service
+
+    def render_POST(self, request):
+        d = self._import(request)
+        d.addErrback(self.handle_error, request)
+        return NOT_DONE_YET
+
+    @defer.inlineCallbacks
+    def _import(self, request):
+        try:
+            content = request.content.read()
+            if not content:
+                self.send_error(request, "Request body is required", 400)
+                return
+
+            valid, error = APIValidator.validate_content_length(content, settings.IMPORT_MAX_BYTES)
+            if not valid:
+                self.send_error(request, error, 413)
+                return
+
+            content_type = request.getHeader(b'content-type')
+            report = yield self.import_service.import_stream(
+                content, self.get_query_param(request, 'format'),
+                content_type.decode('latin-1').lower() if content_type else None
+            )
+            # Отчёт содержит строку на каждую запись, поэтому его размер растёт вместе с телом запроса
+            yield self.send_large_json(request, report, len(content))
+
+        except (ValueError, UnicodeDecodeError) as e:
+            self.send_error(request, str(e), 400)
+        except Exception as e:
+            log.err(f"Error importing configurations: {e}")
+            self.send_error(request, "Internal server error", 500)
+
+
+class SearchHandler(BaseHandler):
+
+    def __init__(self, config_service):
+        Resource.__init__(self)
+        self.config_service = config_service
+
+    def render_GET(self, request):
+        d = self._search(request)
+        d.addErrback(self.handle_error, request)
+        return NOT_DONE_YET
+
+    @defer.inlineCallbacks
+    def _search(self, request):
+        try:
+            contains_param = self.get_query_param(request, 'contains')
+            if not contains_param:
+                self.send_error(request, "Query parameter 'contains' is required", 400)
+                return
+
+            try:
+                contains = json.loads(contains_param)
+            except json.JSONDecodeError:
+                self.send_error(request, "'contains' must be valid JSON", 400)
+                return
+
+            valid, limit = APIValidator.validate_limit_param(
+                self.get_query_param(request, 'limit'), 100, settings.SEARCH_MAX_LIMIT
+            )
+            if not valid:
+                self.send_error(request, f"Invalid limit (1-{settings.SEARCH_MAX_LIMIT})", 400)
+                return
+
+            include_payload = APIValidator.validate_flag_param(self.get_query_param(request, 'include_payload'))
+
+            matches = yield self.config_service.search_configs(contains, limit, include_payload)
+
+            # Payload вставляется готовыми байтами, без повторной сериализации
+            parts = []
+            for match in matches:
+                item = b'{"service": ' + json.dumps(match['service']).encode('utf-8') + \
+                       b', "version": ' + str(match['version']).encode('ascii')
+                if include_payload:
+                    item += b', "payload": ' + match['payload_bytes']
+                parts.append(item + b'}')
+            body = b'[' + b', '.join(parts) + b']'
+            yield self.send_large_json(request, body, len(body))
+
+        except ValueError as e:
+            self.send_error(request, str(e), 400)
+        except Exception as e:
+            log.err(f"Error searching configurations: {e}")
+            self.send_error(request, "Internal server error", 500)
+
+
+class ExportHandler(BaseHandler):
+
+    def __init__(self, config_service, service_name=None):
+        Resource.__init__(self)
+        self.config_service = config_service
+        self.service_name = service_name
+
+    def render_GET(self, request):
+        if self.service_name is not None:
+            valid, error = ConfigValidator.validate_service_name(self.service_name)
+            if not valid:
+                self.send_error(request, error, 400)
+                return NOT_DONE_YET
+
+        request.setHeader(b'Content-Type', b'application/x-ndjson; charset=utf-8')
+        producer = ConfigExportProducer(
+            self.config_service.repository.open_connection, request, self.service_name, settings.EXPORT_CHUNK_SIZE
+        )
+        request.notifyFinish().addErrback(lambda failure: producer.stopProducing())
+        d = self.config_service.repository.export_slots.run(producer.start)
+        d.addCallbacks(self._finished, self._failed, callbackArgs=(request, producer), errbackArgs=(request,))
+        return NOT_DONE_YET
+
+    def _finished(self, rows, request, producer):
+        if not producer.stopped and not request.finished:
+            request.finish()
+
+    def _failed(self, failure, request):
+        log.err(failure, f"Error exporting configurations for {self.service_name or 'all services'}")
+        if request.finished:
+            return
+        if not request.startedWriting:
+            self.send_error(request, "Internal server error", 500)
+        else:
+            # Обрываем соединение, чтобы клиент не принял усечённый экспорт за полный
+            request.loseConnection()
+
+
 class ServiceHandler(BaseHandler):
-    def __init__(self, config_service, service_name):
+    def __init__(self, config_service, service_name, change_stream=None):
         Resource.__init__(self)
         self.config_service = config_service
         self.service_name = service_name
+        self.change_stream = change_stream
 
     def getChild(self, path, request):
         if path == b'history':
             return HistoryHandler(self.config_service, self.service_name)
+        if path == b'export':
+            return ExportHandler(self.config_service, self.service_name)
+        if path == b'diff':
+            return DiffHandler(self.config_service, self.service_name)
+        if path == b'retention':
+            return RetentionHandler(self.config_service, self.service_name)
+        if path == b'stream' and self.change_stream is not None:
+            return StreamHandler(self.config_service, self.service_name, self.change_stream)
         return Resource.getChild(self, path, request)
 
     def render_POST(self, request):
@@ -77,7 +391,8 @@ class ServiceHandler(BaseHandler):
 
             yaml_content = content.decode('utf-8')
             result = yield self.config_service.save_config(self.service_name, yaml_content)
-            self.send_json(request, result, 201)
+            # Совпавший payload не создаёт версию: 200 с существующей версией вместо 201 Created
+            self.send_json(request, result, 200 if result['status'] == 'unchanged' else 201)
 
         except ValueError as e:
             error_msg = str(e)
@@ -114,6 +429,19 @@ class ServiceHandler(BaseHandler):
 
             use_template = APIValidator.validate_template_param(template_param)
 
+            valid, min_version = APIValidator.validate_version_param(self.get_query_param(request, 'min_version'))
+            if not valid:
+                self.send_error(request, "Invalid min_version", 400)
+                return
+            # Только этот запрос читает с основного сервера, если закешированная версия старше min_version
+            primary = min_version is not None and version is None and \
+                self.config_service.needs_primary(self.service_name, min_version)
+
+            valid, path = APIValidator.validate_path_param(self.get_query_param(request, 'path'))
+            if not valid:
+                self.send_error(request, "Invalid path, expected dotted path or JSON Pointer", 400)
+                return
+
             template_vars = {}
             if use_template:
                 try:
@@ -125,15 +453,42 @@ class ServiceHandler(BaseHandler):
                 except (json.JSONDecodeError, UnicodeDecodeError):
                     template_vars = {}
 
-            config = yield self.config_service.get_config(
-                self.service_name, version, use_template, template_vars
-            )
+            if request.getHeader(b'if-none-match'):
+                current_version = yield self.config_service.resolve_version(self.service_name, version, primary)
+                if current_version is not None:
+                    etag = self.config_service.make_etag(
+                        self.service_name, current_version, use_template, template_vars, path
+                    )
+                    matched = self.etag_matches(request, etag)
+                    if matched is not None:
+                        self.send_not_modified(request, matched)
+                        return
+
+            if path:
+                result = yield self.config_service.get_config_subtree(
+                    self.service_name, version, path, use_template, template_vars, primary
+                )
+                body = result['body'] if result else None
+                if result is not None and body is None:
+                    self.send_error(request, "Path not found in configuration", 404)
+                    return
+            elif use_template or self.wants_pretty(request):
+                result = yield self.config_service.get_versioned_config(
+                    self.service_name, version, use_template, template_vars, primary
+                )
+                body = result['config'] if result else None
+            else:
+                result = yield self.config_service.get_raw_config(self.service_name, version, primary)
+                body = result['body'] if result else None
 
-            if config is None:
+            if result is None:
                 self.send_error(request, "Configuration not found", 404)
                 return
 
-            self.send_json(request, config)
+            etag = self.config_service.make_etag(
+                self.service_name, result['version'], use_template, template_vars, path
+            )
+            yield self.send_large_json(request, body, result['size'], cache_key=etag, etag=etag)
 
         except ValueError as e:
             self.send_error(request, str(e), 400)
@@ -157,16 +512,197 @@ class HistoryHandler(BaseHandler):
     @defer.inlineCallbacks
     def _get_history(self, request):
         try:
-            history = yield self.config_service.get_config_history(self.service_name)
+            params = {
+                name: self.get_query_param(request, name)
+                for name in ('limit', 'before_version', 'after_version', 'created_from', 'created_to')
+            }
+            cursor = self.get_query_param(request, 'cursor')
+            if cursor:
+                params = {
+                    name: str(value)
+                    for name, value in self.config_service.decode_history_cursor(cursor).items()
+                    if name in params and value is not None
+                }
+
+            valid, limit = APIValidator.validate_limit_param(params.get('limit'), 10, settings.HISTORY_MAX_LIMIT)
+            if not valid:
+                self.send_error(request, f"Invalid limit (1-{settings.HISTORY_MAX_LIMIT})", 400)
+                return
+
+            filters = {}
+            for name in ('before_version', 'after_version'):
+                valid, filters[name] = APIValidator.validate_version_param(params.get(name))
+                if not valid:
+                    self.send_error(request, f"Invalid {name}", 400)
+                    return
+            for name in ('created_from', 'created_to'):
+                valid, filters[name] = APIValidator.validate_datetime_param(params.get(name))
+                if not valid:
+                    self.send_error(request, f"Invalid {name}, expected ISO 8601 datetime", 400)
+                    return
 
-            if history is None:
+            valid, min_version = APIValidator.validate_version_param(self.get_query_param(request, 'min_version'))
+            if not valid:
+                self.send_error(request, "Invalid min_version", 400)
+                return
+            primary = min_version is not None and self.config_service.needs_primary(self.service_name, min_version)
+
+            result = yield self.config_service.get_config_history(self.service_name, limit, primary=primary, **filters)
+
+            if result is None:
                 self.send_error(request, "Service not found", 404)
                 return
 
-            self.send_json(request, history)
+            headers = {}
+            if result['next_cursor']:
+                headers[b'X-Next-Cursor'] = result['next_cursor'].encode('ascii')
+                headers[b'Link'] = f'<?cursor={result["next_cursor"]}>; rel="next"'.encode('ascii')
+
+            self.send_json(request, result['history'], headers=headers)
 
         except ValueError as e:
             self.send_error(request, str(e), 400)
         except Exception as e:
             log.err(f"Error getting history for {self.service_name}: {e}")
-            self.send_error(request, "Internal server error", 500)
\ No newline at end of file
+            self.send_error(request, "Internal server error", 500)
+
+
+class DiffHandler(BaseHandler):
+
+    def __init__(self, config_service, service_name):
+        Resource.__init__(self)
+        self.config_service = config_service
+        self.service_name = service_name
+
+    def render_GET(self, request):
+        d = self._get_diff(request)
+        d.addErrback(self.handle_error, request)
+        return NOT_DONE_YET
+
+    @defer.inlineCallbacks
+    def _get_diff(self, request):
+        try:
+            valid, from_version = APIValidator.validate_version_param(self.get_query_param(request, 'from'))
+            if not valid or from_version is None:
+                self.send_error(request, "Query parameter 'from' must be a positive integer", 400)
+                return
+
+            valid, to_version = APIValidator.validate_version_param(self.get_query_param(request, 'to'))
+            if not valid:
+                self.send_error(request, "Invalid 'to' version", 400)
+                return
+
+            result = yield self.config_service.get_config_diff(self.service_name, from_version, to_version)
+
+            if result is None:
+                self.send_error(request, "Configuration version not found", 404)
+                return
+
+            self.send_json(request, result)
+
+        except ValueError as e:
+            self.send_error(request, str(e), 400)
+        except Exception as e:
+            log.err(f"Error diffing configurations for {self.service_name}: {e}")
+            self.send_error(request, "Internal server error", 500)
+
+
+class RetentionHandler(BaseHandler):
+
+    def __init__(self, config_service, service_name):
+        Resource.__init__(self)
+        self.config_service = config_service
+        self.service_name = service_name
+
+    def render_GET(self, request):
+        d = self._get_retention(request)
+        d.addErrback(self.handle_error, request)
+        return NOT_DONE_YET
+
+    def render_PUT(self, request):
+        d = self._set_retention(request)
+        d.addErrback(self.handle_error, request)
+        return NOT_DONE_YET
+
+    @defer.inlineCallbacks
+    def _get_retention(self, request):
+        try:
+            result = yield self.config_service.get_retention(self.service_name)
+            self.send_json(request, result)
+
+        except ValueError as e:
+            self.send_error(request, str(e), 400)
+        except Exception as e:
+            log.err(f"Error getting retention policy for {self.service_name}: {e}")
+            self.send_error(request, "Internal server error", 500)
+
+    @defer.inlineCallbacks
+    def _set_retention(self, request):
+        try:
+            content = request.content.read()
+            try:
+                data = json.loads(content.decode('utf-8')) if content else None
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                self.send_error(request, "Request body must be valid JSON", 400)
+                return
+
+            valid, result = APIValidator.validate_retention_policy(data, settings.RETENTION_MAX_PINNED)
+            if not valid:
+                self.send_error(request, result, 400)
+                return
+
+            retention = yield self.config_service.set_retention(self.service_name, result)
+            self.send_json(request, retention)
+
+        except ValueError as e:
+            self.send_error(request, str(e), 400)
+        except Exception as e:
+            log.err(f"Error setting retention policy for {self.service_name}: {e}")
+            self.send_error(request, "Internal server error", 500)
+
+
+class StreamHandler(BaseHandler):
+
+    def __init__(self, config_service, service_name, change_stream):
+        Resource.__init__(self)
+        self.config_service = config_service
+        self.service_name = service_name
+        self.change_stream = change_stream
+
+    def render_GET(self, request):
+        d = self._open_stream(request)
+        d.addErrback(self.handle_error, request)
+        return NOT_DONE_YET
+
+    @defer.inlineCallbacks
+    def _open_stream(self, request):
+        try:
+            valid, error = ConfigValidator.validate_service_name(self.service_name)
+            if not valid:
+                self.send_error(request, error, 400)
+                return
+
+            last_event_id = request.getHeader(b'last-event-id')
+            last_event_id = last_event_id.decode('utf-8') if last_event_id else self.get_query_param(request, 'last_event_id')
+            valid, last_version = APIValidator.validate_version_param(last_event_id)
+            if not valid:
+                self.send_error(request, "Invalid Last-Event-ID", 400)
+                return
+
+            if self.change_stream.is_full():
+                self.send_error(request, "Too many stream subscribers", 503)
+                return
+
+            request.setResponseCode(200)
+            request.setHeader(b'Content-Type', b'text/event-stream; charset=utf-8')
+            request.setHeader(b'Cache-Control', b'no-cache')
+            request.setHeader(b'X-Accel-Buffering', b'no')
+
+            yield self.change_stream.subscribe(self.service_name, request, last_version or 0)
+
+        except Exception as e:
+            log.err(f"Error opening change stream for {self.service_name}: {e}")
+            if not request.startedWriting:
+                self.send_error(request, "Internal server error", 500)
+            elif not request.finished:
+                request.finish()
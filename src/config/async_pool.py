@@ -0,0 +1,151 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Any, Callable, Dict, List, Tuple
+
+import psycopg2
+from twisted.python import log
+from twisted.internet import defer
+
+from src.repositories.transaction import Steps, run_steps_async
+
+try:
+    import psycopg
+    from psycopg.conninfo import make_conninfo
+    from psycopg_pool import AsyncConnectionPool
+except ImportError:
+    psycopg = None
+    make_conninfo = None
+    AsyncConnectionPool = None
+
+
+class _ConnectionInfo:
+    # psycopg2.extras.execute_values берёт кодировку запроса из cursor.connection
+    encoding: str = 'UTF8'
+
+
+class BridgedCursor:
+
+    connection: _ConnectionInfo = _ConnectionInfo()
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, cursor: Any) -> None:
+        self._loop: asyncio.AbstractEventLoop = loop
+        self._cursor: Any = cursor
+
+    def _wait(self, coroutine: Any) -> Any:
+        # Взаимодействие выполняется в потоке, сам запрос — в цикле событий реактора
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    def execute(self, query: Any, params: Optional[Any] = None) -> None:
+        self._wait(self._cursor.execute(query, params))
+
+    def fetchone(self) -> Optional[Tuple[Any, ...]]:
+        return self._wait(self._cursor.fetchone())
+
+    def fetchmany(self, size: int = 0) -> List[Tuple[Any, ...]]:
+        return self._wait(self._cursor.fetchmany(size))
+
+    def fetchall(self) -> List[Tuple[Any, ...]]:
+        return self._wait(self._cursor.fetchall())
+
+    def mogrify(self, query: Any, params: Optional[Any] = None) -> bytes:
+        if isinstance(query, bytes):
+            query = query.decode('utf-8')
+        return self._cursor.mogrify(query, params).encode('utf-8')
+
+    @property
+    def rowcount(self) -> int:
+        return self._cursor.rowcount
+
+
+class AsyncConnectionPoolAdapter:
+
+    dbapi: Any = psycopg2
+
+    def __init__(self, min_size: int = 2, max_size: int = 10, **connkw: Any) -> None:
+        if AsyncConnectionPool is None:
+            raise RuntimeError("DB_BACKEND=asyncio requires the 'psycopg[pool]' package (install the 'asyncio' extra)")
+
+        self.connargs: Tuple[Any, ...] = ()
+        self.connkw: Dict[str, Any] = connkw
+        self.min: int = min_size
+        self.max: int = max_size
+        self._loop: asyncio.AbstractEventLoop = asyncio.get_event_loop()
+        self._executor: ThreadPoolExecutor = ThreadPoolExecutor(max_size, thread_name_prefix='db-interaction')
+        self._opening: Optional[asyncio.Future] = None
+        self.pool: Any = AsyncConnectionPool(
+            make_conninfo(**{'dbname' if name == 'database' else name: value for name, value in connkw.items()}),
+            min_size=min_size,
+            max_size=max_size,
+            kwargs={'cursor_factory': psycopg.AsyncClientCursor},
+            open=False
+        )
+
+    def _run(self, coroutine: Any) -> defer.Deferred[Any]:
+        return defer.Deferred.fromFuture(asyncio.ensure_future(coroutine, loop=self._loop))
+
+    async def _ensure_open(self) -> None:
+        if self._opening is None:
+            self._opening = asyncio.ensure_future(self.pool.open(wait=True), loop=self._loop)
+        await self._opening
+
+    async def _run_query(self, query: Any, params: Optional[Any], fetch: bool) -> Optional[List[Tuple[Any, ...]]]:
+        await self._ensure_open()
+        async with self.pool.connection() as connection:
+            try:
+                async with connection.cursor() as cursor:
+                    await cursor.execute(query, params)
+                    rows: Optional[List[Tuple[Any, ...]]] = await cursor.fetchall() if fetch else None
+                await connection.commit()
+            except BaseException:
+                await connection.rollback()
+                raise
+        return rows
+
+    async def _run_steps(self, steps: Callable[..., Steps], args: Tuple[Any, ...]) -> Any:
+        await self._ensure_open()
+        async with self.pool.connection() as connection:
+            try:
+                async with connection.cursor() as cursor:
+                    result: Any = await run_steps_async(cursor, steps(*args))
+                await connection.commit()
+            except BaseException:
+                await connection.rollback()
+                raise
+        return result
+
+    async def _run_interaction(self, interaction: Callable[..., Any], args: Tuple[Any, ...],
+                               kwargs: Dict[str, Any]) -> Any:
+        await self._ensure_open()
+        async with self.pool.connection() as connection:
+            try:
+                async with connection.cursor() as cursor:
+                    txn: BridgedCursor = BridgedCursor(self._loop, cursor)
+                    result: Any = await self._loop.run_in_executor(
+                        self._executor, lambda: interaction(txn, *args, **kwargs)
+                    )
+                await connection.commit()
+            except BaseException:
+                await connection.rollback()
+                raise
+        return result
+
+    def runQuery(self, query: Any, params: Optional[Any] = None) -> defer.Deferred[List[Tuple[Any, ...]]]:
+        return self._run(self._run_query(query, params, True))
+
+    def runOperation(self, query: Any, params: Optional[Any] = None) -> defer.Deferred[None]:
+        return self._run(self._run_query(query, params, False))
+
+    def runSteps(self, steps: Callable[..., Steps], *args: Any) -> defer.Deferred[Any]:
+        return self._run(self._run_steps(steps, args))
+
+    def runInteraction(self, interaction: Callable[..., Any], *args: Any, **kwargs: Any) -> defer.Deferred[Any]:
+        # Запасной путь для ещё не переведённых на шаги взаимодействий: поток и мост в цикл событий на каждый запрос
+        return self._run(self._run_interaction(interaction, args, kwargs))
+
+    @defer.inlineCallbacks
+    def close(self) -> defer.Deferred[None]:
+        try:
+            yield self._run(self.pool.close())
+        finally:
+            self._executor.shutdown(wait=False)
+            log.msg("Async database pool closed")
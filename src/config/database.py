@@ -1,19 +1,199 @@
-from typing import Optional, Any
+import json
+from typing import Optional, Any, Callable, List, Tuple
 
+import psycopg2
+from psycopg2 import sql
+from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+from zope.interface import implementer
 from twisted.python import log
-from twisted.internet import defer
+from twisted.internet import defer, reactor, threads
+from twisted.internet.interfaces import IReadDescriptor
 from twisted.enterprise import adbapi
 from twisted.enterprise.adbapi import ConnectionPool
 
 from src.config.settings import settings
+from src.config.async_pool import AsyncConnectionPoolAdapter
+from src.config.replicas import ReplicaPool, parse_replica_hosts
+from src.repositories.configuration_repository import prepare_statements
+
+
+ChangeCallback = Callable[[str, Optional[int]], None]
+GapCallback = Callable[[], None]
+
+
+@implementer(IReadDescriptor)
+class ConfigChangeListener:
+
+    def __init__(self, connection_factory: Callable[..., Any], channel: str,
+                 reconnect_delay: float = 1.0, max_reconnect_delay: float = 30.0) -> None:
+        self.connection_factory: Callable[..., Any] = connection_factory
+        self.channel: str = channel
+        self.connection: Optional[Any] = None
+        self.reconnect_delay: float = reconnect_delay
+        self.max_reconnect_delay: float = max_reconnect_delay
+        self._subscribers: List[Tuple[ChangeCallback, Optional[GapCallback]]] = []
+        self._running: bool = False
+        self._has_connected: bool = False
+        self._current_delay: float = reconnect_delay
+        self._reconnect_call: Optional[Any] = None
+
+    @property
+    def connected(self) -> bool:
+        return self.connection is not None
+
+    def subscribe(self, on_change: ChangeCallback, on_gap: Optional[GapCallback] = None) -> None:
+        self._subscribers.append((on_change, on_gap))
+
+    def start(self) -> defer.Deferred[None]:
+        self._running = True
+        return self._connect()
+
+    def stop(self) -> None:
+        self._running = False
+        if self._reconnect_call is not None and self._reconnect_call.active():
+            self._reconnect_call.cancel()
+        self._reconnect_call = None
+        self._drop_connection()
+
+    def _open(self) -> Any:
+        connection: Any = self.connection_factory(
+            keepalives=1, keepalives_idle=30, keepalives_interval=10, keepalives_count=3
+        )
+        connection.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+        with connection.cursor() as cursor:
+            cursor.execute(sql.SQL("LISTEN {}").format(sql.Identifier(self.channel)))
+        return connection
+
+    @defer.inlineCallbacks
+    def _connect(self) -> defer.Deferred[None]:
+        try:
+            connection: Any = yield threads.deferToThread(self._open)
+        except Exception as e:
+            log.err(f"Config change listener failed to connect: {str(e)}")
+            self._schedule_reconnect()
+            return
+
+        if not self._running:
+            connection.close()
+            return
+
+        self.connection = connection
+        self._current_delay = self.reconnect_delay
+        reactor.addReader(self)
+        log.msg(f"Listening for configuration changes on channel '{self.channel}'")
+
+        # Уведомления, пришедшие пока соединения не было, потеряны
+        if self._has_connected:
+            self._notify_gap()
+        self._has_connected = True
+
+    def _schedule_reconnect(self) -> None:
+        if not self._running:
+            return
+        delay: float = self._current_delay
+        self._current_delay = min(self._current_delay * 2, self.max_reconnect_delay)
+        log.msg(f"Config change listener reconnecting in {delay:.1f}s")
+        self._reconnect_call = reactor.callLater(delay, self._connect)
+
+    def _drop_connection(self) -> None:
+        if self.connection is None:
+            return
+        reactor.removeReader(self)
+        try:
+            self.connection.close()
+        except psycopg2.Error:
+            pass
+        self.connection = None
+
+    def _dispatch(self, payload: str) -> None:
+        try:
+            message: Any = json.loads(payload)
+            service: str = message['service']
+            version: Optional[int] = message.get('version')
+        except (ValueError, TypeError, KeyError):
+            log.msg(f"Malformed configuration change notification: {payload!r}")
+            self._notify_gap()
+            return
+
+        for on_change, _ in self._subscribers:
+            try:
+                on_change(service, version)
+            except Exception:
+                log.err(None, "Config change subscriber failed")
+
+    def _notify_gap(self) -> None:
+        log.msg("Configuration change notifications may have been missed, flushing caches")
+        for _, on_gap in self._subscribers:
+            if on_gap is None:
+                continue
+            try:
+                on_gap()
+            except Exception:
+                log.err(None, "Config change gap handler failed")
+
+    def fileno(self) -> int:
+        if self.connection is None:
+            return -1
+        return self.connection.fileno()
+
+    def doRead(self) -> None:
+        try:
+            self.connection.poll()
+        except psycopg2.Error as e:
+            log.err(f"Config change listener connection lost: {str(e)}")
+            self._drop_connection()
+            self._schedule_reconnect()
+            return
+
+        while self.connection.notifies:
+            notify: Any = self.connection.notifies.pop(0)
+            self._dispatch(notify.payload)
+
+    def connectionLost(self, reason: Any) -> None:
+        if self.connection is None:
+            return
+        self._drop_connection()
+        self._schedule_reconnect()
+
+    def logPrefix(self) -> str:
+        return 'ConfigChangeListener'
 
 
 class DatabaseManager:
 
     def __init__(self) -> None:
         self.pool: Optional[ConnectionPool] = None
+        self.read_pool: Optional[ReplicaPool] = None
+        self.listener: Optional[ConfigChangeListener] = None
         self._connected: bool = False
 
+    def _create_pool(self, host: str, port: int, min_size: int, max_size: int) -> Any:
+        if settings.DB_BACKEND == 'asyncio':
+            # Запросы идут через psycopg 3 в цикле asyncio-реактора, без пула потоков adbapi
+            return AsyncConnectionPoolAdapter(
+                min_size=min_size,
+                max_size=max_size,
+                host=host,
+                port=port,
+                database=settings.POSTGRES_DB,
+                user=settings.POSTGRES_USER,
+                password=settings.POSTGRES_PASSWORD
+            )
+
+        return adbapi.ConnectionPool(
+            'psycopg2',
+            host=host,
+            port=port,
+            database=settings.POSTGRES_DB,
+            user=settings.POSTGRES_USER,
+            password=settings.POSTGRES_PASSWORD,
+            cp_min=min_size,
+            cp_max=max_size,
+            cp_reconnect=True,
+            cp_noisy=False,
+            cp_openfun=prepare_statements if settings.DB_PREPARED_STATEMENTS else None
+        )
+
     def connect(self) -> ConnectionPool:
         if self._connected:
             return self.pool
@@ -21,22 +201,28 @@ class DatabaseManager:
         try:
             settings.validate()
 
-            self.pool = adbapi.ConnectionPool(
-                'psycopg2',
-                host=settings.POSTGRES_HOST,
-                port=settings.POSTGRES_PORT,
-                database=settings.POSTGRES_DB,
-                user=settings.POSTGRES_USER,
-                password=settings.POSTGRES_PASSWORD,
-                cp_min=settings.DB_POOL_MIN,
-                cp_max=settings.DB_POOL_MAX,
-                cp_reconnect=True,
-                cp_noisy=False
+            self.pool = self._create_pool(
+                settings.POSTGRES_HOST, settings.POSTGRES_PORT, settings.DB_POOL_MIN, settings.DB_POOL_MAX
             )
 
+            replica_hosts: List[Tuple[str, int]] = parse_replica_hosts(
+                settings.POSTGRES_REPLICA_HOSTS, settings.POSTGRES_PORT
+            )
+            if replica_hosts:
+                self.read_pool = ReplicaPool(
+                    [
+                        (f"{host}:{port}", self._create_pool(host, port, 1, settings.DB_REPLICA_POOL_MAX))
+                        for host, port in replica_hosts
+                    ],
+                    self.pool,
+                    settings.DB_REPLICA_MAX_LAG
+                )
+                log.msg(f"Read replicas configured: {', '.join(f'{host}:{port}' for host, port in replica_hosts)}")
+
             self._connected = True
             log.msg(
-                f"Database pool initialized: {settings.POSTGRES_HOST}:{settings.POSTGRES_PORT}/{settings.POSTGRES_DB}")
+                f"Database pool initialized ({settings.DB_BACKEND}): "
+                f"{settings.POSTGRES_HOST}:{settings.POSTGRES_PORT}/{settings.POSTGRES_DB}")
 
             return self.pool
 
@@ -44,6 +230,29 @@ class DatabaseManager:
             log.err(f"Failed to initialize database pool: {str(e)}")
             raise
 
+    def start_replica_checks(self) -> None:
+        if self.read_pool is not None:
+            self.read_pool.start(settings.DB_REPLICA_CHECK_INTERVAL)
+
+    def open_connection(self, **kwargs: Any) -> Any:
+        return psycopg2.connect(
+            host=settings.POSTGRES_HOST,
+            port=settings.POSTGRES_PORT,
+            database=settings.POSTGRES_DB,
+            user=settings.POSTGRES_USER,
+            password=settings.POSTGRES_PASSWORD,
+            **kwargs
+        )
+
+    def start_listener(self) -> defer.Deferred[None]:
+        if self.listener is None:
+            self.listener = ConfigChangeListener(
+                self.open_connection,
+                settings.CONFIG_NOTIFY_CHANNEL,
+                max_reconnect_delay=settings.CONFIG_NOTIFY_RECONNECT_MAX
+            )
+        return self.listener.start()
+
     @defer.inlineCallbacks
     def test_connection(self) -> defer.Deferred[bool]:
         if not self.pool:
@@ -59,6 +268,14 @@ class DatabaseManager:
 
     @defer.inlineCallbacks
     def close(self) -> defer.Deferred[None]:
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+
+        if self.read_pool is not None:
+            yield self.read_pool.close()
+            self.read_pool = None
+
         if self.pool and self._connected:
             yield self.pool.close()
             self.pool = None
@@ -2,17 +2,25 @@
 import os
 import sys
 
-from twisted.python import log
-from twisted.web.server import Site
-from twisted.web.resource import Resource
-from twisted.internet import reactor, defer
-
 src_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, src_path)
 
 from config.settings import settings
-from api.handlers import ConfigHandler
+
+if settings.DB_BACKEND == 'asyncio':
+    # Реактор должен быть установлен до первого импорта twisted.internet.reactor
+    from twisted.internet import asyncioreactor
+    asyncioreactor.install()
+
+from twisted.python import log
+from twisted.web.resource import Resource
+from twisted.internet import reactor, defer
+from twisted.protocols.policies import WrappingFactory
+from api.handlers import ConfigHandler, StatsHandler
 from config.database import db_manager
+from config.supervisor import (
+    Supervisor, WorkerStatusReporter, TrackingSite, current_worker_id, worker_count, listen, drain_connections
+)
 from utils.migrations import MigrationManager
 
 
@@ -26,6 +34,11 @@ class HealthHandler(Resource):
 class ConfigServiceApp:
     def __init__(self):
         self.site = None
+        self.config_handler = None
+        self.factory = None
+        self.port = None
+        self.worker_id = current_worker_id()
+        self.status = WorkerStatusReporter(self.worker_id) if self.worker_id is not None else None
 
     @defer.inlineCallbacks
     def initialize(self):
@@ -35,22 +48,49 @@ class ConfigServiceApp:
             yield db_manager.test_connection()
             log.msg("Database connected")
 
-            migration_manager = MigrationManager(db_pool)
-            yield migration_manager.run_all_migrations()
-            log.msg("Migrations completed")
+            # В режиме воркеров миграции уже выполнил супервизор
+            if self.worker_id is None:
+                migration_manager = MigrationManager(db_pool, db_manager.open_connection)
+                yield migration_manager.run_all_migrations()
+                log.msg("Migrations completed")
 
             root = Resource()
 
-            config_handler = ConfigHandler(db_pool)
+            config_handler = ConfigHandler(db_pool, db_manager.read_pool)
+            db_manager.start_replica_checks()
+
+            if settings.CONFIG_NOTIFY_ENABLED:
+                yield db_manager.start_listener()
+                db_manager.listener.subscribe(
+                    config_handler.config_service.invalidate,
+                    config_handler.config_service.invalidate_all
+                )
+                db_manager.listener.subscribe(
+                    config_handler.change_stream.publish,
+                    config_handler.change_stream.republish_all
+                )
+
+            config_handler.change_stream.start()
+            if settings.RETENTION_ENABLED:
+                config_handler.retention.start()
+            self.config_handler = config_handler
 
             root.putChild(b'config', config_handler)
 
             root.putChild(b'health', HealthHandler())
 
-            self.site = Site(root)
+            root.putChild(b'stats', StatsHandler(config_handler))
 
-            reactor.listenTCP(settings.HTTP_PORT, self.site)
-            log.msg(f"Config service started on port {settings.HTTP_PORT}")
+            self.site = TrackingSite(root)
+            self.factory = WrappingFactory(self.site)
+
+            self.port = listen(settings.HTTP_PORT, self.factory)
+            if self.status is not None:
+                self.status.connections = lambda: len(self.factory.protocols)
+                self.status.ready()
+                log.msg(f"Config service worker {self.worker_id} started on port {settings.HTTP_PORT}")
+            else:
+                log.msg(f"Config service started on port {settings.HTTP_PORT}")
 
         except Exception as e:
             log.err(f"Failed to initialize application: {str(e)}")
@@ -61,6 +101,18 @@ class ConfigServiceApp:
     @defer.inlineCallbacks
     def shutdown(self):
         try:
+            if self.status is not None:
+                self.status.draining()
+            if self.port is not None:
+                yield self.port.stopListening()
+            if self.config_handler is not None:
+                self.config_handler.change_stream.stop()
+            if self.factory is not None:
+                aborted = yield drain_connections(self.factory, settings.SERVER_SHUTDOWN_TIMEOUT)
+                if aborted:
+                    log.msg(f"Aborted {aborted} connections still open after drain timeout")
+            if self.config_handler is not None:
+                self.config_handler.retention.stop()
             yield db_manager.close()
             log.msg("Application shutdown completed")
         except Exception as e:
@@ -84,6 +136,27 @@ def main():
         reactor.stop()
 
 
+@defer.inlineCallbacks
+def supervise(workers):
+    try:
+        log.startLogging(sys.stdout)
+
+        settings.validate()
+
+        supervisor = Supervisor(workers)
+        reactor.addSystemEventTrigger('before', 'shutdown', supervisor.stop)
+        yield supervisor.start()
+
+    except Exception as e:
+        log.err(f"Failed to start supervisor: {str(e)}")
+        reactor.stop()
+
+
 if __name__ == '__main__':
-    reactor.callWhenRunning(main)
+    workers = worker_count()
+    if workers > 1 and current_worker_id() is None:
+        # Супервизор сам не обслуживает HTTP: запросы принимают воркеры на общем порту
+        reactor.callWhenRunning(supervise, workers)
+    else:
+        reactor.callWhenRunning(main)
     reactor.run()
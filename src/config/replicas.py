@@ -0,0 +1,161 @@
+from typing import Optional, Dict, Any, Callable, List, Tuple
+
+import psycopg2
+from twisted.python import log
+from twisted.python.failure import Failure
+from twisted.internet import defer, task
+
+from src.config.async_pool import psycopg
+from src.repositories.transaction import Steps, run_transaction
+
+
+# Ошибки соединения и конфликты с восстановлением на реплике повторяются на основном сервере
+REPLICA_ERRORS: Tuple[type, ...] = (psycopg2.OperationalError, psycopg2.InterfaceError) + (
+    (psycopg.OperationalError, psycopg.InterfaceError) if psycopg is not None else ()
+)
+
+LAG_QUERY: str = """
+    SELECT pg_is_in_recovery(),
+           CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+                ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+           END
+"""
+
+
+def parse_replica_hosts(hosts: str, default_port: int) -> List[Tuple[str, int]]:
+    replicas: List[Tuple[str, int]] = []
+    for item in hosts.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        host, _, port = item.rpartition(':') if ':' in item else (item, '', '')
+        replicas.append((host, int(port) if port else default_port))
+    return replicas
+
+
+class Replica:
+    __slots__ = ('name', 'pool', 'healthy', 'lag', 'queries', 'failures')
+
+    def __init__(self, name: str, pool: Any) -> None:
+        self.name: str = name
+        self.pool: Any = pool
+        # Реплика получает запросы только после первой успешной проверки
+        self.healthy: bool = False
+        self.lag: Optional[float] = None
+        self.queries: int = 0
+        self.failures: int = 0
+
+
+class ReplicaPool:
+
+    def __init__(self, replicas: List[Tuple[str, Any]], primary: Any, max_lag: float = 5.0) -> None:
+        self.replicas: List[Replica] = [Replica(name, pool) for name, pool in replicas]
+        self.primary: Any = primary
+        self.max_lag: float = max_lag
+        self.fallbacks: int = 0
+        self._next: int = 0
+        self._checker: Optional[task.LoopingCall] = None
+
+    def _choose(self) -> Optional[Replica]:
+        count: int = len(self.replicas)
+        for offset in range(count):
+            replica: Replica = self.replicas[(self._next + offset) % count]
+            if replica.healthy:
+                self._next = (self._next + offset + 1) % count
+                replica.queries += 1
+                return replica
+        return None
+
+    def _run(self, call: Callable[[Any], defer.Deferred[Any]]) -> defer.Deferred[Any]:
+        replica: Optional[Replica] = self._choose()
+        if replica is None:
+            self.fallbacks += 1
+            return call(self.primary)
+
+        d: defer.Deferred[Any] = call(replica.pool)
+        d.addErrback(self._failed, replica, call)
+        return d
+
+    def _failed(self, failure: Failure, replica: Replica,
+                call: Callable[[Any], defer.Deferred[Any]]) -> defer.Deferred[Any]:
+        failure.trap(*REPLICA_ERRORS)
+        replica.healthy = False
+        replica.failures += 1
+        self.fallbacks += 1
+        log.msg(f"Read replica {replica.name} failed, retrying on primary: {failure.getErrorMessage()}")
+        return call(self.primary)
+
+    def runQuery(self, *args: Any, **kwargs: Any) -> defer.Deferred[Any]:
+        return self._run(lambda pool: pool.runQuery(*args, **kwargs))
+
+    def runInteraction(self, *args: Any, **kwargs: Any) -> defer.Deferred[Any]:
+        return self._run(lambda pool: pool.runInteraction(*args, **kwargs))
+
+    def runWithConnection(self, *args: Any, **kwargs: Any) -> defer.Deferred[Any]:
+        return self._run(lambda pool: pool.runWithConnection(*args, **kwargs))
+
+    def runSteps(self, steps: Callable[..., Steps], *args: Any) -> defer.Deferred[Any]:
+        return self._run(lambda pool: run_transaction(pool, steps, *args))
+
+    def _connection_source(self) -> Any:
+        healthy: List[Replica] = [replica for replica in self.replicas if replica.healthy]
+        return healthy[0].pool if healthy else self.primary
+
+    @property
+    def dbapi(self) -> Any:
+        return self._connection_source().dbapi
+
+    @property
+    def connargs(self) -> Tuple[Any, ...]:
+        return self._connection_source().connargs
+
+    @property
+    def connkw(self) -> Dict[str, Any]:
+        return self._connection_source().connkw
+
+    @defer.inlineCallbacks
+    def _check(self, replica: Replica) -> defer.Deferred[None]:
+        try:
+            rows: List[Tuple[Any, ...]] = yield replica.pool.runQuery(LAG_QUERY)
+            in_recovery: bool = rows[0][0]
+            replica.lag = float(rows[0][1])
+            healthy: bool = in_recovery and (self.max_lag <= 0 or replica.lag <= self.max_lag)
+        except Exception as e:
+            healthy = False
+            replica.lag = None
+            log.msg(f"Read replica {replica.name} health check failed: {str(e)}")
+
+        if healthy != replica.healthy:
+            log.msg(f"Read replica {replica.name} is now {'healthy' if healthy else 'unhealthy'} (lag {replica.lag})")
+        replica.healthy = healthy
+
+    def check(self) -> defer.Deferred[Any]:
+        return defer.DeferredList([self._check(replica) for replica in self.replicas])
+
+    def start(self, interval: float) -> None:
+        if self._checker is None:
+            self._checker = task.LoopingCall(self.check)
+            self._checker.start(interval, now=True)
+
+    @defer.inlineCallbacks
+    def close(self) -> defer.Deferred[None]:
+        if self._checker is not None and self._checker.running:
+            self._checker.stop()
+        self._checker = None
+        for replica in self.replicas:
+            yield replica.pool.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'fallbacks': self.fallbacks,
+            'replicas': [
+                {
+                    'name': replica.name,
+                    'healthy': replica.healthy,
+                    'lag': replica.lag,
+                    'queries': replica.queries,
+                    'failures': replica.failures
+                }
+                for replica in self.replicas
+            ]
+        }
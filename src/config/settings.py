@@ -1,4 +1,5 @@
 import os
+import socket
 from typing import ClassVar, List, Tuple, Any
 
 from dotenv import load_dotenv
@@ -15,9 +16,76 @@ class Settings:
 
     DB_POOL_MIN: ClassVar[int] = int(os.getenv('DB_POOL_MIN', '2'))
     DB_POOL_MAX: ClassVar[int] = int(os.getenv('DB_POOL_MAX', '10'))
+    DB_POOL_TOTAL: ClassVar[int] = int(os.getenv('DB_POOL_TOTAL', '0'))
+    DB_WRITE_RETRIES: ClassVar[int] = int(os.getenv('DB_WRITE_RETRIES', '3'))
+    POSTGRES_REPLICA_HOSTS: ClassVar[str] = os.getenv('POSTGRES_REPLICA_HOSTS', '')
+    DB_REPLICA_POOL_MAX: ClassVar[int] = int(os.getenv('DB_REPLICA_POOL_MAX', '10'))
+    DB_REPLICA_MAX_LAG: ClassVar[float] = float(os.getenv('DB_REPLICA_MAX_LAG', '5'))
+    DB_REPLICA_CHECK_INTERVAL: ClassVar[float] = float(os.getenv('DB_REPLICA_CHECK_INTERVAL', '5'))
+    READ_YOUR_WRITES_WINDOW: ClassVar[float] = float(os.getenv('READ_YOUR_WRITES_WINDOW', '5'))
+
+    DB_PREPARED_STATEMENTS: ClassVar[bool] = os.getenv('DB_PREPARED_STATEMENTS', 'false').lower() in ('1', 'true', 'yes')
+    DB_BACKEND: ClassVar[str] = os.getenv('DB_BACKEND', 'adbapi').lower()
+
+    WRITE_BATCH_ENABLED: ClassVar[bool] = os.getenv('WRITE_BATCH_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+    WRITE_BATCH_WINDOW_MS: ClassVar[float] = float(os.getenv('WRITE_BATCH_WINDOW_MS', '5'))
+    WRITE_BATCH_MAX_SIZE: ClassVar[int] = int(os.getenv('WRITE_BATCH_MAX_SIZE', '100'))
 
     HTTP_PORT: ClassVar[int] = int(os.getenv('PORT', '8080'))
 
+    SERVER_WORKERS: ClassVar[int] = int(os.getenv('SERVER_WORKERS', '1'))
+    SERVER_REUSE_PORT: ClassVar[bool] = os.getenv('SERVER_REUSE_PORT', 'false').lower() in ('1', 'true', 'yes')
+    SERVER_SHUTDOWN_TIMEOUT: ClassVar[float] = float(os.getenv('SERVER_SHUTDOWN_TIMEOUT', '30'))
+    SERVER_HEARTBEAT_INTERVAL: ClassVar[float] = float(os.getenv('SERVER_HEARTBEAT_INTERVAL', '5'))
+    SUPERVISOR_HEALTH_PORT: ClassVar[int] = int(os.getenv('SUPERVISOR_HEALTH_PORT', '8081'))
+
+    CONFIG_CACHE_SIZE: ClassVar[int] = int(os.getenv('CONFIG_CACHE_SIZE', '1024'))
+    CONFIG_CACHE_TTL: ClassVar[float] = float(os.getenv('CONFIG_CACHE_TTL', '30'))
+
+    CONFIG_DEDUP_ENABLED: ClassVar[bool] = os.getenv('CONFIG_DEDUP_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+    CONFIG_PAYLOAD_STORE_ENABLED: ClassVar[bool] = os.getenv('CONFIG_PAYLOAD_STORE_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+    CONFIG_DELTA_ENABLED: ClassVar[bool] = os.getenv('CONFIG_DELTA_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+    CONFIG_SNAPSHOT_INTERVAL: ClassVar[int] = int(os.getenv('CONFIG_SNAPSHOT_INTERVAL', '10'))
+
+    CONFIG_NOTIFY_ENABLED: ClassVar[bool] = os.getenv('CONFIG_NOTIFY_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    CONFIG_NOTIFY_CHANNEL: ClassVar[str] = os.getenv('CONFIG_NOTIFY_CHANNEL', 'config_changes')
+    CONFIG_NOTIFY_RECONNECT_MAX: ClassVar[float] = float(os.getenv('CONFIG_NOTIFY_RECONNECT_MAX', '30'))
+
+    TEMPLATE_CACHE_SIZE: ClassVar[int] = int(os.getenv('TEMPLATE_CACHE_SIZE', '512'))
+    TEMPLATE_RENDER_MODE: ClassVar[str] = os.getenv('TEMPLATE_RENDER_MODE', 'document')
+
+    WORKER_POOL_KIND: ClassVar[str] = os.getenv('WORKER_POOL_KIND', 'thread')
+    WORKER_POOL_SIZE: ClassVar[int] = int(os.getenv('WORKER_POOL_SIZE', '4'))
+    WORKER_TASK_TIMEOUT: ClassVar[float] = float(os.getenv('WORKER_TASK_TIMEOUT', '10'))
+    WORKER_INLINE_THRESHOLD: ClassVar[int] = int(os.getenv('WORKER_INLINE_THRESHOLD', '65536'))
+
+    RESPONSE_CACHE_SIZE: ClassVar[int] = int(os.getenv('RESPONSE_CACHE_SIZE', '256'))
+    RESPONSE_COMPRESSION_MIN_SIZE: ClassVar[int] = int(os.getenv('RESPONSE_COMPRESSION_MIN_SIZE', '1024'))
+
+    BATCH_MAX_SERVICES: ClassVar[int] = int(os.getenv('BATCH_MAX_SERVICES', '500'))
+
+    IMPORT_MAX_BYTES: ClassVar[int] = int(os.getenv('IMPORT_MAX_BYTES', str(64 * 1024 * 1024)))
+    IMPORT_CHUNK_SIZE: ClassVar[int] = int(os.getenv('IMPORT_CHUNK_SIZE', '500'))
+    IMPORT_BATCH_SIZE: ClassVar[int] = int(os.getenv('IMPORT_BATCH_SIZE', '1000'))
+
+    HISTORY_MAX_LIMIT: ClassVar[int] = int(os.getenv('HISTORY_MAX_LIMIT', '1000'))
+
+    EXPORT_CHUNK_SIZE: ClassVar[int] = int(os.getenv('EXPORT_CHUNK_SIZE', '500'))
+    EXPORT_MAX_CONCURRENT: ClassVar[int] = int(os.getenv('EXPORT_MAX_CONCURRENT', '4'))
+
+    RETENTION_ENABLED: ClassVar[bool] = os.getenv('RETENTION_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+    RETENTION_KEEP_LAST: ClassVar[int] = int(os.getenv('RETENTION_KEEP_LAST', '0'))
+    RETENTION_MAX_AGE_DAYS: ClassVar[int] = int(os.getenv('RETENTION_MAX_AGE_DAYS', '0'))
+    RETENTION_INTERVAL: ClassVar[float] = float(os.getenv('RETENTION_INTERVAL', '300'))
+    RETENTION_BATCH_SIZE: ClassVar[int] = int(os.getenv('RETENTION_BATCH_SIZE', '200'))
+    RETENTION_MAX_PINNED: ClassVar[int] = int(os.getenv('RETENTION_MAX_PINNED', '100'))
+
+    SEARCH_MAX_LIMIT: ClassVar[int] = int(os.getenv('SEARCH_MAX_LIMIT', '1000'))
+
+    SSE_MAX_SUBSCRIBERS: ClassVar[int] = int(os.getenv('SSE_MAX_SUBSCRIBERS', '10000'))
+    SSE_KEEPALIVE_INTERVAL: ClassVar[float] = float(os.getenv('SSE_KEEPALIVE_INTERVAL', '15'))
+    SSE_RETRY_MS: ClassVar[int] = int(os.getenv('SSE_RETRY_MS', '3000'))
+
     @classmethod
     def get_db_connection_string(cls) -> str:
         return f"postgresql://{cls.POSTGRES_USER}:{cls.POSTGRES_PASSWORD}@{cls.POSTGRES_HOST}:{cls.POSTGRES_PORT}/{cls.POSTGRES_DB}"
@@ -35,6 +103,19 @@ class Settings:
             if not value:
                 raise ValueError(f"Required setting {name} is not set")
 
+        if cls.DB_BACKEND not in ('adbapi', 'asyncio'):
+            raise ValueError(f"Unsupported DB_BACKEND: {cls.DB_BACKEND} (expected 'adbapi' or 'asyncio')")
+
+        # Общее хранилище оставляет в строке только хеш: дельте нечего сжимать
+        if cls.CONFIG_DELTA_ENABLED and cls.CONFIG_PAYLOAD_STORE_ENABLED:
+            raise ValueError("CONFIG_DELTA_ENABLED cannot be combined with CONFIG_PAYLOAD_STORE_ENABLED")
+
+        if cls.SERVER_WORKERS < 0:
+            raise ValueError("SERVER_WORKERS must be 0 (one per CPU) or a positive number")
+
+        if cls.SERVER_REUSE_PORT and not hasattr(socket, 'SO_REUSEPORT'):
+            raise ValueError("SERVER_REUSE_PORT is not supported on this platform")
+
         return True
 
 
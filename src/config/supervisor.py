@@ -0,0 +1,422 @@
+import os
+import sys
+import json
+import time
+import signal
+import socket
+from typing import Optional, Dict, Any, List
+
+from twisted.python import log
+from twisted.python.failure import Failure
+from twisted.internet import defer, protocol, reactor, task
+from twisted.protocols.policies import WrappingFactory
+from twisted.web.resource import Resource
+from twisted.web.server import Site
+
+from config.settings import settings
+from config.database import db_manager
+from utils.migrations import MigrationManager
+
+
+WORKER_ID_ENV: str = 'CONFIG_WORKER_ID'
+LISTEN_FD_ENV: str = 'CONFIG_LISTEN_FD'
+
+# Номера дескрипторов в дочернем процессе: канал статуса и унаследованный слушающий сокет
+STATUS_FD: int = 3
+LISTEN_FD: int = 4
+
+MAX_RESPAWN_DELAY: float = 30.0
+
+# Воркеры запускаются как пакет из корня репозитория независимо от каталога запуска супервизора
+PROJECT_ROOT: str = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def current_worker_id() -> Optional[int]:
+    value: Optional[str] = os.environ.get(WORKER_ID_ENV)
+    return int(value) if value else None
+
+
+def worker_count() -> int:
+    return settings.SERVER_WORKERS if settings.SERVER_WORKERS > 0 else (os.cpu_count() or 1)
+
+
+def create_listening_socket(port: int, reuse_port: bool = False, backlog: int = 1024) -> socket.socket:
+    sock: socket.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if reuse_port:
+            # Ядро само распределяет входящие соединения между сокетами воркеров
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        sock.bind(('', port))
+        sock.listen(backlog)
+        sock.setblocking(False)
+    except Exception:
+        sock.close()
+        raise
+    return sock
+
+
+def listen(port: int, factory: protocol.Factory) -> Any:
+    listen_fd: Optional[str] = os.environ.get(LISTEN_FD_ENV)
+    if listen_fd:
+        fd: int = int(listen_fd)
+        try:
+            return reactor.adoptStreamPort(fd, socket.AF_INET, factory)
+        finally:
+            # adoptStreamPort дублирует дескриптор
+            os.close(fd)
+
+    if current_worker_id() is not None and settings.SERVER_REUSE_PORT:
+        sock: socket.socket = create_listening_socket(port, reuse_port=True)
+        try:
+            return reactor.adoptStreamPort(sock.fileno(), socket.AF_INET, factory)
+        finally:
+            sock.close()
+
+    return reactor.listenTCP(port, factory)
+
+
+class TrackingSite(Site):
+
+    def __init__(self, resource: Resource, *args: Any, **kwargs: Any) -> None:
+        Site.__init__(self, resource, *args, **kwargs)
+        # Незавершённые запросы по транспорту соединения; за WrappingFactory это его ProtocolWrapper
+        self.in_flight: Dict[Any, int] = {}
+
+    def getResourceFor(self, request: Any) -> Resource:
+        transport: Any = request.transport
+        self.in_flight[transport] = self.in_flight.get(transport, 0) + 1
+        request.notifyFinish().addBoth(self._request_done, transport)
+        return Site.getResourceFor(self, request)
+
+    def _request_done(self, _: Any, transport: Any) -> None:
+        count: int = self.in_flight.get(transport, 0) - 1
+        if count > 0:
+            self.in_flight[transport] = count
+        else:
+            self.in_flight.pop(transport, None)
+
+    def is_busy(self, transport: Any) -> bool:
+        return transport in self.in_flight
+
+
+@defer.inlineCallbacks
+def drain_connections(factory: WrappingFactory, timeout: float, interval: float = 0.1) -> defer.Deferred[int]:
+    """Ждёт завершения обрабатываемых запросов; простаивающие keep-alive соединения закрываются сразу."""
+    site: TrackingSite = factory.wrappedFactory
+    deadline: float = time.monotonic() + timeout
+    while factory.protocols and time.monotonic() < deadline:
+        for wrapper in list(factory.protocols):
+            if not site.is_busy(wrapper):
+                wrapper.transport.loseConnection()
+        yield task.deferLater(reactor, interval, lambda: None)
+
+    remaining: int = len(factory.protocols)
+    for wrapper in list(factory.protocols):
+        wrapper.transport.abortConnection()
+    defer.returnValue(remaining)
+
+
+class WorkerStatusReporter:
+
+    def __init__(self, worker_id: int, interval: float = settings.SERVER_HEARTBEAT_INTERVAL) -> None:
+        self.worker_id: int = worker_id
+        self.interval: float = interval
+        self.state: str = 'starting'
+        self.connections: Any = None
+        self._loop: Optional[task.LoopingCall] = None
+
+    def _send(self) -> None:
+        message: Dict[str, Any] = {
+            'state': self.state,
+            'worker': self.worker_id,
+            'pid': os.getpid(),
+            'connections': self.connections() if self.connections is not None else None
+        }
+        try:
+            os.write(STATUS_FD, json.dumps(message).encode('utf-8') + b'\n')
+        except OSError as e:
+            # Канал закрыт — супервизор завершился, воркер не должен остаться сиротой
+            log.msg(f"Worker {self.worker_id} lost its supervisor ({str(e)}), shutting down")
+            self.stop()
+            if self.state != 'draining' and reactor.running:
+                reactor.stop()
+
+    def ready(self) -> None:
+        self.state = 'ready'
+        self._send()
+        if self._loop is None and self.interval > 0:
+            self._loop = task.LoopingCall(self._send)
+            self._loop.start(self.interval, now=False)
+
+    def draining(self) -> None:
+        self.state = 'draining'
+        self.stop()
+        self._send()
+
+    def stop(self) -> None:
+        if self._loop is not None and self._loop.running:
+            self._loop.stop()
+        self._loop = None
+
+
+class WorkerProcess(protocol.ProcessProtocol):
+
+    def __init__(self, supervisor: 'Supervisor', worker_id: int) -> None:
+        self.supervisor: 'Supervisor' = supervisor
+        self.worker_id: int = worker_id
+        self.pid: Optional[int] = None
+        self.state: str = 'starting'
+        self.connections: Optional[int] = None
+        self.started_at: float = time.monotonic()
+        self.last_heartbeat: Optional[float] = None
+        self.retiring: bool = False
+        self.ready: defer.Deferred[None] = defer.Deferred()
+        self.ended: defer.Deferred[None] = defer.Deferred()
+        self._buffer: bytes = b''
+
+    def connectionMade(self) -> None:
+        self.pid = self.transport.pid
+
+    def childDataReceived(self, childFD: int, data: bytes) -> None:
+        if childFD != STATUS_FD:
+            return
+        self._buffer += data
+        while b'\n' in self._buffer:
+            line, self._buffer = self._buffer.split(b'\n', 1)
+            try:
+                message: Dict[str, Any] = json.loads(line)
+            except ValueError:
+                continue
+
+            self.last_heartbeat = time.monotonic()
+            self.state = message.get('state', self.state)
+            self.connections = message.get('connections')
+            if self.state == 'ready' and not self.ready.called:
+                self.ready.callback(None)
+
+    def processEnded(self, reason: Failure) -> None:
+        self.state = 'exited'
+        self.pid = None
+        if not self.ready.called:
+            self.ready.errback(reason)
+            # Ошибку получает только ожидающий перезапуск, иначе она не считается необработанной
+            self.ready.addErrback(lambda failure: None)
+        self.ended.callback(None)
+        self.supervisor.worker_exited(self, reason)
+
+    def signal(self, name: str) -> None:
+        try:
+            self.transport.signalProcess(name)
+        except Exception:
+            # Процесс уже завершился
+            pass
+
+    def healthy(self, heartbeat_timeout: float) -> bool:
+        return (self.state == 'ready' and self.last_heartbeat is not None
+                and time.monotonic() - self.last_heartbeat <= heartbeat_timeout)
+
+    def stats(self, heartbeat_timeout: float) -> Dict[str, Any]:
+        now: float = time.monotonic()
+        return {
+            'worker': self.worker_id,
+            'pid': self.pid,
+            'state': self.state,
+            'healthy': self.healthy(heartbeat_timeout),
+            'uptime': round(now - self.started_at, 1),
+            'last_heartbeat': round(now - self.last_heartbeat, 1) if self.last_heartbeat is not None else None,
+            'connections': self.connections
+        }
+
+
+class SupervisorHealthHandler(Resource):
+    isLeaf = True
+
+    def __init__(self, supervisor: 'Supervisor') -> None:
+        super().__init__()
+        self.supervisor: 'Supervisor' = supervisor
+
+    def render_GET(self, request: Any) -> bytes:
+        health: Dict[str, Any] = self.supervisor.health()
+        request.setHeader(b'Content-Type', b'application/json')
+        if health['status'] == 'unhealthy':
+            request.setResponseCode(503)
+        return json.dumps(health).encode('utf-8')
+
+
+class Supervisor:
+
+    def __init__(self, workers: int, port: int = settings.HTTP_PORT,
+                 shutdown_timeout: float = settings.SERVER_SHUTDOWN_TIMEOUT) -> None:
+        self.worker_count: int = workers
+        self.port: int = port
+        self.shutdown_timeout: float = shutdown_timeout
+        self.heartbeat_timeout: float = settings.SERVER_HEARTBEAT_INTERVAL * 3
+        self.workers: Dict[int, WorkerProcess] = {}
+        self.socket: Optional[socket.socket] = None
+        self.health_port: Optional[Any] = None
+        self.restarts: int = 0
+        self.crashes: int = 0
+        self._respawn_delay: Dict[int, float] = {}
+        self._restarting: bool = False
+        self._stopping: bool = False
+
+    def _pool_budget(self) -> Dict[str, str]:
+        if settings.DB_POOL_TOTAL <= 0:
+            return {}
+        # Общий бюджет соединений делится между воркерами, чтобы не превысить max_connections
+        pool_max: int = max(1, settings.DB_POOL_TOTAL // self.worker_count)
+        return {
+            'DB_POOL_MAX': str(pool_max),
+            'DB_POOL_MIN': str(min(settings.DB_POOL_MIN, pool_max))
+        }
+
+    def _worker_env(self, worker_id: int) -> Dict[str, str]:
+        env: Dict[str, str] = dict(os.environ)
+        env.update(self._pool_budget())
+        env[WORKER_ID_ENV] = str(worker_id)
+        if self.socket is not None:
+            env[LISTEN_FD_ENV] = str(LISTEN_FD)
+        if worker_id != 0:
+            # Фоновая очистка версий нужна только в одном процессе
+            env['RETENTION_ENABLED'] = 'false'
+        return env
+
+    def spawn(self, worker_id: int) -> WorkerProcess:
+        worker: WorkerProcess = WorkerProcess(self, worker_id)
+        child_fds: Dict[int, Any] = {0: 'w', 1: 1, 2: 2, STATUS_FD: 'r'}
+        if self.socket is not None:
+            child_fds[LISTEN_FD] = self.socket.fileno()
+
+        reactor.spawnProcess(
+            worker,
+            sys.executable,
+            [sys.executable, '-m', 'src.config.main'],
+            env=self._worker_env(worker_id),
+            path=PROJECT_ROOT,
+            childFDs=child_fds
+        )
+        worker.transport.closeStdin()
+        log.msg(f"Started worker {worker_id} (pid {worker.pid})")
+        return worker
+
+    @defer.inlineCallbacks
+    def run_migrations(self) -> defer.Deferred[None]:
+        # Миграции выполняются один раз до запуска воркеров
+        pool: Any = db_manager.connect()
+        try:
+            yield db_manager.test_connection()
+            yield MigrationManager(pool, db_manager.open_connection).run_all_migrations()
+            log.msg("Migrations completed")
+        finally:
+            yield db_manager.close()
+
+    @defer.inlineCallbacks
+    def start(self) -> defer.Deferred[None]:
+        yield self.run_migrations()
+
+        if not settings.SERVER_REUSE_PORT:
+            self.socket = create_listening_socket(self.port)
+
+        for worker_id in range(self.worker_count):
+            self.workers[worker_id] = self.spawn(worker_id)
+
+        if settings.SUPERVISOR_HEALTH_PORT:
+            self.health_port = reactor.listenTCP(settings.SUPERVISOR_HEALTH_PORT, Site(SupervisorHealthHandler(self)))
+
+        signal.signal(signal.SIGHUP, lambda signum, frame: reactor.callFromThread(self.restart))
+
+        mode: str = 'SO_REUSEPORT' if self.socket is None else 'shared socket'
+        log.msg(f"Supervisor started {self.worker_count} workers on port {self.port} ({mode})")
+
+    @defer.inlineCallbacks
+    def terminate(self, worker: WorkerProcess) -> defer.Deferred[None]:
+        worker.retiring = True
+        if worker.ended.called:
+            return
+        worker.signal('TERM')
+        killer: Any = reactor.callLater(self.shutdown_timeout, worker.signal, 'KILL')
+        try:
+            yield worker.ended
+        finally:
+            if killer.active():
+                killer.cancel()
+
+    @defer.inlineCallbacks
+    def restart(self) -> defer.Deferred[None]:
+        """Поочерёдный перезапуск: старый воркер останавливается только после готовности замены."""
+        if self._restarting or self._stopping:
+            return
+        self._restarting = True
+        log.msg("Rolling restart of workers requested")
+        try:
+            for worker_id in sorted(self.workers):
+                if self._stopping:
+                    return
+                old: WorkerProcess = self.workers[worker_id]
+                replacement: WorkerProcess = self.spawn(worker_id)
+                try:
+                    yield replacement.ready.addTimeout(self.shutdown_timeout, reactor)
+                except Exception as e:
+                    log.err(f"Replacement for worker {worker_id} did not become ready, aborting restart: {str(e)}")
+                    yield self.terminate(replacement)
+                    return
+
+                self.workers[worker_id] = replacement
+                yield self.terminate(old)
+                self.restarts += 1
+            log.msg("Rolling restart completed")
+        finally:
+            self._restarting = False
+
+    def worker_exited(self, worker: WorkerProcess, reason: Failure) -> None:
+        if worker.retiring or self._stopping or self.workers.get(worker.worker_id) is not worker:
+            return
+
+        self.crashes += 1
+        # Быстро падающий воркер перезапускается с нарастающей задержкой
+        quick: bool = time.monotonic() - worker.started_at < 10
+        delay: float = min(self._respawn_delay.get(worker.worker_id, 0.5) * 2, MAX_RESPAWN_DELAY) if quick else 1.0
+        self._respawn_delay[worker.worker_id] = delay
+        log.msg(f"Worker {worker.worker_id} exited unexpectedly ({reason.getErrorMessage()}), "
+                f"respawning in {delay:.1f}s")
+        reactor.callLater(delay, self._respawn, worker)
+
+    def _respawn(self, worker: WorkerProcess) -> None:
+        if self._stopping or self.workers.get(worker.worker_id) is not worker:
+            return
+        self.workers[worker.worker_id] = self.spawn(worker.worker_id)
+
+    @defer.inlineCallbacks
+    def stop(self) -> defer.Deferred[None]:
+        self._stopping = True
+        if self.health_port is not None:
+            yield self.health_port.stopListening()
+        yield defer.DeferredList([self.terminate(worker) for worker in self.workers.values()])
+        if self.socket is not None:
+            self.socket.close()
+            self.socket = None
+        log.msg("Supervisor shutdown completed")
+
+    def health(self) -> Dict[str, Any]:
+        workers: List[Dict[str, Any]] = [
+            self.workers[worker_id].stats(self.heartbeat_timeout) for worker_id in sorted(self.workers)
+        ]
+        healthy: int = sum(1 for worker in workers if worker['healthy'])
+        if healthy == len(workers):
+            status: str = 'healthy'
+        elif healthy:
+            status = 'degraded'
+        else:
+            status = 'unhealthy'
+
+        return {
+            'status': status,
+            'service': 'config-service',
+            'workers_total': len(workers),
+            'workers_healthy': healthy,
+            'restarts': self.restarts,
+            'crashes': self.crashes,
+            'restarting': self._restarting,
+            'workers': workers
+        }
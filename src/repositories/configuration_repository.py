@@ -1,32 +1,513 @@
-from typing import Optional, Dict, Any, List, Tuple
+import json
+import random
+from datetime import datetime
+from typing import Optional, Dict, Any, Callable, List, Tuple
 
-from twisted.internet import defer
+from twisted.python import log
+from twisted.internet import defer, reactor, task
 from twisted.enterprise.adbapi import ConnectionPool
 
+from src.config.settings import settings
+from src.utils.json_diff import apply_json_diff, diff_json
+from src.utils.json_path import MISSING, extract_json_path
+from src.repositories.write_batcher import WriteBatcher
+from src.repositories.transaction import Statement, Steps, run_steps, run_transaction
+
+
+RETRYABLE_SQLSTATES: Tuple[str, ...] = ('40001', '40P01')
+UNIQUE_VIOLATION: str = '23505'
+# Подготовленный запрос потерян (новое соединение, DISCARD ALL) или устарел после изменения схемы
+REPREPARE_SQLSTATES: Tuple[str, ...] = ('26000', '0A000')
+
+# Тело версии хранится либо в строке, либо в общем хранилище по хешу содержимого
+PAYLOAD_JOIN: str = "LEFT JOIN config_payloads p ON c.payload IS NULL AND p.hash = c.content_hash"
+PAYLOAD: str = "COALESCE(c.payload, p.payload)"
+
+# Цепочка от запрошенной версии через base_version до ближайшей полной копии
+VERSION_CHAIN_SQL: str = f"""
+    WITH RECURSIVE chain AS (
+        SELECT c.id, c.version, c.base_version, c.delta, {PAYLOAD} AS payload, c.created_at, 0 AS depth
+        FROM configurations c {PAYLOAD_JOIN}
+        WHERE c.service = %s AND c.version = %s
+        UNION ALL
+        SELECT c.id, c.version, c.base_version, c.delta, {PAYLOAD}, c.created_at, chain.depth + 1
+        FROM chain
+        JOIN configurations c ON c.service = %s AND c.version = chain.base_version
+        {PAYLOAD_JOIN}
+        WHERE chain.payload IS NULL
+    )
+    SELECT id, version, delta::text, payload::text, created_at, pg_column_size(payload)
+    FROM chain
+    ORDER BY depth
+"""
+
+# Горячие запросы чтения; на пуле adbapi они подготавливаются один раз на соединение
+STATEMENTS: Dict[str, str] = {
+    'config_latest': f"""
+        SELECT c.id, c.version, {PAYLOAD}::text, c.created_at, pg_column_size({PAYLOAD})
+        FROM configurations c {PAYLOAD_JOIN}
+        WHERE c.service = %s
+        ORDER BY c.version DESC
+        LIMIT 1
+    """,
+    'config_version_chain': VERSION_CHAIN_SQL,
+    'config_latest_version': "SELECT version FROM configurations WHERE service = %s ORDER BY version DESC LIMIT 1",
+    'config_version_exists': "SELECT version FROM configurations WHERE service = %s AND version = %s",
+    'config_history_page': """
+        SELECT version, created_at
+        FROM configurations
+        WHERE service = %s AND version < %s
+        ORDER BY version DESC
+        LIMIT %s
+    """
+}
+MAX_VERSION: int = 2 ** 31 - 1
+
+
+def prepare_statements(connection: Any, deallocate: bool = False) -> None:
+    cursor: Any = connection.cursor()
+    try:
+        if deallocate:
+            cursor.execute("DEALLOCATE ALL")
+        for name, statement in STATEMENTS.items():
+            parts: List[str] = statement.split('%s')
+            body: str = parts[0] + ''.join(f"${index}{part}" for index, part in enumerate(parts[1:], 1))
+            cursor.execute(f"PREPARE {name} AS {body}")
+        connection.commit()
+    except Exception as e:
+        connection.rollback()
+        if deallocate:
+            raise
+        # До применения миграций таблиц ещё нет; запросы подготовятся при первом EXECUTE
+        log.msg(f"Statement preparation postponed: {str(e)}")
+    finally:
+        cursor.close()
+
+
+def statement_sql(name: str, count: int, prepared: bool = False) -> str:
+    if prepared:
+        return f"EXECUTE {name}({', '.join(['%s'] * count)})"
+    return STATEMENTS[name]
+
+
+def execute_statement(cursor: Any, name: str, params: Tuple[Any, ...], prepared: bool = False) -> None:
+    cursor.execute(statement_sql(name, len(params), prepared), params)
+
+
+def fetch_statement(cursor: Any, name: str, params: Tuple[Any, ...], prepared: bool = False) -> List[Tuple[Any, ...]]:
+    execute_statement(cursor, name, params, prepared)
+    return cursor.fetchall()
+
+
+def sqlstate(error: Exception) -> Optional[str]:
+    return getattr(error, 'pgcode', None) or getattr(error, 'sqlstate', None)
+
+
+def allocate_steps(records: List[Dict[str, Any]]) -> Steps:
+    explicit: Dict[str, int] = {}
+    auto: Dict[str, int] = {}
+    for record in records:
+        if record.get('version') is not None:
+            explicit[record['service']] = max(explicit.get(record['service'], 0), record['version'])
+        else:
+            auto[record['service']] = auto.get(record['service'], 0) + 1
+
+    # Строки счётчиков блокируются в одном порядке, чтобы избежать взаимных блокировок
+    if explicit:
+        yield Statement(
+            """INSERT INTO service_versions (service, last_version) VALUES %s
+               ON CONFLICT (service) DO UPDATE
+               SET last_version = GREATEST(service_versions.last_version, EXCLUDED.last_version)""",
+            sorted(explicit.items()),
+            template="(%s, %s)"
+        )
+    if not auto:
+        return
+
+    rows: List[Tuple[Any, ...]] = yield Statement(
+        """INSERT INTO service_versions (service, last_version) VALUES %s
+           ON CONFLICT (service) DO UPDATE
+           SET last_version = service_versions.last_version + EXCLUDED.last_version
+           RETURNING service, last_version""",
+        sorted(auto.items()),
+        fetch='all',
+        template="(%s, %s)"
+    )
+    next_versions: Dict[str, int] = {row[0]: row[1] - auto[row[0]] for row in rows}
+    for record in records:
+        if record.get('version') is None:
+            next_versions[record['service']] += 1
+            record['version'] = next_versions[record['service']]
+
+
+def build_version(rows: List[Tuple[Any, ...]], service: str, version: int) -> Optional[Tuple[Any, ...]]:
+    if not rows:
+        return None
+
+    base: Tuple[Any, ...] = rows[-1]
+    if base[3] is None:
+        raise RuntimeError(f"Version {version} of service {service} cannot be reconstructed: broken delta chain")
+    if len(rows) == 1:
+        return base[0], base[1], base[3], base[4], base[5]
+
+    document: Any = json.loads(base[3])
+    for row in reversed(rows[:-1]):
+        document = apply_json_diff(document, json.loads(row[2]), in_place=True)
+    payload_text: str = json.dumps(document, ensure_ascii=False)
+    return rows[0][0], rows[0][1], payload_text, rows[0][4], len(payload_text)
+
+
+def version_steps(service: str, version: int, prepared: bool = False) -> Steps:
+    params: Tuple[Any, ...] = (service, version, service)
+    rows: List[Tuple[Any, ...]] = yield Statement(
+        statement_sql('config_version_chain', len(params), prepared), params, fetch='all'
+    )
+    return build_version(rows, service, version)
+
+
+def fetch_version(txn: Any, service: str, version: int, prepared: bool = False) -> Optional[Tuple[Any, ...]]:
+    return run_steps(txn, version_steps(service, version, prepared))
+
+
+def compact_steps(service: str, version: int, payload_json: Optional[str]) -> Steps:
+    if payload_json is None or settings.CONFIG_SNAPSHOT_INTERVAL <= 1:
+        return
+
+    previous: Optional[Tuple[Any, ...]] = yield Statement(
+        """SELECT version, payload::text FROM configurations
+           WHERE service = %s AND version < %s
+           ORDER BY version DESC
+           LIMIT 1
+           FOR UPDATE""",
+        (service, version),
+        fetch='one'
+    )
+    if previous is None or previous[1] is None:
+        return
+
+    # Не больше CONFIG_SNAPSHOT_INTERVAL - 1 дельт подряд между полными копиями
+    deltas: Tuple[Any, ...] = yield Statement(
+        """SELECT count(*) FROM configurations
+           WHERE service = %s AND version < %s AND delta IS NOT NULL
+             AND version > COALESCE(
+                 (SELECT max(version) FROM configurations
+                  WHERE service = %s AND version < %s AND delta IS NULL), 0)""",
+        (service, previous[0], service, previous[0]),
+        fetch='one'
+    )
+    if deltas[0] + 1 >= settings.CONFIG_SNAPSHOT_INTERVAL:
+        return
+
+    delta: List[Dict[str, Any]] = diff_json(json.loads(payload_json), json.loads(previous[1]))
+    yield Statement(
+        """UPDATE configurations SET payload = NULL, delta = %s::jsonb, base_version = %s
+           WHERE service = %s AND version = %s""",
+        (json.dumps(delta), version, service, previous[0])
+    )
+
+
+def prune_steps(service: str, keep_last: int, max_age_days: int, limit: int) -> Steps:
+    conditions: List[str] = ["c.service = %s"]
+    params: List[Any] = [service]
+    if keep_last > 0:
+        conditions.append(
+            "c.version <= (SELECT version FROM configurations WHERE service = %s ORDER BY version DESC OFFSET %s LIMIT 1)"
+        )
+        params.extend([service, keep_last])
+    else:
+        conditions.append("c.version < (SELECT max(version) FROM configurations WHERE service = %s)")
+        params.append(service)
+    if max_age_days > 0:
+        conditions.append("c.created_at < NOW() - %s * INTERVAL '1 day'")
+        params.append(max_age_days)
+    params.append(limit)
+
+    rows: List[Tuple[Any, ...]] = yield Statement(
+        f"""SELECT c.version FROM configurations c
+            WHERE {' AND '.join(conditions)}
+              AND NOT EXISTS (
+                  SELECT 1 FROM pinned_versions pv WHERE pv.service = c.service AND pv.version = c.version
+              )
+            ORDER BY c.version
+            LIMIT %s
+            FOR UPDATE SKIP LOCKED""",
+        tuple(params),
+        fetch='all'
+    )
+    versions: List[int] = [row[0] for row in rows]
+    if not versions:
+        return versions
+
+    # Оставшиеся дельты, опирающиеся на удаляемые версии, сначала разворачиваются в полные копии
+    dependents: List[Tuple[Any, ...]] = yield Statement(
+        """SELECT version FROM configurations
+           WHERE service = %s AND base_version = ANY(%s) AND NOT (version = ANY(%s))""",
+        (service, versions, versions),
+        fetch='all'
+    )
+    for (dependent,) in dependents:
+        row: Optional[Tuple[Any, ...]] = yield from version_steps(service, dependent)
+        yield Statement(
+            """UPDATE configurations SET payload = %s::jsonb, delta = NULL, base_version = NULL
+               WHERE service = %s AND version = %s""",
+            (row[2], service, dependent)
+        )
+
+    yield Statement("DELETE FROM configurations WHERE service = %s AND version = ANY(%s)", (service, versions))
+    return versions
+
+
+def mark_unchanged_steps(records: List[Dict[str, Any]]) -> Steps:
+    services: List[str] = sorted({
+        record['service'] for record in records
+        if record.get('version') is None and record.get('content_hash')
+    })
+    if not services:
+        return
+
+    rows: List[Tuple[Any, ...]] = yield Statement(
+        """SELECT c.service, c.version, c.id, c.created_at, c.content_hash
+           FROM service_versions sv
+           JOIN configurations c ON c.service = sv.service AND c.version = sv.last_version
+           WHERE sv.service = ANY(%s)""",
+        (services,),
+        fetch='all'
+    )
+    latest: Dict[str, Optional[Tuple[Any, ...]]] = {row[0]: row[1:] for row in rows}
+
+    for record in records:
+        current: Optional[Tuple[Any, ...]] = latest.get(record['service'])
+        if record.get('version') is None and current is not None and current[3] == record.get('content_hash'):
+            record['status'] = 'unchanged'
+            record['version'], record['id'], record['created_at'] = current[:3]
+        else:
+            # Последующие записи сравниваются с ещё не вставленной версией, поэтому не дедуплицируются
+            latest[record['service']] = None
+
+
+def store_payload_steps(records: List[Dict[str, Any]]) -> Steps:
+    payloads: Dict[str, str] = {
+        record['content_hash']: record['payload_json'] for record in records if record.get('content_hash')
+    }
+    if payloads:
+        yield Statement(
+            """INSERT INTO config_payloads (hash, payload) VALUES %s
+               ON CONFLICT (hash) DO UPDATE SET created_at = NOW()""",
+            sorted(payloads.items()),
+            template="(%s, %s::jsonb)"
+        )
+    for record in records:
+        if record.get('content_hash'):
+            record['payload_json'] = None
+
+
+def insert_steps(records: List[Dict[str, Any]], batch_size: int = 1000) -> Steps:
+    if settings.CONFIG_DEDUP_ENABLED:
+        yield from mark_unchanged_steps(records)
+    pending: List[Dict[str, Any]] = [record for record in records if record.get('status') != 'unchanged']
+
+    yield from allocate_steps(pending)
+    if settings.CONFIG_PAYLOAD_STORE_ENABLED:
+        yield from store_payload_steps(pending)
+
+    inserted: Dict[Tuple[str, int], Tuple[Any, ...]] = {}
+    for start in range(0, len(pending), batch_size):
+        batch: List[Dict[str, Any]] = pending[start:start + batch_size]
+        rows: List[Tuple[Any, ...]] = yield Statement(
+            """INSERT INTO configurations (service, version, payload, content_hash, created_at)
+               VALUES %s
+               ON CONFLICT (service, version) DO NOTHING
+               RETURNING service, version, id, created_at""",
+            [
+                (record['service'], record['version'], record['payload_json'], record.get('content_hash'))
+                for record in batch
+            ],
+            fetch='all',
+            template="(%s, %s, %s::jsonb, %s, NOW())",
+            page_size=batch_size
+        )
+        inserted.update(((row[0], row[1]), row[2:]) for row in rows)
+
+    latest: Dict[str, int] = {}
+    for record in pending:
+        row: Optional[Tuple[Any, ...]] = inserted.pop((record['service'], record['version']), None)
+        if row is not None:
+            record['status'] = 'inserted'
+            record['id'], record['created_at'] = row
+            latest[record['service']] = max(latest.get(record['service'], 0), record['version'])
+        else:
+            record['status'] = 'conflict'
+            record['error'] = f"Version {record['version']} already exists for service {record['service']}"
+
+    if settings.CONFIG_DELTA_ENABLED:
+        for record in sorted((record for record in pending if record['status'] == 'inserted'),
+                             key=lambda record: (record['service'], record['version'])):
+            yield from compact_steps(record['service'], record['version'], record['payload_json'])
+
+    for record in records:
+        record.pop('payload_json', None)
+
+    if settings.CONFIG_NOTIFY_ENABLED:
+        for service, version in latest.items():
+            yield Statement(
+                "SELECT pg_notify(%s, %s)",
+                (settings.CONFIG_NOTIFY_CHANNEL, json.dumps({'service': service, 'version': version}))
+            )
+
+    return records
+
+
+def insert_configs(txn: Any, records: List[Dict[str, Any]], batch_size: int = 1000) -> List[Dict[str, Any]]:
+    return run_steps(txn, insert_steps(records, batch_size))
+
 
 class ConfigurationRepository:
 
-    def __init__(self, db_pool: ConnectionPool) -> None:
+    def __init__(self, db_pool: ConnectionPool, read_pool: Optional[Any] = None) -> None:
         self.db_pool: ConnectionPool = db_pool
+        # Чтения идут на реплики; primary=True оставляет запрос на основном сервере
+        self.read_pool: Any = read_pool if read_pool is not None else db_pool
+        # Подготовленные запросы доступны, только если пул готовит их при открытии соединения
+        self.prepared: bool = getattr(db_pool, 'openfun', None) is prepare_statements
+        self.prepared_executions: int = 0
+        self.reprepares: int = 0
+        # Каждый экспорт держит отдельное соединение вне пула
+        self.export_slots: defer.DeferredSemaphore = defer.DeferredSemaphore(settings.EXPORT_MAX_CONCURRENT)
+        self.batcher: Optional[WriteBatcher] = None
+        if settings.WRITE_BATCH_ENABLED:
+            self.batcher = WriteBatcher(self, settings.WRITE_BATCH_WINDOW_MS / 1000.0, settings.WRITE_BATCH_MAX_SIZE)
+
+    def _run_prepared(self, connection: Any, interaction: Any, *args: Any) -> Any:
+        cursor: Any = connection.cursor()
+        try:
+            try:
+                result: Any = interaction(cursor, *args, prepared=True)
+            except Exception as e:
+                if sqlstate(e) not in REPREPARE_SQLSTATES:
+                    raise
+                connection.rollback()
+                prepare_statements(connection, deallocate=True)
+                self.reprepares += 1
+                result = interaction(cursor, *args, prepared=True)
+            self.prepared_executions += 1
+            return result
+        finally:
+            cursor.close()
+
+    def reader(self, primary: bool = False) -> Any:
+        return self.db_pool if primary else self.read_pool
+
+    def query(self, name: str, params: Tuple[Any, ...],
+              primary: bool = False) -> defer.Deferred[List[Tuple[Any, ...]]]:
+        if self.prepared:
+            return self.reader(primary).runWithConnection(self._run_prepared, fetch_statement, name, params)
+        return self.reader(primary).runQuery(STATEMENTS[name], params)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'enabled': self.prepared,
+            'executions': self.prepared_executions,
+            'reprepares': self.reprepares
+        }
+
+    def open_connection(self) -> Any:
+        return self.read_pool.dbapi.connect(*self.read_pool.connargs, **self.read_pool.connkw)
 
     @defer.inlineCallbacks
-    def save(self, service: str, version: Optional[int], payload_json: str) -> defer.Deferred[Dict[str, Any]]:
-        def _save_config(txn: Any) -> Dict[str, Any]:
+    def run_write(self, steps: Callable[..., Steps], *args: Any, retry_unique: bool = False) -> defer.Deferred[Any]:
+        attempt: int = 0
+        while True:
+            try:
+                # Генератор шагов создаётся заново для каждой попытки
+                result: Any = yield run_transaction(self.db_pool, steps, *args)
+                break
+            except Exception as e:
+                state: Optional[str] = sqlstate(e)
+                retryable: bool = state in RETRYABLE_SQLSTATES or (state == UNIQUE_VIOLATION and retry_unique)
+                if not retryable or attempt >= settings.DB_WRITE_RETRIES:
+                    raise
+                attempt += 1
+                yield task.deferLater(reactor, random.uniform(0, 0.01 * 2 ** attempt), lambda: None)
+
+        defer.returnValue(result)
+
+    def save_batch(self, records: List[Dict[str, Any]]) -> defer.Deferred[List[Dict[str, Any]]]:
+        def _save_configs() -> Steps:
+            # Версии назначаются заново при каждой попытке
+            return insert_steps([dict(record) for record in records], len(records))
+
+        return self.run_write(_save_configs)
+
+    @defer.inlineCallbacks
+    def save(self, service: str, version: Optional[int], payload_json: str,
+             content_hash: Optional[str] = None) -> defer.Deferred[Dict[str, Any]]:
+        if self.batcher is not None:
+            result: Dict[str, Any] = yield self.batcher.save(service, version, payload_json, content_hash)
+            defer.returnValue(result)
+
+        def _save_config() -> Steps:
+            if settings.CONFIG_DEDUP_ENABLED and version is None and content_hash is not None:
+                existing: Optional[Tuple[Any, ...]] = yield Statement(
+                    """SELECT c.version, c.id, c.created_at
+                       FROM service_versions sv
+                       JOIN configurations c ON c.service = sv.service AND c.version = sv.last_version
+                       WHERE sv.service = %s AND c.content_hash = %s""",
+                    (service, content_hash),
+                    fetch='one'
+                )
+                if existing is not None:
+                    return {
+                        'id': existing[1],
+                        'service': service,
+                        'version': existing[0],
+                        'created_at': existing[2],
+                        'unchanged': True
+                    }
+
+            # Строка счётчика сериализует конкурирующие записи одного сервиса без конфликтов
             if version is None:
-                txn.execute(
-                    "SELECT COALESCE(MAX(version), 0) + 1 FROM configurations WHERE service = %s",
-                    (service,)
+                counter: Tuple[Any, ...] = yield Statement(
+                    """INSERT INTO service_versions (service, last_version) VALUES (%s, 1)
+                       ON CONFLICT (service) DO UPDATE SET last_version = service_versions.last_version + 1
+                       RETURNING last_version""",
+                    (service,),
+                    fetch='one'
                 )
-                next_version: int = txn.fetchone()[0]
+                next_version: int = counter[0]
             else:
-                next_version: int = version
+                yield Statement(
+                    """INSERT INTO service_versions (service, last_version) VALUES (%s, %s)
+                       ON CONFLICT (service) DO UPDATE
+                       SET last_version = GREATEST(service_versions.last_version, EXCLUDED.last_version)""",
+                    (service, version)
+                )
+                next_version = version
+
+            stored_payload: Optional[str] = payload_json
+            if settings.CONFIG_PAYLOAD_STORE_ENABLED and content_hash is not None:
+                yield Statement(
+                    """INSERT INTO config_payloads (hash, payload) VALUES (%s, %s)
+                       ON CONFLICT (hash) DO UPDATE SET created_at = NOW()""",
+                    (content_hash, payload_json)
+                )
+                stored_payload = None
 
-            txn.execute(
-                """INSERT INTO configurations (service, version, payload, created_at) 
-                   VALUES (%s, %s, %s, NOW()) RETURNING id, created_at""",
-                (service, next_version, payload_json)  # Принимаем уже готовый JSON
+            result: Tuple[Any, ...] = yield Statement(
+                """INSERT INTO configurations (service, version, payload, content_hash, created_at) 
+                   VALUES (%s, %s, %s, %s, NOW()) RETURNING id, created_at""",
+                (service, next_version, stored_payload, content_hash),  # Принимаем уже готовый JSON
+                fetch='one'
             )
-            result: Tuple[Any, ...] = txn.fetchone()
+
+            if settings.CONFIG_DELTA_ENABLED:
+                yield from compact_steps(service, next_version, stored_payload)
+
+            if settings.CONFIG_NOTIFY_ENABLED:
+                yield Statement(
+                    "SELECT pg_notify(%s, %s)",
+                    (settings.CONFIG_NOTIFY_CHANNEL, json.dumps({'service': service, 'version': next_version}))
+                )
+
             return {
                 'id': result[0],
                 'service': service,
@@ -35,57 +516,290 @@ class ConfigurationRepository:
             }
 
         try:
-            result: Dict[str, Any] = yield self.db_pool.runInteraction(_save_config)
+            result: Dict[str, Any] = yield self.run_write(_save_config, retry_unique=version is None)
             defer.returnValue(result)
         except Exception as e:
             if 'duplicate key' in str(e):
                 raise ValueError(f"Version {version} already exists for service {service}")
             raise e
 
+    def bulk_save(self, records: List[Dict[str, Any]], batch_size: int = 1000) -> defer.Deferred[List[Dict[str, Any]]]:
+        return run_transaction(self.db_pool, insert_steps, records, batch_size)
+
+    @defer.inlineCallbacks
+    def get(self, service: str, version: Optional[int] = None, raw: bool = False,
+            primary: bool = False) -> defer.Deferred[Optional[Dict[str, Any]]]:
+        if version:
+            # Версия может храниться дельтой; на asyncio-пуле цепочка читается без потоков
+            if self.prepared:
+                row: Optional[Tuple[Any, ...]] = yield self.reader(primary).runWithConnection(
+                    self._run_prepared, fetch_version, service, version
+                )
+            else:
+                row = yield run_transaction(self.reader(primary), version_steps, service, version)
+            if row is None:
+                defer.returnValue(None)
+        else:
+            # Последняя версия всегда хранится полностью
+            result: List[Tuple[Any, ...]] = yield self.query('config_latest', (service,), primary)
+            if not result:
+                defer.returnValue(None)
+            row = result[0]
+
+        config: Dict[str, Any] = {
+            'id': row[0],
+            'service': service,
+            'version': row[1],
+            'created_at': row[3],
+            'size': row[4]
+        }
+        if raw:
+            # JSONB уже в каноническом текстовом виде, отдаём как есть
+            config['payload_bytes'] = row[2].encode('utf-8')
+            config['size'] = len(config['payload_bytes'])
+        else:
+            config['payload'] = json.loads(row[2])
+        defer.returnValue(config)
+
+    @defer.inlineCallbacks
+    def get_many(self, latest: List[str], pinned: List[Tuple[str, int]],
+                 primary: bool = False) -> defer.Deferred[Dict[Tuple[str, Optional[int]], Dict[str, Any]]]:
+        sql: str = f"""
+            (
+                SELECT DISTINCT ON (c.service) NULL::integer, c.id, c.service, c.version, {PAYLOAD}::text, c.created_at
+                FROM configurations c {PAYLOAD_JOIN}
+                WHERE c.service = ANY(%s)
+                ORDER BY c.service, c.version DESC
+            )
+            UNION ALL
+            (
+                SELECT c.version, c.id, c.service, c.version, {PAYLOAD}::text, c.created_at
+                FROM configurations c
+                JOIN unnest(%s::text[], %s::integer[]) AS r(service, version)
+                  ON c.service = r.service AND c.version = r.version
+                {PAYLOAD_JOIN}
+            )
+        """
+        params: Tuple[Any, ...] = (
+            list(latest),
+            [service for service, _ in pinned],
+            [version for _, version in pinned]
+        )
+        result: List[Tuple[Any, ...]] = yield self.reader(primary).runQuery(sql, params)
+
+        configs: Dict[Tuple[str, Optional[int]], Dict[str, Any]] = {}
+        deltas: List[Tuple[str, int]] = []
+        for row in result:
+            if row[4] is None:
+                deltas.append((row[2], row[3]))
+                continue
+            payload_bytes: bytes = row[4].encode('utf-8')
+            configs[(row[2], row[0])] = {
+                'id': row[1],
+                'service': row[2],
+                'version': row[3],
+                'payload_bytes': payload_bytes,
+                'created_at': row[5],
+                'size': len(payload_bytes)
+            }
+
+        if deltas:
+            rebuilt: List[Optional[Dict[str, Any]]] = yield defer.gatherResults([
+                self.get(service, version, raw=True, primary=primary) for service, version in deltas
+            ], consumeErrors=True)
+            for (service, version), config in zip(deltas, rebuilt):
+                if config is not None:
+                    configs[(service, version)] = config
+        defer.returnValue(configs)
+
     @defer.inlineCallbacks
-    def get(self, service: str, version: Optional[int] = None) -> defer.Deferred[Optional[Dict[str, Any]]]:
+    def get_subtree(self, service: str, version: Optional[int], path: List[str],
+                    primary: bool = False) -> defer.Deferred[Optional[Dict[str, Any]]]:
+        # Через соединение передаётся только запрошенное поддерево
         if version:
-            sql: str = """
-                SELECT id, service, version, payload, created_at 
-                FROM configurations 
-                WHERE service = %s AND version = %s
+            sql: str = f"""
+                SELECT c.version, ({PAYLOAD} #> %s)::text, {PAYLOAD} IS NULL
+                FROM configurations c {PAYLOAD_JOIN}
+                WHERE c.service = %s AND c.version = %s
             """
-            params: Tuple[str, int] = (service, version)
+            params: Tuple[Any, ...] = (path, service, version)
         else:
-            sql: str = """
-                SELECT id, service, version, payload, created_at 
-                FROM configurations 
-                WHERE service = %s 
-                ORDER BY version DESC 
+            sql: str = f"""
+                SELECT c.version, ({PAYLOAD} #> %s)::text, {PAYLOAD} IS NULL
+                FROM configurations c {PAYLOAD_JOIN}
+                WHERE c.service = %s
+                ORDER BY c.version DESC
                 LIMIT 1
             """
-            params: Tuple[str, ...] = (service,)
-
-        result: List[Tuple[Any, ...]] = yield self.db_pool.runQuery(sql, params)
+            params: Tuple[Any, ...] = (path, service)
 
+        result: List[Tuple[Any, ...]] = yield self.reader(primary).runQuery(sql, params)
         if not result:
             defer.returnValue(None)
 
         row: Tuple[Any, ...] = result[0]
-        config: Dict[str, Any] = {
-            'id': row[0],
-            'service': row[1],
-            'version': row[2],
-            'payload': row[3],
-            'created_at': row[4]
-        }
-        defer.returnValue(config)
+        if row[2]:
+            # Дельта: восстанавливаем версию целиком и извлекаем поддерево на стороне приложения
+            config: Optional[Dict[str, Any]] = yield self.get(service, row[0], primary=primary)
+            node: Any = extract_json_path(config['payload'], path) if config is not None else MISSING
+            defer.returnValue({
+                'version': row[0],
+                'subtree_bytes': json.dumps(node, ensure_ascii=False).encode('utf-8') if node is not MISSING else None
+            })
+
+        defer.returnValue({
+            'version': row[0],
+            'subtree_bytes': row[1].encode('utf-8') if row[1] is not None else None
+        })
+
+    @defer.inlineCallbacks
+    def search_latest(self, contains_json: str, limit: int = 100,
+                      include_payload: bool = False) -> defer.Deferred[List[Dict[str, Any]]]:
+        # Отдельные ветви для встроенных и общих тел, чтобы каждая использовала свой GIN-индекс
+        inline_column: str = "c.payload::text" if include_payload else "NULL"
+        shared_column: str = "p.payload::text" if include_payload else "NULL"
+        sql: str = f"""
+            SELECT service, version, payload FROM (
+                SELECT c.service, c.version, {inline_column} AS payload
+                FROM configurations c
+                JOIN service_versions sv ON sv.service = c.service AND sv.last_version = c.version
+                WHERE c.payload @> %s::jsonb
+                UNION ALL
+                SELECT c.service, c.version, {shared_column}
+                FROM config_payloads p
+                JOIN configurations c ON c.content_hash = p.hash AND c.payload IS NULL
+                JOIN service_versions sv ON sv.service = c.service AND sv.last_version = c.version
+                WHERE p.payload @> %s::jsonb
+            ) matches
+            ORDER BY service
+            LIMIT %s
+        """
+        result: List[Tuple[Any, ...]] = yield self.read_pool.runQuery(sql, (contains_json, contains_json, limit))
+
+        matches: List[Dict[str, Any]] = []
+        for row in result:
+            match: Dict[str, Any] = {'service': row[0], 'version': row[1]}
+            if include_payload:
+                match['payload_bytes'] = row[2].encode('utf-8')
+            matches.append(match)
+        defer.returnValue(matches)
 
     @defer.inlineCallbacks
-    def get_history(self, service: str, limit: int = 10) -> defer.Deferred[Optional[List[Dict[str, Any]]]]:
-        sql: str = """
+    def get_retention_policies(self, default_keep_last: int = 0,
+                               default_max_age_days: int = 0) -> defer.Deferred[List[Tuple[str, int, int]]]:
+        result: List[Tuple[Any, ...]] = yield self.db_pool.runQuery(
+            """SELECT sv.service, COALESCE(rp.keep_last, %s), COALESCE(rp.max_age_days, %s)
+               FROM service_versions sv
+               LEFT JOIN retention_policies rp ON rp.service = sv.service
+               ORDER BY sv.service""",
+            (default_keep_last, default_max_age_days)
+        )
+        defer.returnValue([(row[0], row[1], row[2]) for row in result])
+
+    def prune_versions(self, service: str, keep_last: int, max_age_days: int,
+                       limit: int) -> defer.Deferred[List[int]]:
+        return self.run_write(prune_steps, service, keep_last, max_age_days, limit)
+
+    @defer.inlineCallbacks
+    def prune_payloads(self, limit: int, grace_seconds: int = 3600) -> defer.Deferred[int]:
+        # Запись, повторно использующая тело, обновляет created_at и держит блокировку строки
+        result: List[Tuple[Any, ...]] = yield self.db_pool.runQuery(
+            """DELETE FROM config_payloads WHERE hash IN (
+                   SELECT p.hash FROM config_payloads p
+                   WHERE p.created_at < NOW() - %s * INTERVAL '1 second'
+                     AND NOT EXISTS (SELECT 1 FROM configurations c WHERE c.content_hash = p.hash)
+                   LIMIT %s
+                   FOR UPDATE SKIP LOCKED
+               )
+               RETURNING hash""",
+            (grace_seconds, limit)
+        )
+        defer.returnValue(len(result))
+
+    @defer.inlineCallbacks
+    def get_retention(self, service: str) -> defer.Deferred[Dict[str, Any]]:
+        policy: List[Tuple[Any, ...]] = yield self.db_pool.runQuery(
+            "SELECT keep_last, max_age_days FROM retention_policies WHERE service = %s", (service,)
+        )
+        pinned: List[Tuple[Any, ...]] = yield self.db_pool.runQuery(
+            "SELECT version FROM pinned_versions WHERE service = %s ORDER BY version", (service,)
+        )
+        defer.returnValue({
+            'keep_last': policy[0][0] if policy else None,
+            'max_age_days': policy[0][1] if policy else None,
+            'pinned': [row[0] for row in pinned]
+        })
+
+    def set_retention(self, service: str, keep_last: Optional[int], max_age_days: Optional[int],
+                      pinned: Optional[List[int]] = None) -> defer.Deferred[None]:
+        def _set_retention() -> Steps:
+            yield Statement(
+                """INSERT INTO retention_policies (service, keep_last, max_age_days, updated_at)
+                   VALUES (%s, %s, %s, NOW())
+                   ON CONFLICT (service) DO UPDATE
+                   SET keep_last = EXCLUDED.keep_last, max_age_days = EXCLUDED.max_age_days, updated_at = NOW()""",
+                (service, keep_last, max_age_days)
+            )
+            if pinned is not None:
+                yield Statement("DELETE FROM pinned_versions WHERE service = %s", (service,))
+                if pinned:
+                    yield Statement(
+                        "INSERT INTO pinned_versions (service, version) VALUES %s ON CONFLICT DO NOTHING",
+                        [(service, version) for version in pinned],
+                        template="(%s, %s)"
+                    )
+
+        return self.run_write(_set_retention)
+
+    @defer.inlineCallbacks
+    def get_version(self, service: str, version: Optional[int] = None,
+                    primary: bool = False) -> defer.Deferred[Optional[int]]:
+        if version:
+            result: List[Tuple[Any, ...]] = yield self.query('config_version_exists', (service, version), primary)
+        else:
+            result = yield self.query('config_latest_version', (service,), primary)
+        defer.returnValue(result[0][0] if result else None)
+
+    @defer.inlineCallbacks
+    def get_history(self, service: str, limit: int = 10, before_version: Optional[int] = None,
+                    after_version: Optional[int] = None, created_from: Optional[datetime] = None,
+                    created_to: Optional[datetime] = None,
+                    primary: bool = False) -> defer.Deferred[Optional[List[Dict[str, Any]]]]:
+        if after_version is None and created_from is None and created_to is None:
+            # Обычная постраничная выборка истории идёт через подготовленный запрос
+            rows: List[Tuple[Any, ...]] = yield self.query(
+                'config_history_page',
+                (service, before_version if before_version is not None else MAX_VERSION, limit),
+                primary
+            )
+            defer.returnValue([{'version': row[0], 'created_at': row[1]} for row in rows])
+
+        conditions: List[str] = ["service = %s"]
+        params: List[Any] = [service]
+        if before_version is not None:
+            conditions.append("version < %s")
+            params.append(before_version)
+        if after_version is not None:
+            conditions.append("version > %s")
+            params.append(after_version)
+        if created_from is not None:
+            conditions.append("created_at >= %s")
+            params.append(created_from)
+        if created_to is not None:
+            conditions.append("created_at < %s")
+            params.append(created_to)
+        params.append(limit)
+
+        # Ключевая пагинация по индексу (service, version) без OFFSET
+        order: str = "ASC" if after_version is not None and before_version is None else "DESC"
+        sql: str = f"""
             SELECT version, created_at 
             FROM configurations 
-            WHERE service = %s 
-            ORDER BY version DESC 
+            WHERE {' AND '.join(conditions)} 
+            ORDER BY version {order} 
             LIMIT %s
         """
-        result: List[Tuple[Any, ...]] = yield self.db_pool.runQuery(sql, (service, limit))
+        result: List[Tuple[Any, ...]] = yield self.reader(primary).runQuery(sql, tuple(params))
 
         history: List[Dict[str, Any]] = [
             {
@@ -0,0 +1,81 @@
+from typing import Optional, Any, Callable, Generator, List, Tuple
+
+from psycopg2.extras import execute_values
+from twisted.internet import defer
+
+
+class Statement:
+    __slots__ = ('sql', 'params', 'fetch', 'template', 'page_size')
+
+    def __init__(self, sql: str, params: Optional[Any] = None, fetch: Optional[str] = None,
+                 template: Optional[str] = None, page_size: int = 100) -> None:
+        self.sql: str = sql
+        self.params: Optional[Any] = params
+        # None — без результата, 'one' — fetchone, 'all' — fetchall
+        self.fetch: Optional[str] = fetch
+        # Задан шаблон — params это строки для VALUES %s, как в execute_values
+        self.template: Optional[str] = template
+        self.page_size: int = page_size
+
+
+# Транзакция описывается генератором: он отдаёт запросы и получает их результаты,
+# поэтому одна реализация выполняется и курсором psycopg2 в потоке, и курсором psycopg 3 в цикле событий
+Steps = Generator[Statement, Any, Any]
+
+
+def execute(txn: Any, statement: Statement) -> Any:
+    if statement.template is not None:
+        return execute_values(txn, statement.sql, statement.params, template=statement.template,
+                              page_size=statement.page_size, fetch=statement.fetch is not None)
+    txn.execute(statement.sql, statement.params)
+    if statement.fetch == 'one':
+        return txn.fetchone()
+    if statement.fetch == 'all':
+        return txn.fetchall()
+    return None
+
+
+def run_steps(txn: Any, steps: Steps) -> Any:
+    result: Any = None
+    try:
+        while True:
+            result = execute(txn, steps.send(result))
+    except StopIteration as stop:
+        return stop.value
+
+
+async def execute_async(cursor: Any, statement: Statement) -> Any:
+    if statement.template is not None:
+        head, tail = statement.sql.split('%s', 1)
+        rows: List[Tuple[Any, ...]] = []
+        for start in range(0, len(statement.params), statement.page_size):
+            page: List[Any] = statement.params[start:start + statement.page_size]
+            values: str = ','.join(cursor.mogrify(statement.template, row) for row in page)
+            await cursor.execute(head + values + tail)
+            if statement.fetch is not None:
+                rows.extend(await cursor.fetchall())
+        return rows if statement.fetch is not None else None
+
+    await cursor.execute(statement.sql, statement.params)
+    if statement.fetch == 'one':
+        return await cursor.fetchone()
+    if statement.fetch == 'all':
+        return await cursor.fetchall()
+    return None
+
+
+async def run_steps_async(cursor: Any, steps: Steps) -> Any:
+    result: Any = None
+    try:
+        while True:
+            result = await execute_async(cursor, steps.send(result))
+    except StopIteration as stop:
+        return stop.value
+
+
+def run_transaction(pool: Any, steps: Callable[..., Steps], *args: Any) -> defer.Deferred[Any]:
+    # asyncio-пул выполняет шаги прямо в цикле событий, остальные пулы — через runInteraction в потоке
+    native: Optional[Callable[..., defer.Deferred[Any]]] = getattr(pool, 'runSteps', None)
+    if native is not None:
+        return native(steps, *args)
+    return pool.runInteraction(lambda txn: run_steps(txn, steps(*args)))
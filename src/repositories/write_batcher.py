@@ -0,0 +1,73 @@
+from typing import Optional, Dict, Any, List, Tuple
+
+from twisted.python import log
+from twisted.python.failure import Failure
+from twisted.internet import defer, reactor
+
+
+class WriteBatcher:
+
+    def __init__(self, repository: Any, window: float = 0.005, max_size: int = 100) -> None:
+        self.repository: Any = repository
+        self.window: float = window
+        self.max_size: int = max_size
+        self._pending: List[Tuple[Dict[str, Any], defer.Deferred]] = []
+        self._flush_call: Optional[Any] = None
+        self.batches: int = 0
+        self.writes: int = 0
+
+    def save(self, service: str, version: Optional[int], payload_json: str,
+             content_hash: Optional[str] = None) -> defer.Deferred[Dict[str, Any]]:
+        d: defer.Deferred[Dict[str, Any]] = defer.Deferred()
+        self._pending.append((
+            {'service': service, 'version': version, 'payload_json': payload_json, 'content_hash': content_hash}, d
+        ))
+
+        if len(self._pending) >= self.max_size:
+            self.flush()
+        elif self._flush_call is None:
+            self._flush_call = reactor.callLater(self.window, self.flush)
+        return d
+
+    def flush(self) -> None:
+        if self._flush_call is not None and self._flush_call.active():
+            self._flush_call.cancel()
+        self._flush_call = None
+
+        batch: List[Tuple[Dict[str, Any], defer.Deferred]] = self._pending
+        self._pending = []
+        if not batch:
+            return
+
+        self.batches += 1
+        self.writes += len(batch)
+        d: defer.Deferred[List[Dict[str, Any]]] = self.repository.save_batch([record for record, _ in batch])
+        d.addCallbacks(self._resolve, self._fail, callbackArgs=(batch,), errbackArgs=(batch,))
+
+    @staticmethod
+    def _resolve(results: List[Dict[str, Any]], batch: List[Tuple[Dict[str, Any], defer.Deferred]]) -> None:
+        for result, (_, d) in zip(results, batch):
+            if result['status'] in ('inserted', 'unchanged'):
+                d.callback({
+                    'id': result['id'],
+                    'service': result['service'],
+                    'version': result['version'],
+                    'created_at': result['created_at'],
+                    'unchanged': result['status'] == 'unchanged'
+                })
+            else:
+                d.errback(ValueError(f"Version {result['version']} already exists for service {result['service']}"))
+
+    @staticmethod
+    def _fail(failure: Failure, batch: List[Tuple[Dict[str, Any], defer.Deferred]]) -> None:
+        log.err(failure, f"Batched write of {len(batch)} configurations failed")
+        for _, d in batch:
+            d.errback(failure)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'batches': self.batches,
+            'writes': self.writes,
+            'pending': len(self._pending),
+            'avg_batch_size': round(self.writes / self.batches, 2) if self.batches else 0.0
+        }
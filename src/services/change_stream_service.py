@@ -0,0 +1,144 @@
+import json
+from typing import Optional, Dict, Any, Set
+
+from twisted.python import log
+from twisted.internet import defer, task
+
+from src.config.settings import settings
+
+
+class StreamSubscriber:
+    __slots__ = ('service', 'request', 'last_version')
+
+    def __init__(self, service: str, request: Any, last_version: int) -> None:
+        self.service: str = service
+        self.request: Any = request
+        self.last_version: int = last_version
+
+
+class ChangeStreamService:
+
+    KEEPALIVE: bytes = b': keepalive\n\n'
+
+    def __init__(self, config_service: Any, max_subscribers: int = settings.SSE_MAX_SUBSCRIBERS,
+                 keepalive_interval: float = settings.SSE_KEEPALIVE_INTERVAL) -> None:
+        self.config_service: Any = config_service
+        self.max_subscribers: int = max_subscribers
+        self.keepalive_interval: float = keepalive_interval
+        self._subscribers: Dict[str, Set[StreamSubscriber]] = {}
+        self._published: Dict[str, int] = {}
+        self._count: int = 0
+        self._keepalive: Optional[task.LoopingCall] = None
+        self.events_published: int = 0
+        config_service.change_observers.append(self.publish)
+
+    def start(self) -> None:
+        if self._keepalive is None and self.keepalive_interval > 0:
+            self._keepalive = task.LoopingCall(self._send_keepalive)
+            self._keepalive.start(self.keepalive_interval, now=False)
+
+    def stop(self) -> None:
+        if self._keepalive is not None and self._keepalive.running:
+            self._keepalive.stop()
+        self._keepalive = None
+        for subscribers in list(self._subscribers.values()):
+            for subscriber in list(subscribers):
+                if not subscriber.request.finished:
+                    subscriber.request.finish()
+
+    @property
+    def subscriber_count(self) -> int:
+        return self._count
+
+    def is_full(self) -> bool:
+        return self._count >= self.max_subscribers
+
+    @defer.inlineCallbacks
+    def subscribe(self, service: str, request: Any, last_version: int = 0) -> defer.Deferred[StreamSubscriber]:
+        subscriber: StreamSubscriber = StreamSubscriber(service, request, last_version)
+        self._subscribers.setdefault(service, set()).add(subscriber)
+        self._count += 1
+        request.notifyFinish().addBoth(lambda _: self._unsubscribe(subscriber))
+
+        self._write(subscriber, f"retry: {settings.SSE_RETRY_MS}\n\n".encode('utf-8'))
+
+        result: Optional[Dict[str, Any]] = yield self.config_service.get_raw_config(service)
+        if result is not None and result['version'] > subscriber.last_version:
+            self._deliver(subscriber, result['version'], self._encode_event(service, result))
+
+        defer.returnValue(subscriber)
+
+    def _unsubscribe(self, subscriber: StreamSubscriber) -> None:
+        subscribers: Optional[Set[StreamSubscriber]] = self._subscribers.get(subscriber.service)
+        if not subscribers or subscriber not in subscribers:
+            return
+        subscribers.discard(subscriber)
+        self._count -= 1
+        if not subscribers:
+            del self._subscribers[subscriber.service]
+            self._published.pop(subscriber.service, None)
+
+    @defer.inlineCallbacks
+    def publish(self, service: str, version: Optional[int] = None) -> defer.Deferred[None]:
+        if not self._subscribers.get(service):
+            return
+        # Локальная запись и её собственный NOTIFY приходят дважды
+        if version is not None and version <= self._published.get(service, 0):
+            return
+
+        try:
+            result: Optional[Dict[str, Any]] = yield self.config_service.get_raw_config(service, version)
+        except Exception:
+            log.err(None, f"Failed to load configuration for change stream of '{service}'")
+            return
+
+        if result is None:
+            return
+
+        event: bytes = self._encode_event(service, result)
+        # Версия считается опубликованной только после успешной загрузки, иначе повтор был бы отброшен;
+        # параллельные дубли отсекает last_version подписчика
+        if service in self._subscribers:
+            self._published[service] = max(self._published.get(service, 0), result['version'])
+        self.events_published += 1
+        for subscriber in list(self._subscribers.get(service, ())):
+            self._deliver(subscriber, result['version'], event)
+
+    def republish_all(self) -> None:
+        # После разрыва LISTEN уведомления потеряны: каждому сервису с подписчиками
+        # отправляется последняя версия, уже полученные отсекает last_version
+        for service in list(self._subscribers):
+            self.publish(service)
+
+    def _deliver(self, subscriber: StreamSubscriber, version: int, event: bytes) -> None:
+        if version <= subscriber.last_version:
+            return
+        subscriber.last_version = version
+        self._write(subscriber, event)
+
+    def _write(self, subscriber: StreamSubscriber, data: bytes) -> None:
+        if subscriber.request.finished:
+            self._unsubscribe(subscriber)
+            return
+        try:
+            subscriber.request.write(data)
+        except Exception:
+            self._unsubscribe(subscriber)
+
+    def _send_keepalive(self) -> None:
+        for subscribers in list(self._subscribers.values()):
+            for subscriber in list(subscribers):
+                self._write(subscriber, self.KEEPALIVE)
+
+    @staticmethod
+    def _encode_event(service: str, result: Dict[str, Any]) -> bytes:
+        header: str = f'id: {result["version"]}\nevent: config\ndata: {{"service": {json.dumps(service)}, ' \
+                      f'"version": {result["version"]}, "config": '
+        return header.encode('utf-8') + result['body'] + b'}\n\n'
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'subscribers': self._count,
+            'services': len(self._subscribers),
+            'events_published': self.events_published
+        }
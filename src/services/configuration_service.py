@@ -1,19 +1,127 @@
 import json
+import time
+import base64
+import hashlib
+from datetime import datetime
 
 from twisted.python import log
 from twisted.internet import defer
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Tuple, Callable
 
+from src.utils.cache import LRUCache
+from src.utils.singleflight import SingleFlight
+from src.utils.workers import worker_pool
+from src.utils.hashing import content_hash
+from src.utils.json_path import MISSING, extract_json_path
+from src.utils.json_diff import diff_json
+from src.config.settings import settings
 from src.services.template_service import TemplateService
 from src.validators.config_validator import ConfigValidator
 from src.repositories.configuration_repository import ConfigurationRepository
 
 
+def prepare_payload(yaml_content: str) -> Tuple[Optional[int], str, str]:
+    yaml_valid: bool
+    yaml_result: Any
+    yaml_valid, yaml_result = ConfigValidator.validate_yaml(yaml_content)
+    if not yaml_valid:
+        raise ValueError(yaml_result)
+
+    config_data: Dict[str, Any] = yaml_result
+
+    struct_valid: bool
+    struct_errors: List[str]
+    struct_valid, struct_errors = ConfigValidator.validate_config_structure(config_data)
+    if not struct_valid:
+        raise ValueError(f"Configuration validation failed: {'; '.join(struct_errors)}")
+
+    config_version: Optional[int] = ConfigValidator.extract_version_from_config(config_data)
+    return config_version, json.dumps(config_data), content_hash(config_data)
+
+
 class ConfigService:
 
-    def __init__(self, db_pool: Any) -> None:
-        self.repository: ConfigurationRepository = ConfigurationRepository(db_pool)
+    def __init__(self, db_pool: Any, read_pool: Optional[Any] = None) -> None:
+        self.repository: ConfigurationRepository = ConfigurationRepository(db_pool, read_pool)
         self.template_service: TemplateService = TemplateService()
+        self.cache: LRUCache = LRUCache(settings.CONFIG_CACHE_SIZE, settings.CONFIG_CACHE_TTL)
+        self._generations: Dict[str, int] = {}
+        self._epoch: int = 0
+        self.singleflight: SingleFlight = SingleFlight()
+        self._primary_until: Dict[str, float] = {}
+        self.change_observers: List[Callable[[str, Optional[int]], Any]] = []
+
+    def invalidate(self, service_name: str, version: Optional[int] = None) -> None:
+        self._generations[service_name] = self._generations.get(service_name, 0) + 1
+        self.cache.delete((service_name, None))
+        if version is not None:
+            self.cache.delete((service_name, version))
+
+    def evict(self, service_name: str, versions: List[int]) -> None:
+        for version in versions:
+            self.cache.delete((service_name, version))
+
+    def notify_change(self, service_name: str, version: Optional[int]) -> None:
+        for observer in self.change_observers:
+            try:
+                observer(service_name, version)
+            except Exception as e:
+                log.err(f"Configuration change observer failed: {str(e)}")
+
+    def pin_primary(self, service_name: str) -> None:
+        # Только для записей этого процесса: NOTIFY о чужих записях приходит через invalidate и пин не ставит
+        self._primary_until[service_name] = time.monotonic() + settings.READ_YOUR_WRITES_WINDOW
+
+    def invalidate_all(self) -> None:
+        self._epoch += 1
+        self._generations.clear()
+        self.cache.clear()
+
+    def use_primary(self, service_name: str, primary: bool = False) -> bool:
+        # Сразу после записи реплики могут отставать, поэтому читаем с основного сервера
+        if primary:
+            return True
+        now: float = time.monotonic()
+        deadline: Optional[float] = self._primary_until.get(service_name)
+        if deadline is None:
+            return False
+        if deadline <= now:
+            del self._primary_until[service_name]
+            return False
+        return True
+
+    def needs_primary(self, service_name: str, min_version: int) -> bool:
+        # min_version влияет только на свой запрос: общий кеш и остальные читатели остаются на репликах
+        cached: Optional[Dict[str, Any]] = self.cache.peek((service_name, None))
+        return cached is None or cached['version'] < min_version
+
+    def _generation(self, service_name: str) -> Tuple[int, int]:
+        return self._epoch, self._generations.get(service_name, 0)
+
+    def _get_cached(self, service_name: str, version: Optional[int]) -> Optional[Dict[str, Any]]:
+        return self.cache.get((service_name, version))
+
+    def _store_cached(self, service_name: str, version: Optional[int], config: Dict[str, Any],
+                      generation: Tuple[int, int]) -> None:
+        # Запись, завершившаяся во время запроса, делает результат устаревшим
+        if self._generation(service_name) != generation:
+            return
+        self.cache.set((service_name, config['version']), config)
+        if version is None:
+            self.cache.set((service_name, None), config)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'config_cache': self.cache.stats(),
+            'template_cache': self.template_service.stats(),
+            'singleflight': self.singleflight.stats(),
+            'prepared_statements': self.repository.stats(),
+            'replicas': (
+                self.repository.read_pool.stats() if self.repository.read_pool is not self.repository.db_pool else None
+            ),
+            'workers': worker_pool.stats(),
+            'write_batcher': self.repository.batcher.stats() if self.repository.batcher else None
+        }
 
     @defer.inlineCallbacks
     def save_config(self, service_name: str, yaml_content: str) -> defer.Deferred[Dict[str, Any]]:
@@ -23,30 +131,31 @@ class ConfigService:
         if not valid:
             raise ValueError(error)
 
-        yaml_valid: bool
-        yaml_result: Any
-        yaml_valid, yaml_result = ConfigValidator.validate_yaml(yaml_content)
-        if not yaml_valid:
-            raise ValueError(yaml_result)
-
-        config_data: Dict[str, Any] = yaml_result
-
-        struct_valid: bool
-        struct_errors: List[str]
-        struct_valid, struct_errors = ConfigValidator.validate_config_structure(config_data)
-        if not struct_valid:
-            raise ValueError(f"Configuration validation failed: {'; '.join(struct_errors)}")
-
-        config_version: Optional[int] = ConfigValidator.extract_version_from_config(config_data)
+        config_version: Optional[int]
+        payload_json: str
+        payload_hash: str
+        config_version, payload_json, payload_hash = yield worker_pool.run(
+            prepare_payload, yaml_content, size=len(yaml_content)
+        )
 
         try:
-            payload_json: str = json.dumps(config_data)
-
             saved_config: Dict[str, Any] = yield self.repository.save(
                 service=service_name,
                 version=config_version,
-                payload_json=payload_json
+                payload_json=payload_json,
+                content_hash=payload_hash
             )
+            if saved_config.get('unchanged'):
+                log.msg(f"Configuration for service '{service_name}' unchanged, version {saved_config['version']}")
+                defer.returnValue({
+                    'service': service_name,
+                    'version': saved_config['version'],
+                    'status': 'unchanged'
+                })
+
+            self.invalidate(service_name, saved_config['version'])
+            self.pin_primary(service_name)
+            self.notify_change(service_name, saved_config['version'])
 
             result: Dict[str, Any] = {
                 'service': service_name,
@@ -63,48 +172,325 @@ class ConfigService:
             log.err(f"Error saving configuration: {str(e)}")
             raise Exception(f"Internal error saving configuration: {str(e)}")
 
+    @staticmethod
+    def vars_hash(use_template: bool = False, template_vars: Optional[Dict[str, Any]] = None) -> str:
+        if not use_template:
+            return '-'
+        vars_json: str = json.dumps(template_vars or {}, sort_keys=True, separators=(',', ':'), default=str)
+        return hashlib.sha256(vars_json.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def make_etag(service_name: str, version: int, use_template: bool = False,
+                  template_vars: Optional[Dict[str, Any]] = None, path: Optional[List[str]] = None) -> str:
+        vars_hash: str = ConfigService.vars_hash(use_template, template_vars)
+        scope: str = json.dumps(path, separators=(',', ':')) if path else ''
+        digest: str = hashlib.sha256(f"{service_name}:{version}:{vars_hash}:{scope}".encode('utf-8')).hexdigest()
+        return f'"{digest[:32]}"'
+
     @defer.inlineCallbacks
-    def get_config(self, service_name: str, version: Optional[int] = None, use_template: bool = False,
-                   template_vars: Optional[Dict[str, Any]] = None) -> defer.Deferred[Optional[Dict[str, Any]]]:
+    def resolve_version(self, service_name: str, version: Optional[int] = None,
+                        primary: bool = False) -> defer.Deferred[Optional[int]]:
         valid: bool
         error: str
         valid, error = ConfigValidator.validate_service_name(service_name)
         if not valid:
             raise ValueError(error)
 
-        config: Optional[Dict[str, Any]] = yield self.repository.get(service_name, version)
+        config: Optional[Dict[str, Any]] = None if primary else self._get_cached(service_name, version)
+        if config is not None:
+            defer.returnValue(config['version'])
 
+        resolved: Optional[int] = yield self.singleflight.run(
+            ('version', service_name, version, self._generation(service_name), primary),
+            self.repository.get_version, service_name, version, self.use_primary(service_name, primary)
+        )
+        defer.returnValue(resolved)
+
+    @defer.inlineCallbacks
+    def _load_config(self, service_name: str, version: Optional[int],
+                     primary: bool = False) -> defer.Deferred[Optional[Dict[str, Any]]]:
+        valid: bool
+        error: str
+        valid, error = ConfigValidator.validate_service_name(service_name)
+        if not valid:
+            raise ValueError(error)
+
+        # Чтение с основного сервера не доверяет кешу, который может быть старше требуемой версии
+        config: Optional[Dict[str, Any]] = None if primary else self._get_cached(service_name, version)
+        if config is None:
+            # Поколение в ключе не даёт запросам после записи присоединиться к более раннему чтению
+            generation: Tuple[int, int] = self._generation(service_name)
+            config = yield self.singleflight.run(
+                ('load', service_name, version, generation, primary),
+                self._fetch_config, service_name, version, generation, primary
+            )
+
+        defer.returnValue(config)
+
+    @defer.inlineCallbacks
+    def _fetch_config(self, service_name: str, version: Optional[int], generation: Tuple[int, int],
+                      primary: bool = False) -> defer.Deferred[Optional[Dict[str, Any]]]:
+        config: Optional[Dict[str, Any]] = yield self.repository.get(
+            service_name, version, raw=True, primary=self.use_primary(service_name, primary)
+        )
         if not config:
             defer.returnValue(None)
 
-        config_data: Dict[str, Any] = config['payload']
+        self._store_cached(service_name, version, config, generation)
+        defer.returnValue(config)
+
+    @defer.inlineCallbacks
+    def _materialize(self, config: Dict[str, Any]) -> defer.Deferred[Dict[str, Any]]:
+        payload: Optional[Dict[str, Any]] = config.get('payload')
+        if payload is None:
+            payload = yield worker_pool.run_in_thread(json.loads, config['payload_bytes'], size=config['size'])
+            config['payload'] = payload
+        defer.returnValue(payload)
+
+    @defer.inlineCallbacks
+    def get_raw_config(self, service_name: str, version: Optional[int] = None,
+                       primary: bool = False) -> defer.Deferred[Optional[Dict[str, Any]]]:
+        config: Optional[Dict[str, Any]] = yield self._load_config(service_name, version, primary)
+        if config is None:
+            defer.returnValue(None)
+
+        defer.returnValue({'version': config['version'], 'body': config['payload_bytes'], 'size': config['size']})
+
+    @defer.inlineCallbacks
+    def get_raw_configs(self, requests: List[Tuple[str, Optional[int]]]) -> defer.Deferred[Dict[str, Dict[str, Any]]]:
+        results: Dict[str, Dict[str, Any]] = {}
+        missing: List[Tuple[str, Optional[int]]] = []
+        for service_name, version in requests:
+            valid: bool
+            error: str
+            valid, error = ConfigValidator.validate_service_name(service_name)
+            if not valid:
+                results[service_name] = {'error': error}
+                continue
+
+            config: Optional[Dict[str, Any]] = self._get_cached(service_name, version)
+            if config is not None:
+                results[service_name] = config
+            else:
+                missing.append((service_name, version))
+
+        if missing:
+            generations: Dict[str, Tuple[int, int]] = {
+                service_name: self._generation(service_name) for service_name, _ in missing
+            }
+            fetched: Dict[Tuple[str, Optional[int]], Dict[str, Any]] = yield self.repository.get_many(
+                [service_name for service_name, version in missing if version is None],
+                [(service_name, version) for service_name, version in missing if version is not None],
+                primary=any(self.use_primary(service_name) for service_name, _ in missing)
+            )
+            for service_name, version in missing:
+                config = fetched.get((service_name, version))
+                if config is None:
+                    results[service_name] = {'error': "Configuration not found"}
+                    continue
+                self._store_cached(service_name, version, config, generations[service_name])
+                results[service_name] = config
+
+        defer.returnValue({
+            service_name: (
+                entry if 'error' in entry
+                else {'version': entry['version'], 'body': entry['payload_bytes'], 'size': entry['size']}
+            )
+            for service_name, entry in results.items()
+        })
+
+    def get_versioned_config(self, service_name: str, version: Optional[int] = None, use_template: bool = False,
+                             template_vars: Optional[Dict[str, Any]] = None,
+                             primary: bool = False) -> defer.Deferred[Optional[Dict[str, Any]]]:
+        key: Tuple[Any, ...] = (
+            'render', service_name, version, self.vars_hash(use_template, template_vars),
+            self._generation(service_name), primary
+        )
+        return self.singleflight.run(
+            key, self._build_versioned_config, service_name, version, use_template, template_vars, primary
+        )
+
+    @defer.inlineCallbacks
+    def _build_versioned_config(self, service_name: str, version: Optional[int], use_template: bool,
+                                template_vars: Optional[Dict[str, Any]],
+                                primary: bool = False) -> defer.Deferred[Optional[Dict[str, Any]]]:
+        config: Optional[Dict[str, Any]] = yield self._load_config(service_name, version, primary)
+        if config is None:
+            defer.returnValue(None)
+
+        config_data: Dict[str, Any] = yield self._materialize(config)
 
         if use_template:
             try:
                 if template_vars is None:
                     template_vars = {}
 
-                config_data = self.template_service.render_config(config_data, template_vars)
+                config_data = yield worker_pool.run_in_thread(
+                    self.template_service.render_config,
+                    config_data, template_vars, cache_key=(service_name, config['version']),
+                    size=config['size']
+                )
                 log.msg(f"Applied template rendering for service '{service_name}', version {config['version']}")
             except ValueError as e:
                 log.err(f"Template rendering error: {str(e)}")
                 raise ValueError(f"Template rendering failed: {str(e)}")
 
-        defer.returnValue(config_data)
+        defer.returnValue({'version': config['version'], 'config': config_data, 'size': config['size']})
+
+    @defer.inlineCallbacks
+    def get_config_subtree(self, service_name: str, version: Optional[int], path: List[str],
+                           use_template: bool = False, template_vars: Optional[Dict[str, Any]] = None,
+                           primary: bool = False) -> defer.Deferred[Optional[Dict[str, Any]]]:
+        valid: bool
+        error: str
+        valid, error = ConfigValidator.validate_service_name(service_name)
+        if not valid:
+            raise ValueError(error)
+
+        document: Any = None
+        if use_template:
+            result: Optional[Dict[str, Any]] = yield self.get_versioned_config(
+                service_name, version, use_template, template_vars, primary
+            )
+            if result is None:
+                defer.returnValue(None)
+            resolved_version: int = result['version']
+            document = result['config']
+        else:
+            config: Optional[Dict[str, Any]] = None if primary else self._get_cached(service_name, version)
+            if config is None:
+                subtree: Optional[Dict[str, Any]] = yield self.repository.get_subtree(
+                    service_name, version, path, primary=self.use_primary(service_name, primary)
+                )
+                if subtree is None:
+                    defer.returnValue(None)
+                body: Optional[bytes] = subtree['subtree_bytes']
+                defer.returnValue({
+                    'version': subtree['version'],
+                    'body': body,
+                    'size': len(body) if body is not None else 0
+                })
+            resolved_version = config['version']
+            document = yield self._materialize(config)
+
+        node: Any = extract_json_path(document, path)
+        if node is MISSING:
+            defer.returnValue({'version': resolved_version, 'body': None, 'size': 0})
+
+        body = json.dumps(node, ensure_ascii=False).encode('utf-8')
+        defer.returnValue({'version': resolved_version, 'body': body, 'size': len(body)})
 
     @defer.inlineCallbacks
-    def get_config_history(self, service_name: str, limit: int = 10) -> defer.Deferred[Optional[List[Dict[str, Any]]]]:
+    def get_config_diff(self, service_name: str, from_version: int,
+                        to_version: Optional[int] = None) -> defer.Deferred[Optional[Dict[str, Any]]]:
+        source: Optional[Dict[str, Any]] = yield self._load_config(service_name, from_version)
+        target: Optional[Dict[str, Any]] = yield self._load_config(service_name, to_version)
+        if source is None or target is None:
+            defer.returnValue(None)
+
+        source_data: Dict[str, Any] = yield self._materialize(source)
+        target_data: Dict[str, Any] = yield self._materialize(target)
+        changes: List[Dict[str, Any]] = yield worker_pool.run_in_thread(
+            diff_json, source_data, target_data, size=source['size'] + target['size']
+        )
+
+        defer.returnValue({
+            'service': service_name,
+            'from': source['version'],
+            'to': target['version'],
+            'changes': changes
+        })
+
+    @defer.inlineCallbacks
+    def get_retention(self, service_name: str) -> defer.Deferred[Dict[str, Any]]:
         valid: bool
         error: str
         valid, error = ConfigValidator.validate_service_name(service_name)
         if not valid:
             raise ValueError(error)
 
-        history: Optional[List[Dict[str, Any]]] = yield self.repository.get_history(service_name, limit)
+        retention: Dict[str, Any] = yield self.repository.get_retention(service_name)
+        retention['service'] = service_name
+        retention['effective'] = {
+            'keep_last': retention['keep_last'] if retention['keep_last'] is not None else settings.RETENTION_KEEP_LAST,
+            'max_age_days': (
+                retention['max_age_days'] if retention['max_age_days'] is not None else settings.RETENTION_MAX_AGE_DAYS
+            )
+        }
+        defer.returnValue(retention)
+
+    @defer.inlineCallbacks
+    def set_retention(self, service_name: str, policy: Dict[str, Any]) -> defer.Deferred[Dict[str, Any]]:
+        valid: bool
+        error: str
+        valid, error = ConfigValidator.validate_service_name(service_name)
+        if not valid:
+            raise ValueError(error)
+
+        yield self.repository.set_retention(
+            service_name, policy.get('keep_last'), policy.get('max_age_days'), policy.get('pinned')
+        )
+        log.msg(f"Updated retention policy for service '{service_name}'")
+        retention: Dict[str, Any] = yield self.get_retention(service_name)
+        defer.returnValue(retention)
+
+    @defer.inlineCallbacks
+    def search_configs(self, contains: Dict[str, Any], limit: int = 100,
+                       include_payload: bool = False) -> defer.Deferred[List[Dict[str, Any]]]:
+        if not isinstance(contains, dict) or not contains:
+            raise ValueError("Search criteria must be a non-empty JSON object")
+
+        matches: List[Dict[str, Any]] = yield self.repository.search_latest(
+            json.dumps(contains), limit, include_payload
+        )
+        defer.returnValue(matches)
+
+    @defer.inlineCallbacks
+    def get_config(self, service_name: str, version: Optional[int] = None, use_template: bool = False,
+                   template_vars: Optional[Dict[str, Any]] = None) -> defer.Deferred[Optional[Dict[str, Any]]]:
+        result: Optional[Dict[str, Any]] = yield self.get_versioned_config(
+            service_name, version, use_template, template_vars
+        )
+        defer.returnValue(result['config'] if result else None)
+
+    @staticmethod
+    def encode_history_cursor(params: Dict[str, Any]) -> str:
+        cursor_json: str = json.dumps(params, separators=(',', ':'), sort_keys=True)
+        return base64.urlsafe_b64encode(cursor_json.encode('utf-8')).decode('ascii').rstrip('=')
+
+    @staticmethod
+    def decode_history_cursor(cursor: str) -> Dict[str, Any]:
+        try:
+            padded: str = cursor + '=' * (-len(cursor) % 4)
+            params: Any = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+        except (ValueError, UnicodeError):
+            raise ValueError("Invalid history cursor")
+        if not isinstance(params, dict):
+            raise ValueError("Invalid history cursor")
+        return params
+
+    @defer.inlineCallbacks
+    def get_config_history(self, service_name: str, limit: int = 10, before_version: Optional[int] = None,
+                           after_version: Optional[int] = None, created_from: Optional[datetime] = None,
+                           created_to: Optional[datetime] = None,
+                           primary: bool = False) -> defer.Deferred[Optional[Dict[str, Any]]]:
+        valid: bool
+        error: str
+        valid, error = ConfigValidator.validate_service_name(service_name)
+        if not valid:
+            raise ValueError(error)
+
+        history: Optional[List[Dict[str, Any]]] = yield self.repository.get_history(
+            service_name, limit + 1, before_version, after_version, created_from, created_to,
+            primary=self.use_primary(service_name, primary)
+        )
 
         if history is None:
             defer.returnValue(None)
 
+        has_more: bool = len(history) > limit
+        history = history[:limit]
+
         formatted_history: List[Dict[str, Any]] = []
         for item in history:
             formatted_item: Dict[str, Any] = {
@@ -113,4 +499,19 @@ class ConfigService:
             }
             formatted_history.append(formatted_item)
 
-        defer.returnValue(formatted_history)
+        next_cursor: Optional[str] = None
+        if has_more:
+            cursor_params: Dict[str, Any] = {'limit': limit}
+            if after_version is not None and before_version is None:
+                cursor_params['after_version'] = history[-1]['version']
+            else:
+                cursor_params['before_version'] = history[-1]['version']
+                if after_version is not None:
+                    cursor_params['after_version'] = after_version
+            if created_from is not None:
+                cursor_params['created_from'] = created_from.isoformat()
+            if created_to is not None:
+                cursor_params['created_to'] = created_to.isoformat()
+            next_cursor = self.encode_history_cursor(cursor_params)
+
+        defer.returnValue({'history': formatted_history, 'next_cursor': next_cursor})
@@ -0,0 +1,141 @@
+import json
+from typing import Optional, Any, Callable, List, Tuple
+
+from zope.interface import implementer
+from twisted.python import log
+from twisted.internet import defer, threads
+from twisted.internet.interfaces import IPushProducer
+
+from src.utils.json_diff import apply_json_diff
+from src.repositories.configuration_repository import PAYLOAD, PAYLOAD_JOIN, fetch_version
+
+
+@implementer(IPushProducer)
+class ConfigExportProducer:
+
+    def __init__(self, connection_factory: Callable[[], Any], request: Any, service: Optional[str] = None,
+                 chunk_size: int = 500) -> None:
+        self.connection_factory: Callable[[], Any] = connection_factory
+        self.request: Any = request
+        self.service: Optional[str] = service
+        self.chunk_size: int = chunk_size
+        self.rows_exported: int = 0
+        self._connection: Optional[Any] = None
+        self._cursor: Optional[Any] = None
+        self._paused: bool = False
+        self._stopped: bool = False
+        self._resumed: Optional[defer.Deferred] = None
+        self._previous: Optional[Tuple[str, int, Any]] = None
+
+    def pauseProducing(self) -> None:
+        self._paused = True
+
+    def resumeProducing(self) -> None:
+        self._paused = False
+        if self._resumed is not None:
+            resumed, self._resumed = self._resumed, None
+            resumed.callback(None)
+
+    def stopProducing(self) -> None:
+        self._stopped = True
+        self.resumeProducing()
+
+    def _open(self) -> None:
+        self._connection = self.connection_factory()
+        self._connection.set_session(readonly=True)
+        # Именованный курсор держит результат на сервере и отдаёт его порциями
+        self._cursor = self._connection.cursor(name='config_export')
+        self._cursor.itersize = self.chunk_size
+        if self.service is None:
+            self._cursor.execute(
+                f"""SELECT c.service, c.version, {PAYLOAD}::text, c.created_at, c.base_version, c.delta::text
+                    FROM configurations c {PAYLOAD_JOIN}
+                    ORDER BY c.service DESC, c.version DESC"""
+            )
+        else:
+            self._cursor.execute(
+                f"""SELECT c.service, c.version, {PAYLOAD}::text, c.created_at, c.base_version, c.delta::text
+                    FROM configurations c {PAYLOAD_JOIN}
+                    WHERE c.service = %s
+                    ORDER BY c.version DESC""",
+                (self.service,)
+            )
+
+    def _close(self) -> None:
+        try:
+            if self._cursor is not None:
+                self._cursor.close()
+            if self._connection is not None:
+                self._connection.rollback()
+                self._connection.close()
+        finally:
+            self._cursor = None
+            self._connection = None
+
+    @staticmethod
+    def encode_row(row: Tuple[Any, ...]) -> bytes:
+        created_at: Optional[str] = row[3].isoformat() if row[3] else None
+        header: str = f'{{"service": {json.dumps(row[0])}, "version": {row[1]}, ' \
+                      f'"created_at": {json.dumps(created_at)}, "payload": '
+        return header.encode('utf-8') + row[2].encode('utf-8') + b'}\n'
+
+    def _payload_text(self, row: Tuple[Any, ...]) -> str:
+        service: str = row[0]
+        version: int = row[1]
+        if row[2] is not None:
+            self._previous = (service, version, row[2])
+            return row[2]
+
+        # Версии идут по убыванию, поэтому база дельты обычно только что была выгружена
+        previous: Optional[Tuple[str, int, Any]] = self._previous
+        if previous is not None and previous[0] == service and previous[1] == row[4]:
+            base: Any = json.loads(previous[2]) if isinstance(previous[2], str) else previous[2]
+            document: Any = apply_json_diff(base, json.loads(row[5]))
+            payload_text: str = json.dumps(document, ensure_ascii=False)
+        else:
+            with self._connection.cursor() as cursor:
+                payload_text = fetch_version(cursor, service, version)[2]
+            document = payload_text
+        self._previous = (service, version, document)
+        return payload_text
+
+    def _fetch(self) -> Tuple[int, bytes]:
+        rows: List[Tuple[Any, ...]] = self._cursor.fetchmany(self.chunk_size)
+        body: bytes = b''.join(
+            self.encode_row((row[0], row[1], self._payload_text(row), row[3])) for row in rows
+        )
+        return len(rows), body
+
+    @property
+    def stopped(self) -> bool:
+        return self._stopped
+
+    @defer.inlineCallbacks
+    def start(self) -> defer.Deferred[int]:
+        # Клиент мог отключиться, пока экспорт ждал свободного слота
+        if self._stopped:
+            defer.returnValue(0)
+        self.request.registerProducer(self, True)
+        try:
+            yield threads.deferToThread(self._open)
+
+            while not self._stopped:
+                if self._paused:
+                    self._resumed = defer.Deferred()
+                    yield self._resumed
+                    continue
+
+                count: int
+                body: bytes
+                count, body = yield threads.deferToThread(self._fetch)
+                if not count or self._stopped:
+                    break
+
+                self.request.write(body)
+                self.rows_exported += count
+        finally:
+            yield threads.deferToThread(self._close)
+            self.request.unregisterProducer()
+
+        log.msg(f"Exported {self.rows_exported} configuration versions")
+        defer.returnValue(self.rows_exported)
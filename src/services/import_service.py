@@ -0,0 +1,166 @@
+import re
+import json
+from typing import Optional, Dict, Any, List, Tuple
+
+import yaml
+from twisted.python import log
+from twisted.internet import defer
+
+from src.utils.workers import worker_pool
+from src.utils.hashing import content_hash
+from src.validators.config_validator import ConfigValidator
+
+
+IMPORT_FORMATS: Tuple[str, ...] = ('ndjson', 'yaml')
+
+_YAML_DOCUMENT_SEPARATOR = re.compile(r'^---[ \t]*$', re.MULTILINE)
+
+
+def split_import_stream(content: str, fmt: str) -> List[str]:
+    if fmt == 'ndjson':
+        return [line for line in content.splitlines() if line.strip()]
+    if fmt == 'yaml':
+        return [doc for doc in _YAML_DOCUMENT_SEPARATOR.split(content) if doc.strip()]
+    raise ValueError(f"Unsupported import format: {fmt}")
+
+
+def detect_import_format(content: str, content_type: Optional[str] = None) -> str:
+    if content_type:
+        if 'ndjson' in content_type or 'jsonl' in content_type or content_type.endswith('/json'):
+            return 'ndjson'
+        if 'yaml' in content_type:
+            return 'yaml'
+    return 'ndjson' if content.lstrip().startswith('{') else 'yaml'
+
+
+def parse_import_body(content: bytes, fmt: Optional[str] = None,
+                      content_type: Optional[str] = None) -> Tuple[str, List[str]]:
+    text: str = content.decode('utf-8')
+    fmt = fmt or detect_import_format(text, content_type)
+    if fmt not in IMPORT_FORMATS:
+        raise ValueError(f"Unsupported import format: {fmt}")
+    return fmt, split_import_stream(text, fmt)
+
+
+def validate_import_record(fmt: str, text: str) -> Dict[str, Any]:
+    try:
+        record: Any = json.loads(text) if fmt == 'ndjson' else yaml.safe_load(text)
+    except (ValueError, yaml.YAMLError) as e:
+        return {'status': 'invalid', 'service': None, 'error': f"Unparseable record: {str(e)}"}
+
+    if not isinstance(record, dict):
+        return {'status': 'invalid', 'service': None, 'error': "Record must be an object"}
+
+    service: Any = record.get('service')
+    valid: bool
+    error: str
+    valid, error = ConfigValidator.validate_service_name(service if isinstance(service, str) else '')
+    if not valid:
+        return {'status': 'invalid', 'service': service, 'error': error}
+
+    config_data: Any = record.get('config')
+    if config_data is None and isinstance(record.get('yaml'), str):
+        yaml_valid: bool
+        yaml_result: Any
+        yaml_valid, yaml_result = ConfigValidator.validate_yaml(record['yaml'])
+        if not yaml_valid:
+            return {'status': 'invalid', 'service': service, 'error': yaml_result}
+        config_data = yaml_result
+
+    if not isinstance(config_data, dict):
+        return {'status': 'invalid', 'service': service, 'error': "Record must contain a 'config' object or 'yaml' string"}
+
+    struct_valid: bool
+    struct_errors: List[str]
+    struct_valid, struct_errors = ConfigValidator.validate_config_structure(config_data)
+    if not struct_valid:
+        return {
+            'status': 'invalid',
+            'service': service,
+            'error': f"Configuration validation failed: {'; '.join(struct_errors)}"
+        }
+
+    try:
+        payload_json: str = json.dumps(config_data)
+    except (TypeError, ValueError) as e:
+        return {'status': 'invalid', 'service': service, 'error': f"Configuration is not JSON serializable: {str(e)}"}
+
+    return {
+        'status': 'valid',
+        'service': service,
+        'version': ConfigValidator.extract_version_from_config(config_data),
+        'payload_json': payload_json,
+        'content_hash': content_hash(config_data)
+    }
+
+
+def validate_import_chunk(fmt: str, texts: List[str]) -> List[Dict[str, Any]]:
+    return [validate_import_record(fmt, text) for text in texts]
+
+
+def build_import_report(records: List[Dict[str, Any]]) -> Dict[str, Any]:
+    summary: Dict[str, int] = {'inserted': 0, 'unchanged': 0, 'conflict': 0, 'invalid': 0}
+    report: List[Dict[str, Any]] = []
+    for index, record in enumerate(records):
+        summary[record['status']] = summary.get(record['status'], 0) + 1
+        entry: Dict[str, Any] = {'index': index, 'service': record.get('service'), 'status': record['status']}
+        if record.get('version') is not None:
+            entry['version'] = record['version']
+        if record.get('error'):
+            entry['error'] = record['error']
+        report.append(entry)
+
+    return {
+        'total': len(records),
+        'inserted': summary['inserted'],
+        'unchanged': summary['unchanged'],
+        'conflicts': summary['conflict'],
+        'invalid': summary['invalid'],
+        'records': report
+    }
+
+
+class ImportService:
+
+    def __init__(self, config_service: Any, chunk_size: int = 500, batch_size: int = 1000) -> None:
+        self.config_service: Any = config_service
+        self.repository: Any = config_service.repository
+        self.chunk_size: int = chunk_size
+        self.batch_size: int = batch_size
+
+    @defer.inlineCallbacks
+    def import_stream(self, content: bytes, fmt: Optional[str] = None,
+                      content_type: Optional[str] = None) -> defer.Deferred[Dict[str, Any]]:
+        # Тело до IMPORT_MAX_BYTES декодируется и разбивается на записи вне потока реактора
+        texts: List[str]
+        fmt, texts = yield worker_pool.run_in_thread(
+            parse_import_body, content, fmt, content_type, size=len(content), offload=True
+        )
+        if not texts:
+            raise ValueError("Import stream contains no records")
+
+        # Чанки всегда уходят в пул: мелкие записи иначе проверялись бы по очереди в реакторе
+        chunks: List[List[str]] = [texts[i:i + self.chunk_size] for i in range(0, len(texts), self.chunk_size)]
+        validated: List[List[Dict[str, Any]]] = yield defer.gatherResults([
+            worker_pool.run(validate_import_chunk, fmt, chunk, size=sum(len(text) for text in chunk), offload=True)
+            for chunk in chunks
+        ], consumeErrors=True)
+        records: List[Dict[str, Any]] = [record for chunk in validated for record in chunk]
+
+        valid_records: List[Dict[str, Any]] = [record for record in records if record['status'] == 'valid']
+        if valid_records:
+            yield self.repository.bulk_save(valid_records, self.batch_size)
+
+        latest: Dict[str, int] = {}
+        for record in valid_records:
+            if record['status'] == 'inserted':
+                latest[record['service']] = max(latest.get(record['service'], 0), record['version'])
+        for service_name, version in latest.items():
+            self.config_service.invalidate(service_name, version)
+            self.config_service.pin_primary(service_name)
+            self.config_service.notify_change(service_name, version)
+
+        report: Dict[str, Any] = build_import_report(records)
+        log.msg(f"Imported {report['inserted']} of {report['total']} configurations "
+                f"({report['unchanged']} unchanged, {report['conflicts']} conflicts, {report['invalid']} invalid)")
+        defer.returnValue(report)
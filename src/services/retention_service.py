@@ -0,0 +1,94 @@
+import time
+from typing import Optional, Dict, Any, List, Tuple
+
+from twisted.python import log
+from twisted.internet import defer, task
+
+from src.config.settings import settings
+
+
+class RetentionService:
+
+    def __init__(self, config_service: Any, interval: float = settings.RETENTION_INTERVAL,
+                 batch_size: int = settings.RETENTION_BATCH_SIZE) -> None:
+        self.config_service: Any = config_service
+        self.repository: Any = config_service.repository
+        self.interval: float = interval
+        self.batch_size: int = batch_size
+        self._loop: Optional[task.LoopingCall] = None
+        self.runs: int = 0
+        self.rows_pruned: int = 0
+        self.payloads_pruned: int = 0
+        self.last_run_pruned: int = 0
+        self.last_run_seconds: float = 0.0
+        self.total_seconds: float = 0.0
+        self.last_error: Optional[str] = None
+
+    def start(self) -> None:
+        if self._loop is None and self.interval > 0:
+            self._loop = task.LoopingCall(self.run_once)
+            self._loop.start(self.interval, now=False)
+
+    def stop(self) -> None:
+        if self._loop is not None and self._loop.running:
+            self._loop.stop()
+        self._loop = None
+
+    @defer.inlineCallbacks
+    def run_once(self) -> defer.Deferred[int]:
+        started: float = time.monotonic()
+        pruned: int = 0
+        try:
+            policies: List[Tuple[str, int, int]] = yield self.repository.get_retention_policies(
+                settings.RETENTION_KEEP_LAST, settings.RETENTION_MAX_AGE_DAYS
+            )
+            for service_name, keep_last, max_age_days in policies:
+                if keep_last <= 0 and max_age_days <= 0:
+                    continue
+
+                # Небольшие транзакции, чтобы не держать блокировки долго
+                while True:
+                    versions: List[int] = yield self.repository.prune_versions(
+                        service_name, keep_last, max_age_days, self.batch_size
+                    )
+                    if versions:
+                        self.config_service.evict(service_name, versions)
+                        pruned += len(versions)
+                        self.rows_pruned += len(versions)
+                    if len(versions) < self.batch_size:
+                        break
+
+            if settings.CONFIG_PAYLOAD_STORE_ENABLED:
+                while True:
+                    count: int = yield self.repository.prune_payloads(self.batch_size)
+                    self.payloads_pruned += count
+                    if count < self.batch_size:
+                        break
+
+            self.last_error = None
+        except Exception as e:
+            # Ошибка не должна останавливать LoopingCall
+            self.last_error = str(e)
+            log.err(f"Retention run failed: {str(e)}")
+        finally:
+            elapsed: float = time.monotonic() - started
+            self.runs += 1
+            self.last_run_pruned = pruned
+            self.last_run_seconds = round(elapsed, 3)
+            self.total_seconds += elapsed
+
+        if pruned:
+            log.msg(f"Retention pruned {pruned} configuration versions in {self.last_run_seconds}s")
+        defer.returnValue(pruned)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'enabled': self._loop is not None,
+            'runs': self.runs,
+            'rows_pruned': self.rows_pruned,
+            'payloads_pruned': self.payloads_pruned,
+            'last_run_pruned': self.last_run_pruned,
+            'last_run_seconds': self.last_run_seconds,
+            'total_seconds': round(self.total_seconds, 3),
+            'last_error': self.last_error
+        }
@@ -1,28 +1,44 @@
 import json
-from typing import Dict, Any, Optional, Union, List, Tuple
+import hashlib
+from typing import Dict, Any, Optional, Union, List, Tuple, Hashable
 from jinja2 import Environment, BaseLoader, TemplateError, TemplateSyntaxError, StrictUndefined
 
+from src.utils.cache import LRUCache
+from src.config.settings import settings
+
+
+NO_TEMPLATE = object()
+
 
 class TemplateService:
 
-    def __init__(self):
+    RENDER_MODES: Tuple[str, ...] = ('document', 'leaves')
+
+    def __init__(self, cache_size: int = settings.TEMPLATE_CACHE_SIZE,
+                 render_mode: str = settings.TEMPLATE_RENDER_MODE):
+        if render_mode not in self.RENDER_MODES:
+            raise ValueError(f"Unknown template render mode: {render_mode}")
+        self.render_mode: str = render_mode
         self.jinja_env = Environment(
             loader=BaseLoader(),
             autoescape=False,
             undefined=StrictUndefined
         )
+        self.cache: LRUCache = LRUCache(cache_size)
 
-    def render_config(self, config_data: Dict[str, Any], template_vars: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    def render_config(self, config_data: Dict[str, Any], template_vars: Optional[Dict[str, Any]] = None,
+                      cache_key: Optional[Hashable] = None) -> Dict[str, Any]:
         if template_vars is None:
             template_vars = {}
 
         try:
-            config_json: str = json.dumps(config_data, indent=2, ensure_ascii=False)
+            if self.render_mode == 'leaves':
+                return self._render_leaves(config_data, template_vars, cache_key)
 
-            if not self._has_template_syntax(config_json):
-                return config_data
+            template: Any = self._get_template(config_data, cache_key)
 
-            template: Any = self.jinja_env.from_string(config_json)
+            if template is NO_TEMPLATE:
+                return config_data
 
             rendered_json: str = template.render(**template_vars)
 
@@ -39,6 +55,87 @@ class TemplateService:
         except Exception as e:
             raise ValueError(f"Unexpected error during template rendering: {str(e)}")
 
+    def _get_template(self, config_data: Dict[str, Any], cache_key: Optional[Hashable]) -> Any:
+        config_json: Optional[str] = None
+        if cache_key is None:
+            config_json = json.dumps(config_data, indent=2, ensure_ascii=False)
+            cache_key = hashlib.sha256(config_json.encode('utf-8')).hexdigest()
+
+        template: Any = self.cache.get(cache_key)
+        if template is not None:
+            return template
+
+        if config_json is None:
+            config_json = json.dumps(config_data, indent=2, ensure_ascii=False)
+
+        if not self._has_template_syntax(config_json):
+            template = NO_TEMPLATE
+        else:
+            template = self.jinja_env.from_string(config_json)
+
+        self.cache.set(cache_key, template)
+        return template
+
+    def _render_leaves(self, config_data: Dict[str, Any], template_vars: Dict[str, Any],
+                       cache_key: Optional[Hashable]) -> Dict[str, Any]:
+        plan: Any = self._get_leaf_plan(config_data, cache_key)
+        if plan is NO_TEMPLATE:
+            return config_data
+
+        # Копируются только контейнеры на пути к шаблонным значениям
+        rendered: Any = self._copy_container(config_data)
+        copied: Dict[Tuple[Any, ...], Any] = {(): rendered}
+        for path, template in plan:
+            parent: Any = rendered
+            for depth in range(1, len(path)):
+                prefix: Tuple[Any, ...] = path[:depth]
+                child: Any = copied.get(prefix)
+                if child is None:
+                    child = self._copy_container(parent[path[depth - 1]])
+                    parent[path[depth - 1]] = child
+                    copied[prefix] = child
+                parent = child
+            parent[path[-1]] = template.render(**template_vars)
+
+        return rendered
+
+    def _get_leaf_plan(self, config_data: Dict[str, Any], cache_key: Optional[Hashable]) -> Any:
+        if cache_key is None:
+            config_json: str = json.dumps(config_data, sort_keys=True, ensure_ascii=False)
+            cache_key = hashlib.sha256(config_json.encode('utf-8')).hexdigest()
+        cache_key = ('leaves', cache_key)
+
+        plan: Any = self.cache.get(cache_key)
+        if plan is not None:
+            return plan
+
+        leaves: List[Tuple[Tuple[Any, ...], Any]] = [
+            (path, self.jinja_env.from_string(value))
+            for path, value in self._iter_string_leaves(config_data, ())
+            if self._has_template_syntax(value)
+        ]
+        plan = leaves or NO_TEMPLATE
+
+        self.cache.set(cache_key, plan)
+        return plan
+
+    def _iter_string_leaves(self, node: Any, path: Tuple[Any, ...]):
+        if isinstance(node, dict):
+            for key, value in node.items():
+                yield from self._iter_string_leaves(value, path + (key,))
+        elif isinstance(node, list):
+            for index, value in enumerate(node):
+                yield from self._iter_string_leaves(value, path + (index,))
+        elif isinstance(node, str):
+            yield path, node
+
+    @staticmethod
+    def _copy_container(node: Any) -> Any:
+        return list(node) if isinstance(node, list) else dict(node)
+
     def _has_template_syntax(self, text: str) -> bool:
         jinja_patterns: List[str] = ['{{', '}}', '{%', '%}', '{#', '#}']
         return any(pattern in text for pattern in jinja_patterns)
+
+    def stats(self) -> Dict[str, Any]:
+        return self.cache.stats()
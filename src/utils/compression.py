@@ -0,0 +1,49 @@
+import gzip
+import zlib
+from typing import Dict, List, Optional
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+SUPPORTED_ENCODINGS: List[str] = (['zstd'] if zstandard is not None else []) + ['gzip', 'deflate']
+
+
+def negotiate_encoding(accept_encoding: Optional[bytes]) -> Optional[str]:
+    if not accept_encoding:
+        return None
+
+    weights: Dict[str, float] = {}
+    for item in accept_encoding.decode('latin-1').split(','):
+        parts: List[str] = [part.strip() for part in item.split(';')]
+        name: str = parts[0].lower()
+        if not name:
+            continue
+        quality: float = 1.0
+        for param in parts[1:]:
+            if param.startswith('q='):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        weights[name] = quality
+
+    best: Optional[str] = None
+    best_quality: float = 0.0
+    for encoding in SUPPORTED_ENCODINGS:
+        quality: float = weights.get(encoding, weights.get('*', 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == 'gzip':
+        return gzip.compress(body, compresslevel=6, mtime=0)
+    if encoding == 'deflate':
+        return zlib.compress(body, 6)
+    if encoding == 'zstd' and zstandard is not None:
+        return zstandard.ZstdCompressor(level=3).compress(body)
+    raise ValueError(f"Unsupported content encoding: {encoding}")
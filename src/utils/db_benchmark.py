@@ -0,0 +1,125 @@
+import sys
+import time
+import argparse
+
+from twisted.internet import asyncioreactor
+
+asyncioreactor.install()
+
+from twisted.python import log
+from twisted.python.failure import Failure
+from twisted.internet import defer, reactor
+from twisted.enterprise import adbapi
+
+from src.config.settings import settings
+from src.config.async_pool import AsyncConnectionPoolAdapter
+from src.repositories.configuration_repository import ConfigurationRepository, prepare_statements
+
+
+BACKENDS = ('adbapi', 'prepared', 'asyncio')
+
+
+def create_pool(backend, pool_size):
+    connkw = dict(
+        host=settings.POSTGRES_HOST,
+        port=settings.POSTGRES_PORT,
+        database=settings.POSTGRES_DB,
+        user=settings.POSTGRES_USER,
+        password=settings.POSTGRES_PASSWORD
+    )
+    if backend == 'asyncio':
+        return AsyncConnectionPoolAdapter(min_size=pool_size, max_size=pool_size, **connkw)
+    return adbapi.ConnectionPool('psycopg2', cp_min=pool_size, cp_max=pool_size, cp_reconnect=True, cp_noisy=False,
+                                 cp_openfun=prepare_statements if backend == 'prepared' else None, **connkw)
+
+
+def percentile(samples, fraction):
+    if not samples:
+        return 0.0
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+class DatabaseBenchmark:
+    def __init__(self, services, requests=5000, concurrency=64, pool_size=10):
+        self.services = services
+        self.requests = requests
+        self.concurrency = concurrency
+        self.pool_size = pool_size
+
+    @defer.inlineCallbacks
+    def _client(self, repository, remaining, latencies):
+        while remaining:
+            index = remaining.pop()
+            started = time.perf_counter()
+            yield repository.get(self.services[index % len(self.services)], raw=True)
+            latencies.append(time.perf_counter() - started)
+
+    @defer.inlineCallbacks
+    def run(self, backend):
+        pool = create_pool(backend, self.pool_size)
+        repository = ConfigurationRepository(pool)
+        try:
+            # Прогрев: соединения открываются до начала замера
+            yield defer.gatherResults([repository.get(service) for service in self.services[:self.pool_size]])
+
+            remaining = list(range(self.requests))
+            latencies = []
+            started = time.perf_counter()
+            yield defer.gatherResults([
+                self._client(repository, remaining, latencies) for _ in range(self.concurrency)
+            ], consumeErrors=True)
+            elapsed = time.perf_counter() - started
+        finally:
+            yield pool.close()
+
+        latencies.sort()
+        defer.returnValue({
+            'backend': backend,
+            'requests': len(latencies),
+            'seconds': round(elapsed, 3),
+            'throughput': round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+            'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+            'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+            'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+            'max_ms': round(latencies[-1] * 1000, 2) if latencies else 0.0
+        })
+
+
+@defer.inlineCallbacks
+def run_benchmark(args):
+    benchmark = DatabaseBenchmark(args.services, args.requests, args.concurrency, args.pool_size)
+    backends = BACKENDS if args.backend == 'both' else (args.backend,)
+    print(f"{'backend':<10}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for backend in backends:
+        result = yield benchmark.run(backend)
+        print(f"{result['backend']:<10}{result['throughput']:>10}{result['p50_ms']:>10}"
+              f"{result['p95_ms']:>10}{result['p99_ms']:>10}{result['max_ms']:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare database backends and prepared statements')
+    parser.add_argument('services', nargs='+', help='Services whose latest configuration is fetched')
+    parser.add_argument('--backend', '-b', choices=BACKENDS + ('both',), default='both')
+    parser.add_argument('--requests', '-n', type=int, default=5000, help='Total number of reads per backend')
+    parser.add_argument('--concurrency', '-c', type=int, default=64, help='Concurrent in-flight reads')
+    parser.add_argument('--pool-size', '-p', type=int, default=settings.DB_POOL_MAX, help='Connections per pool')
+
+    args = parser.parse_args()
+
+    settings.validate()
+
+    exit_code = []
+
+    def _done(result):
+        if isinstance(result, Failure):
+            log.err(result, "Benchmark failed")
+            exit_code.append(1)
+        reactor.stop()
+
+    reactor.callWhenRunning(lambda: run_benchmark(args).addBoth(_done))
+    reactor.run()
+    sys.exit(exit_code[0] if exit_code else 0)
+
+
+if __name__ == '__main__':
+    main()
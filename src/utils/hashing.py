@@ -0,0 +1,11 @@
+import json
+import hashlib
+from typing import Any
+
+
+def canonical_json(data: Any) -> str:
+    return json.dumps(data, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+
+
+def content_hash(data: Any) -> str:
+    return hashlib.sha256(canonical_json(data).encode('utf-8')).hexdigest()
@@ -0,0 +1,96 @@
+import sys
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import psycopg2
+
+from src.config.settings import settings
+from src.repositories.configuration_repository import insert_configs
+from src.services.import_service import (
+    IMPORT_FORMATS, build_import_report, detect_import_format, split_import_stream, validate_import_chunk
+)
+
+
+class ImportCLI:
+    def __init__(self, workers=None, chunk_size=500, batch_size=1000):
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.batch_size = batch_size
+
+    def validate(self, texts, fmt):
+        chunks = [texts[i:i + self.chunk_size] for i in range(0, len(texts), self.chunk_size)]
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            validated = executor.map(validate_import_chunk, [fmt] * len(chunks), chunks)
+            return [record for chunk in validated for record in chunk]
+
+    def insert(self, records):
+        connection = psycopg2.connect(
+            host=settings.POSTGRES_HOST,
+            port=settings.POSTGRES_PORT,
+            database=settings.POSTGRES_DB,
+            user=settings.POSTGRES_USER,
+            password=settings.POSTGRES_PASSWORD
+        )
+        try:
+            with connection:
+                with connection.cursor() as cursor:
+                    insert_configs(cursor, records, self.batch_size)
+        finally:
+            connection.close()
+
+    def run(self, path, fmt=None, dry_run=False):
+        with open(path, 'r', encoding='utf-8') as f:
+            content = f.read()
+
+        fmt = fmt or detect_import_format(content, 'application/x-ndjson' if path.endswith(('.ndjson', '.jsonl')) else None)
+        texts = split_import_stream(content, fmt)
+        if not texts:
+            print("No records found")
+            return None
+
+        started = time.monotonic()
+        records = self.validate(texts, fmt)
+        valid_records = [record for record in records if record['status'] == 'valid']
+        print(f"Validated {len(records)} records ({len(valid_records)} valid) in {time.monotonic() - started:.2f}s")
+
+        if valid_records and not dry_run:
+            started = time.monotonic()
+            self.insert(valid_records)
+            print(f"Inserted records in {time.monotonic() - started:.2f}s")
+
+        report = build_import_report(records)
+        print(f"Inserted: {report['inserted']}, unchanged: {report['unchanged']}, conflicts: {report['conflicts']}, invalid: {report['invalid']}")
+        return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Configuration Service Bulk Import Tool')
+    parser.add_argument('file', help='NDJSON or multi-document YAML file to import')
+    parser.add_argument('--format', '-f', choices=IMPORT_FORMATS, help='Input format (detected by default)')
+    parser.add_argument('--workers', '-w', type=int, help='Number of validation processes')
+    parser.add_argument('--batch-size', '-b', type=int, default=settings.IMPORT_BATCH_SIZE, help='Rows per INSERT')
+    parser.add_argument('--report', '-r', help='Write the per-record report as JSON to this file')
+    parser.add_argument('--dry-run', action='store_true', help='Validate only, do not insert')
+
+    args = parser.parse_args()
+
+    settings.validate()
+
+    cli = ImportCLI(args.workers, settings.IMPORT_CHUNK_SIZE, args.batch_size)
+    report = cli.run(args.file, args.format, args.dry_run)
+    if report is None:
+        sys.exit(1)
+
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"Report written to {args.report}")
+
+    if report['invalid'] or report['conflicts']:
+        sys.exit(2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+import copy
+from typing import Any, Dict, List
+
+
+def _pointer(segments: List[str]) -> str:
+    return ''.join('/' + segment.replace('~', '~0').replace('/', '~1') for segment in segments)
+
+
+def _segments(pointer: str) -> List[str]:
+    # В отличие от parse_json_path допускаются пустые ключи
+    return [segment.replace('~1', '/').replace('~0', '~') for segment in pointer[1:].split('/')]
+
+
+def _diff(source: Any, target: Any, segments: List[str], ops: List[Dict[str, Any]]) -> None:
+    if isinstance(source, dict) and isinstance(target, dict):
+        for key in source:
+            if key not in target:
+                ops.append({'op': 'remove', 'path': _pointer(segments + [key])})
+        for key, value in target.items():
+            if key not in source:
+                ops.append({'op': 'add', 'path': _pointer(segments + [key]), 'value': value})
+            else:
+                _diff(source[key], value, segments + [key], ops)
+    elif isinstance(source, list) and isinstance(target, list) and len(source) == len(target):
+        for index, (source_item, target_item) in enumerate(zip(source, target)):
+            _diff(source_item, target_item, segments + [str(index)], ops)
+    elif type(source) is not type(target) or source != target:
+        # Списки разной длины заменяются целиком, поэтому индексы в операциях всегда стабильны
+        ops.append({'op': 'replace', 'path': _pointer(segments), 'value': target})
+
+
+def diff_json(source: Any, target: Any) -> List[Dict[str, Any]]:
+    ops: List[Dict[str, Any]] = []
+    _diff(source, target, [], ops)
+    return ops
+
+
+def apply_json_diff(document: Any, ops: List[Dict[str, Any]], in_place: bool = False) -> Any:
+    if not in_place:
+        document = copy.deepcopy(document)
+
+    for op in ops:
+        if op['path'] == '':
+            document = copy.deepcopy(op['value'])
+            continue
+
+        segments: List[str] = _segments(op['path'])
+        parent: Any = document
+        for segment in segments[:-1]:
+            parent = parent[int(segment)] if isinstance(parent, list) else parent[segment]
+
+        key: Any = int(segments[-1]) if isinstance(parent, list) else segments[-1]
+        if op['op'] == 'remove':
+            del parent[key]
+        elif op['op'] in ('add', 'replace'):
+            parent[key] = copy.deepcopy(op['value'])
+        else:
+            raise ValueError(f"Unsupported diff operation: {op['op']}")
+
+    return document
@@ -0,0 +1,38 @@
+from typing import Any, List, Sequence
+
+
+MISSING = object()
+
+
+def parse_json_path(path: str) -> List[str]:
+    if path.startswith('/'):
+        # JSON Pointer (RFC 6901)
+        segments: List[str] = [segment.replace('~1', '/').replace('~0', '~') for segment in path[1:].split('/')]
+    else:
+        segments = path.split('.')
+
+    if not segments or any(segment == '' for segment in segments):
+        raise ValueError(f"Invalid path: {path!r}")
+    return segments
+
+
+def extract_json_path(document: Any, segments: Sequence[str]) -> Any:
+    node: Any = document
+    for segment in segments:
+        if isinstance(node, dict):
+            if segment not in node:
+                return MISSING
+            node = node[segment]
+        elif isinstance(node, list):
+            # Как и оператор #> в Postgres: отрицательный индекс считается с конца массива
+            if not segment.removeprefix('-').isdigit():
+                return MISSING
+            index: int = int(segment)
+            if index < 0:
+                index += len(node)
+            if not 0 <= index < len(node):
+                return MISSING
+            node = node[index]
+        else:
+            return MISSING
+    return node
@@ -1,17 +1,37 @@
 import os
 
 from twisted.python import log
-from twisted.internet import defer
+from twisted.internet import defer, threads
+
+
+# Файл с такой строкой выполняется вне транзакции, например для CREATE INDEX CONCURRENTLY
+NO_TRANSACTION_MARKER = '-- migration: no-transaction'
 
 
 class MigrationManager:
-    def __init__(self, db_pool):
+    def __init__(self, db_pool, connection_factory=None):
         self.db_pool = db_pool
+        self.connection_factory = connection_factory
         self.migrations_dir = os.path.join(
             os.path.dirname(os.path.dirname(os.path.dirname(__file__))),
             'migrations'
         )
 
+    @staticmethod
+    def split_statements(sql_content):
+        statements = []
+        for chunk in sql_content.split(';'):
+            # Комментарии перед оператором не должны отбрасывать сам оператор
+            lines = [line for line in chunk.splitlines() if not line.strip().startswith('--')]
+            statement = '\n'.join(lines).strip()
+            if statement:
+                statements.append(statement)
+        return statements
+
+    @staticmethod
+    def is_transactional(sql_content):
+        return not any(line.strip() == NO_TRANSACTION_MARKER for line in sql_content.splitlines())
+
     @defer.inlineCallbacks
     def init_migrations_table(self):
         sql = '''
@@ -33,24 +53,37 @@ class MigrationManager:
 
     @defer.inlineCallbacks
     def apply_migration(self, version, sql_file_path):
-        def _apply_in_transaction(txn):
-            with open(sql_file_path, 'r', encoding='utf-8') as f:
-                sql_content = f.read()
-
-            statements = [stmt.strip() for stmt in sql_content.split(';') if stmt.strip()]
-
+        def _apply_in_transaction(txn, statements):
             for statement in statements:
-                if statement and not statement.startswith('--'):
-                    txn.execute(statement)
+                txn.execute(statement)
 
             txn.execute(
                 "INSERT INTO schema_migrations (version) VALUES (%s)",
                 (version,)
             )
 
+        def _apply_without_transaction(statements):
+            # Отдельное соединение в autocommit: операторы пула всегда выполняются внутри транзакции
+            connection = self.connection_factory()
+            try:
+                connection.autocommit = True
+                with connection.cursor() as cursor:
+                    _apply_in_transaction(cursor, statements)
+            finally:
+                connection.close()
+
         is_applied = yield self.is_migration_applied(version)
         if not is_applied:
-            yield self.db_pool.runInteraction(_apply_in_transaction)
+            with open(sql_file_path, 'r', encoding='utf-8') as f:
+                sql_content = f.read()
+            statements = self.split_statements(sql_content)
+
+            if self.is_transactional(sql_content):
+                yield self.db_pool.runInteraction(_apply_in_transaction, statements)
+            elif self.connection_factory is None:
+                raise RuntimeError(f"Migration {version} must run outside a transaction, but no connection factory is set")
+            else:
+                yield threads.deferToThread(_apply_without_transaction, statements)
             log.msg(f"Applied migration: {version}")
         else:
             log.msg(f"Migration {version} already applied")
@@ -0,0 +1,50 @@
+from typing import Any, Callable, Dict, Hashable, List
+
+from twisted.internet import defer
+from twisted.python.failure import Failure
+
+
+class SingleFlight:
+
+    def __init__(self) -> None:
+        self._calls: Dict[Hashable, List[defer.Deferred]] = {}
+        self.leaders: int = 0
+        self.coalesced: int = 0
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    def run(self, key: Hashable, func: Callable[..., Any], *args: Any, **kwargs: Any) -> defer.Deferred[Any]:
+        waiters: List[defer.Deferred] = self._calls.get(key)
+        if waiters is not None:
+            self.coalesced += 1
+            d: defer.Deferred[Any] = defer.Deferred()
+            waiters.append(d)
+            return d
+
+        waiters = []
+        self._calls[key] = waiters
+        self.leaders += 1
+        d = defer.maybeDeferred(func, *args, **kwargs)
+        d.addBoth(self._resolve, key, waiters)
+        return d
+
+    def _resolve(self, result: Any, key: Hashable, waiters: List[defer.Deferred]) -> Any:
+        # Ключ снимается до оповещения, чтобы колбэки ожидающих могли начать новый вызов
+        if self._calls.get(key) is waiters:
+            del self._calls[key]
+        for waiter in waiters:
+            if isinstance(result, Failure):
+                waiter.errback(result)
+            else:
+                waiter.callback(result)
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        total: int = self.leaders + self.coalesced
+        return {
+            'in_flight': len(self._calls),
+            'leaders': self.leaders,
+            'coalesced': self.coalesced,
+            'coalesced_ratio': round(self.coalesced / total, 4) if total else 0.0
+        }
@@ -0,0 +1,230 @@
+import sys
+import time
+import resource
+import argparse
+from io import BytesIO
+
+from twisted.python import log
+from twisted.python.failure import Failure
+from twisted.internet import defer, protocol, reactor
+from twisted.web.client import Agent, FileBodyProducer, readBody
+from twisted.web.http_headers import Headers
+
+
+def read_rss_kb(pid):
+    if not pid:
+        return None
+    try:
+        with open(f'/proc/{pid}/status', 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+    return None
+
+
+def percentile(samples, fraction):
+    if not samples:
+        return 0.0
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+def raise_fd_limit(connections):
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    wanted = connections + 256
+    if soft < wanted:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (min(wanted, hard), hard))
+    return resource.getrlimit(resource.RLIMIT_NOFILE)[0]
+
+
+class StreamClient(protocol.Protocol):
+
+    def __init__(self, benchmark):
+        self.benchmark = benchmark
+        self.subscribed = defer.Deferred()
+        self._buffer = b''
+        self._headers_done = False
+
+    def connectionMade(self):
+        # HTTP/1.0 — тело идёт без chunked-кодирования, события разбираются напрямую
+        self.transport.write(
+            f'GET /config/{self.benchmark.service}/stream HTTP/1.0\r\n'
+            f'Host: {self.benchmark.host}\r\nAccept: text/event-stream\r\n\r\n'.encode('utf-8')
+        )
+
+    def dataReceived(self, data):
+        self._buffer += data
+        if not self._headers_done:
+            if b'\r\n\r\n' not in self._buffer:
+                return
+            head, self._buffer = self._buffer.split(b'\r\n\r\n', 1)
+            if b' 200 ' not in head.split(b'\r\n', 1)[0]:
+                self.transport.loseConnection()
+                if not self.subscribed.called:
+                    self.subscribed.errback(RuntimeError(head.split(b'\r\n', 1)[0].decode('latin-1')))
+                return
+            self._headers_done = True
+
+        while b'\n\n' in self._buffer:
+            event, self._buffer = self._buffer.split(b'\n\n', 1)
+            self.eventReceived(event)
+
+    def eventReceived(self, event):
+        if event.startswith(b'retry:') and not self.subscribed.called:
+            self.subscribed.callback(self)
+            return
+        for line in event.split(b'\n'):
+            if line.startswith(b'id: '):
+                self.benchmark.received(int(line[4:]))
+                return
+
+    def connectionLost(self, reason):
+        if not self.subscribed.called:
+            self.subscribed.errback(reason)
+
+
+class StreamClientFactory(protocol.ClientFactory):
+
+    def __init__(self, client):
+        self.client = client
+
+    def buildProtocol(self, addr):
+        return self.client
+
+    def clientConnectionFailed(self, connector, reason):
+        if not self.client.subscribed.called:
+            self.client.subscribed.errback(reason)
+
+
+class StreamBenchmark:
+    def __init__(self, service, host='127.0.0.1', port=8080, connections=1000, batch=500, server_pid=None,
+                 timeout=30.0):
+        self.service = service
+        self.host = host
+        self.port = port
+        self.connections = connections
+        self.batch = batch
+        self.server_pid = server_pid
+        self.timeout = timeout
+        self.clients = []
+        self.failed = 0
+        self.baseline = 0
+        self.published_at = None
+        self.latencies = []
+        self._delivered = None
+
+    def received(self, version):
+        if self.published_at is None:
+            self.baseline = max(self.baseline, version)
+        elif version > self.baseline:
+            self.latencies.append(time.perf_counter() - self.published_at)
+            if len(self.latencies) >= len(self.clients) and not self._delivered.called:
+                self._delivered.callback(None)
+
+    @defer.inlineCallbacks
+    def _connect(self, count):
+        clients = [StreamClient(self) for _ in range(count)]
+        for client in clients:
+            reactor.connectTCP(self.host, self.port, StreamClientFactory(client), timeout=self.timeout)
+        results = yield defer.DeferredList([client.subscribed for client in clients], consumeErrors=True)
+        subscribed = [client for (ok, _), client in zip(results, clients) if ok]
+        self.clients.extend(subscribed)
+        self.failed += count - len(subscribed)
+
+    @defer.inlineCallbacks
+    def _publish(self):
+        agent = Agent(reactor)
+        body = f'benchmark:\n  published_at: {time.time()}\n'.encode('utf-8')
+        self.published_at = time.perf_counter()
+        response = yield agent.request(
+            b'POST', f'http://{self.host}:{self.port}/config/{self.service}'.encode('utf-8'),
+            Headers({b'Content-Type': [b'application/x-yaml']}), FileBodyProducer(BytesIO(body))
+        )
+        yield readBody(response)
+        if response.code != 201:
+            raise RuntimeError(f"Publishing a new version failed with HTTP {response.code}")
+
+    @defer.inlineCallbacks
+    def run(self):
+        rss_before = read_rss_kb(self.server_pid)
+        started = time.perf_counter()
+        while len(self.clients) + self.failed < self.connections:
+            yield self._connect(min(self.batch, self.connections - len(self.clients) - self.failed))
+        connect_seconds = time.perf_counter() - started
+        rss_after = read_rss_kb(self.server_pid)
+
+        self._delivered = defer.Deferred()
+        self._delivered.addTimeout(self.timeout, reactor)
+        yield self._publish()
+        try:
+            yield self._delivered
+        except defer.TimeoutError:
+            pass
+
+        for client in self.clients:
+            client.transport.loseConnection()
+
+        self.latencies.sort()
+        rss_delta = rss_after - rss_before if rss_before is not None and rss_after is not None else None
+        defer.returnValue({
+            'connections': len(self.clients),
+            'failed': self.failed,
+            'connect_seconds': round(connect_seconds, 2),
+            'rss_before_mb': round(rss_before / 1024, 1) if rss_before is not None else None,
+            'rss_after_mb': round(rss_after / 1024, 1) if rss_after is not None else None,
+            'kb_per_connection': round(rss_delta / len(self.clients), 2) if rss_delta is not None and self.clients else None,
+            'delivered': len(self.latencies),
+            'p50_ms': round(percentile(self.latencies, 0.50) * 1000, 2),
+            'p95_ms': round(percentile(self.latencies, 0.95) * 1000, 2),
+            'p99_ms': round(percentile(self.latencies, 0.99) * 1000, 2),
+            'max_ms': round(self.latencies[-1] * 1000, 2) if self.latencies else 0.0
+        })
+
+
+@defer.inlineCallbacks
+def run_benchmark(args):
+    benchmark = StreamBenchmark(args.service, args.host, args.port, args.connections, args.batch, args.pid,
+                                args.timeout)
+    result = yield benchmark.run()
+    print(f"subscribers:        {result['connections']} ({result['failed']} failed, "
+          f"opened in {result['connect_seconds']}s)")
+    if result['kb_per_connection'] is not None:
+        print(f"server RSS:         {result['rss_before_mb']} MB -> {result['rss_after_mb']} MB "
+              f"({result['kb_per_connection']} KB per connection)")
+    print(f"event delivered to: {result['delivered']}/{result['connections']}")
+    print(f"{'fan-out':<10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    print(f"{'':<10}{result['p50_ms']:>10}{result['p95_ms']:>10}{result['p99_ms']:>10}{result['max_ms']:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure SSE change stream capacity of a running config service')
+    parser.add_argument('service', help='Service to subscribe to; one new version is published to it')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--connections', '-n', type=int, default=1000, help='Number of concurrent subscribers')
+    parser.add_argument('--batch', '-b', type=int, default=500, help='Connections opened at once')
+    parser.add_argument('--pid', type=int, help='Server process id, to report its resident memory')
+    parser.add_argument('--timeout', type=float, default=30.0, help='Seconds to wait for connects and delivery')
+
+    args = parser.parse_args()
+
+    limit = raise_fd_limit(args.connections)
+    if limit < args.connections:
+        print(f"Warning: open file limit is {limit}, fewer than {args.connections} connections", file=sys.stderr)
+
+    exit_code = []
+
+    def _done(result):
+        if isinstance(result, Failure):
+            log.err(result, "Benchmark failed")
+            exit_code.append(1)
+        reactor.stop()
+
+    reactor.callWhenRunning(lambda: run_benchmark(args).addBoth(_done))
+    reactor.run()
+    sys.exit(exit_code[0] if exit_code else 0)
+
+
+if __name__ == '__main__':
+    main()
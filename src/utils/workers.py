@@ -0,0 +1,124 @@
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from twisted.python import log
+from twisted.python.failure import Failure
+from twisted.python.threadpool import ThreadPool
+from twisted.internet import defer, reactor, threads
+
+from src.config.settings import settings
+
+
+class WorkerPool:
+
+    KINDS = ('thread', 'process')
+
+    def __init__(self, kind: str = 'thread', size: int = 4, timeout: Optional[float] = 10.0,
+                 inline_threshold: int = 64 * 1024) -> None:
+        if kind not in self.KINDS:
+            raise ValueError(f"Unknown worker pool kind: {kind}")
+        self.kind: str = kind
+        self.size: int = size
+        self.timeout: Optional[float] = timeout
+        self.inline_threshold: int = inline_threshold
+        self._threads: Optional[ThreadPool] = None
+        self._processes: Optional[ProcessPoolExecutor] = None
+        self.inline_tasks: int = 0
+        self.offloaded_tasks: int = 0
+        self.timed_out_tasks: int = 0
+
+    def _thread_pool(self) -> ThreadPool:
+        if self._threads is None:
+            self._threads = ThreadPool(minthreads=0, maxthreads=self.size, name='config-workers')
+            self._threads.start()
+            reactor.addSystemEventTrigger('during', 'shutdown', self.stop)
+        return self._threads
+
+    def _process_pool(self) -> ProcessPoolExecutor:
+        if self._processes is None:
+            # Пул создаётся лениво из работающего реактора: fork унаследовал бы реактор,
+            # сокеты и потоки пула БД, поэтому процессы запускаются с чистого интерпретатора
+            start_method: str = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+            self._processes = ProcessPoolExecutor(max_workers=self.size,
+                                                  mp_context=multiprocessing.get_context(start_method))
+            if self._threads is None:
+                reactor.addSystemEventTrigger('during', 'shutdown', self.stop)
+        return self._processes
+
+    def stop(self) -> None:
+        if self._threads is not None:
+            self._threads.stop()
+            self._threads = None
+        if self._processes is not None:
+            self._processes.shutdown(wait=False, cancel_futures=True)
+            self._processes = None
+
+    def run(self, func: Callable[..., Any], *args: Any, size: int = 0, offload: bool = False,
+            **kwargs: Any) -> defer.Deferred[Any]:
+        if self.kind == 'process' and (offload or size >= self.inline_threshold):
+            self.offloaded_tasks += 1
+            future: Future = self._process_pool().submit(func, *args, **kwargs)
+            return self._with_timeout(self._from_future(future))
+        return self.run_in_thread(func, *args, size=size, offload=offload, **kwargs)
+
+    def run_in_thread(self, func: Callable[..., Any], *args: Any, size: int = 0, offload: bool = False,
+                      **kwargs: Any) -> defer.Deferred[Any]:
+        # offload отправляет задачу в пул независимо от порога размера
+        if (size < self.inline_threshold and not offload) or self.size <= 0:
+            self.inline_tasks += 1
+            return defer.maybeDeferred(func, *args, **kwargs)
+
+        self.offloaded_tasks += 1
+        d: defer.Deferred[Any] = threads.deferToThreadPool(reactor, self._thread_pool(), func, *args, **kwargs)
+        return self._with_timeout(d)
+
+    def _with_timeout(self, d: defer.Deferred[Any]) -> defer.Deferred[Any]:
+        if not self.timeout:
+            return d
+
+        def _on_timeout(result: Any, timeout: float) -> Any:
+            if isinstance(result, Failure) and result.check(defer.CancelledError):
+                self.timed_out_tasks += 1
+                log.msg(f"Worker task timed out after {timeout}s")
+                raise defer.TimeoutError(timeout, "Worker task timed out")
+            return result
+
+        return d.addTimeout(self.timeout, reactor, onTimeoutCancel=_on_timeout)
+
+    @staticmethod
+    def _from_future(future: Future) -> defer.Deferred[Any]:
+        d: defer.Deferred[Any] = defer.Deferred(lambda _: future.cancel())
+
+        def _resolve(f: Future) -> None:
+            if d.called or f.cancelled():
+                return
+            error: Optional[BaseException] = f.exception()
+            if error is not None:
+                d.errback(error)
+            else:
+                d.callback(f.result())
+
+        def _done(f: Future) -> None:
+            reactor.callFromThread(_resolve, f)
+
+        future.add_done_callback(_done)
+        return d
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'kind': self.kind,
+            'size': self.size,
+            'inline_threshold': self.inline_threshold,
+            'inline_tasks': self.inline_tasks,
+            'offloaded_tasks': self.offloaded_tasks,
+            'timed_out_tasks': self.timed_out_tasks
+        }
+
+
+worker_pool = WorkerPool(
+    kind=settings.WORKER_POOL_KIND,
+    size=settings.WORKER_POOL_SIZE,
+    timeout=settings.WORKER_TASK_TIMEOUT,
+    inline_threshold=settings.WORKER_INLINE_THRESHOLD
+)
@@ -0,0 +1,167 @@
+import sys
+import json
+import time
+import uuid
+import argparse
+
+from twisted.python import log
+from twisted.python.failure import Failure
+from twisted.internet import defer, reactor
+from twisted.enterprise import adbapi
+
+from src.config.settings import settings
+from src.repositories.configuration_repository import ConfigurationRepository
+from src.repositories.write_batcher import WriteBatcher
+
+
+MODES = ('direct', 'batched')
+
+
+def create_pool(pool_size):
+    return adbapi.ConnectionPool(
+        'psycopg2',
+        host=settings.POSTGRES_HOST,
+        port=settings.POSTGRES_PORT,
+        database=settings.POSTGRES_DB,
+        user=settings.POSTGRES_USER,
+        password=settings.POSTGRES_PASSWORD,
+        cp_min=pool_size,
+        cp_max=pool_size,
+        cp_reconnect=True,
+        cp_noisy=False
+    )
+
+
+def percentile(samples, fraction):
+    if not samples:
+        return 0.0
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+def scratch_services(count):
+    # Отдельные имена на каждый запуск: бенчмарк не пишет в настоящие сервисы
+    prefix = f"write-benchmark-{uuid.uuid4().hex[:8]}"
+    return [f"{prefix}-{index}" for index in range(count)]
+
+
+class WriteBenchmark:
+    def __init__(self, services, writes=2000, concurrency=64, pool_size=10,
+                 batch_window_ms=settings.WRITE_BATCH_WINDOW_MS, batch_max_size=settings.WRITE_BATCH_MAX_SIZE):
+        self.services = services
+        self.writes = writes
+        self.concurrency = concurrency
+        self.pool_size = pool_size
+        self.batch_window = batch_window_ms / 1000.0
+        self.batch_max_size = batch_max_size
+
+    @defer.inlineCallbacks
+    def _writer(self, repository, writer, remaining, latencies, outcome):
+        while remaining:
+            index = remaining.pop()
+            # Все писатели без явной версии конкурируют за следующий номер одного сервиса
+            payload = {'benchmark': {'writer': writer, 'sequence': index}}
+            started = time.perf_counter()
+            try:
+                yield repository.save(self.services[index % len(self.services)], None, json.dumps(payload))
+            except ValueError:
+                outcome['conflicts'] += 1
+                continue
+            except Exception as e:
+                outcome['errors'] += 1
+                log.msg(f"Benchmark write failed: {str(e)}")
+                continue
+            latencies.append(time.perf_counter() - started)
+
+    @defer.inlineCallbacks
+    def cleanup(self):
+        pool = create_pool(1)
+        try:
+            yield pool.runOperation("DELETE FROM configurations WHERE service = ANY(%s)", (self.services,))
+            yield pool.runOperation("DELETE FROM service_versions WHERE service = ANY(%s)", (self.services,))
+        finally:
+            pool.close()
+
+    @defer.inlineCallbacks
+    def run(self, mode):
+        pool = create_pool(self.pool_size)
+        repository = ConfigurationRepository(pool)
+        repository.batcher = WriteBatcher(repository, self.batch_window, self.batch_max_size) \
+            if mode == 'batched' else None
+        outcome = {'conflicts': 0, 'errors': 0}
+        try:
+            remaining = list(range(self.writes))
+            latencies = []
+            started = time.perf_counter()
+            yield defer.gatherResults([
+                self._writer(repository, writer, remaining, latencies, outcome) for writer in range(self.concurrency)
+            ], consumeErrors=True)
+            elapsed = time.perf_counter() - started
+        finally:
+            pool.close()
+
+        latencies.sort()
+        defer.returnValue({
+            'mode': mode,
+            'writes': len(latencies),
+            'conflicts': outcome['conflicts'],
+            'errors': outcome['errors'],
+            'batches': repository.batcher.batches if repository.batcher is not None else len(latencies),
+            'seconds': round(elapsed, 3),
+            'throughput': round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+            'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+            'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+            'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+            'max_ms': round(latencies[-1] * 1000, 2) if latencies else 0.0
+        })
+
+
+@defer.inlineCallbacks
+def run_benchmark(args):
+    benchmark = WriteBenchmark(scratch_services(args.services), args.writes, args.concurrency, args.pool_size,
+                               args.batch_window_ms, args.batch_max_size)
+    modes = MODES if args.mode == 'both' else (args.mode,)
+    print(f"services: {', '.join(benchmark.services)}")
+    print(f"{'mode':<10}{'writes/s':>10}{'conflicts':>11}{'errors':>8}{'commits':>9}"
+          f"{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    try:
+        for mode in modes:
+            result = yield benchmark.run(mode)
+            print(f"{result['mode']:<10}{result['throughput']:>10}{result['conflicts']:>11}{result['errors']:>8}"
+                  f"{result['batches']:>9}{result['p50_ms']:>10}{result['p95_ms']:>10}"
+                  f"{result['p99_ms']:>10}{result['max_ms']:>10}")
+    finally:
+        if not args.keep:
+            yield benchmark.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure write contention with and without the write batcher')
+    parser.add_argument('--services', '-s', type=int, default=1,
+                        help='Number of scratch services the writers share; they are created for this run')
+    parser.add_argument('--mode', '-m', choices=MODES + ('both',), default='both')
+    parser.add_argument('--writes', '-n', type=int, default=2000, help='Total number of saves per mode')
+    parser.add_argument('--concurrency', '-c', type=int, default=64, help='Concurrent writers')
+    parser.add_argument('--pool-size', '-p', type=int, default=settings.DB_POOL_MAX, help='Database connections')
+    parser.add_argument('--batch-window-ms', type=float, default=settings.WRITE_BATCH_WINDOW_MS)
+    parser.add_argument('--batch-max-size', type=int, default=settings.WRITE_BATCH_MAX_SIZE)
+    parser.add_argument('--keep', action='store_true', help='Keep the scratch services after the run')
+
+    args = parser.parse_args()
+
+    settings.validate()
+
+    exit_code = []
+
+    def _done(result):
+        if isinstance(result, Failure):
+            log.err(result, "Benchmark failed")
+            exit_code.append(1)
+        reactor.stop()
+
+    reactor.callWhenRunning(lambda: run_benchmark(args).addBoth(_done))
+    reactor.run()
+    sys.exit(exit_code[0] if exit_code else 0)
+
+
+if __name__ == '__main__':
+    main()
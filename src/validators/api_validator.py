@@ -1,4 +1,7 @@
+from datetime import datetime
 from twisted.web.http import Request
+
+from src.utils.json_path import parse_json_path
 from typing import Tuple, List, Optional, Any, Dict
 
 
@@ -16,6 +19,39 @@ class APIValidator:
         except ValueError:
             return False, None
 
+    @staticmethod
+    def validate_limit_param(limit_str: Optional[str], default: int = 10, max_limit: int = 1000) -> Tuple[bool, Optional[int]]:
+        if not limit_str:
+            return True, default
+
+        try:
+            limit: int = int(limit_str)
+        except ValueError:
+            return False, None
+        if limit < 1 or limit > max_limit:
+            return False, None
+        return True, limit
+
+    @staticmethod
+    def validate_datetime_param(datetime_str: Optional[str]) -> Tuple[bool, Optional[datetime]]:
+        if not datetime_str:
+            return True, None
+
+        try:
+            return True, datetime.fromisoformat(datetime_str)
+        except ValueError:
+            return False, None
+
+    @staticmethod
+    def validate_path_param(path_str: Optional[str]) -> Tuple[bool, Optional[List[str]]]:
+        if not path_str:
+            return True, None
+
+        try:
+            return True, parse_json_path(path_str)
+        except ValueError:
+            return False, None
+
     @staticmethod
     def validate_template_param(template_str: Optional[str]) -> bool:
         if not template_str:
@@ -23,6 +59,65 @@ class APIValidator:
 
         return template_str.lower() in ('1', 'true', 'yes')
 
+    @staticmethod
+    def validate_flag_param(flag_str: Optional[str], default: bool = False) -> bool:
+        if not flag_str:
+            return default
+
+        return flag_str.lower() in ('1', 'true', 'yes')
+
+    @staticmethod
+    def validate_batch_request(data: Any, max_items: int = 500) -> Tuple[bool, Any]:
+        if not isinstance(data, dict) or not isinstance(data.get('services'), list):
+            return False, "Request body must be an object with a 'services' list"
+
+        services: List[Any] = data['services']
+        versions: Any = data.get('versions') or {}
+        if not isinstance(versions, dict):
+            return False, "'versions' must be an object mapping service names to versions"
+        if len(services) > max_items:
+            return False, f"Too many services in batch (max {max_items})"
+
+        requests: List[Tuple[str, Optional[int]]] = []
+        seen: set = set()
+        for service in services:
+            if not isinstance(service, str):
+                return False, "Service names must be strings"
+            if service in seen:
+                continue
+            seen.add(service)
+
+            version: Any = versions.get(service)
+            if version is not None and (not isinstance(version, int) or isinstance(version, bool) or version < 1):
+                return False, f"Invalid version for service {service}"
+            requests.append((service, version))
+
+        return True, requests
+
+    @staticmethod
+    def validate_retention_policy(data: Any, max_pinned: int = 100) -> Tuple[bool, Any]:
+        if not isinstance(data, dict):
+            return False, "Request body must be a JSON object"
+
+        policy: Dict[str, Any] = {}
+        for name in ('keep_last', 'max_age_days'):
+            value: Any = data.get(name)
+            if value is not None and (not isinstance(value, int) or isinstance(value, bool) or value < 0):
+                return False, f"'{name}' must be a non-negative integer or null"
+            policy[name] = value
+
+        pinned: Any = data.get('pinned')
+        if pinned is not None:
+            if not isinstance(pinned, list) or len(pinned) > max_pinned:
+                return False, f"'pinned' must be a list of at most {max_pinned} versions"
+            for version in pinned:
+                if not isinstance(version, int) or isinstance(version, bool) or version < 1:
+                    return False, "Pinned versions must be positive integers"
+            pinned = sorted(set(pinned))
+        policy['pinned'] = pinned
+
+        return True, policy
+
     @staticmethod
     def validate_content_length(content: bytes, max_size: int = 1024 * 1024) -> Tuple[bool, str]:
         if len(content) > max_size:
@@ -0,0 +1,17 @@
+from typing import Any, Iterable, List, Tuple
+
+from src.repositories.transaction import Statement, Steps
+
+
+def drive(steps: Steps, results: Iterable[Any]) -> Tuple[List[Statement], Any]:
+    # Выполняет шаги транзакции без базы: каждый запрос получает следующий заготовленный результат
+    statements: List[Statement] = []
+    pending = iter(results)
+    result: Any = None
+    try:
+        while True:
+            statement: Statement = steps.send(result)
+            statements.append(statement)
+            result = next(pending, None)
+    except StopIteration as stop:
+        return statements, stop.value
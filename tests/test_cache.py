@@ -0,0 +1,75 @@
+from src.utils.cache import LRUCache
+
+
+class FakeClock:
+
+    def __init__(self) -> None:
+        self.now: float = 100.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_get_returns_stored_value():
+    cache = LRUCache(4)
+    cache.set('a', 1)
+
+    assert cache.get('a') == 1
+    assert cache.get('missing', 'default') == 'default'
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 1
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = LRUCache(2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    assert cache.get('c') == 3
+    assert cache.evictions == 1
+
+
+def test_entries_expire_after_ttl():
+    clock = FakeClock()
+    cache = LRUCache(4, ttl=10, clock=clock)
+    cache.set('a', 1)
+
+    clock.now += 9.9
+    assert cache.get('a') == 1
+
+    clock.now += 0.1
+    assert cache.peek('a') is None
+    assert cache.get('a') is None
+    assert len(cache) == 0
+
+
+def test_peek_does_not_refresh_recency():
+    cache = LRUCache(2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.peek('a')
+    cache.set('c', 3)
+
+    assert 'a' not in cache
+    assert cache.stats()['hits'] == 0
+
+
+def test_zero_size_cache_stores_nothing():
+    cache = LRUCache(0)
+    cache.set('a', 1)
+
+    assert len(cache) == 0
+
+
+def test_delete_where_removes_matching_keys():
+    cache = LRUCache(8)
+    for version in (None, 1, 2):
+        cache.set(('svc', version), version)
+    cache.set(('other', None), 0)
+
+    assert cache.delete_where(lambda key: key[0] == 'svc') == 3
+    assert ('other', None) in cache
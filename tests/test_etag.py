@@ -0,0 +1,80 @@
+import gzip
+import json
+
+from twisted.web.test.requesthelper import DummyRequest
+
+from src.api.handlers import BaseHandler, encode_response, representation_etag
+from src.config.settings import settings
+
+
+ETAG = '"abc123"'
+
+
+def make_request(if_none_match=None, accept_encoding=None, pretty=False):
+    request = DummyRequest([b''])
+    if if_none_match is not None:
+        request.requestHeaders.setRawHeaders(b'if-none-match', [if_none_match.encode('latin-1')])
+    if accept_encoding is not None:
+        request.requestHeaders.setRawHeaders(b'accept-encoding', [accept_encoding.encode('latin-1')])
+    if pretty:
+        request.args[b'pretty'] = [b'true']
+    return request
+
+
+def test_each_representation_gets_its_own_tag():
+    tags = {
+        representation_etag(ETAG),
+        representation_etag(ETAG, pretty=True),
+        representation_etag(ETAG, content_encoding='gzip'),
+        representation_etag(ETAG, pretty=True, content_encoding='gzip'),
+        representation_etag(ETAG, content_encoding='deflate')
+    }
+
+    assert len(tags) == 5
+    assert representation_etag(ETAG) == ETAG
+    assert representation_etag(ETAG, pretty=True, content_encoding='gzip') == '"abc123-pretty-gzip"'
+
+
+def test_small_bodies_are_not_compressed():
+    body, encoding = encode_response({'a': 1}, encoding='gzip')
+
+    assert encoding is None
+    assert body == b'{"a": 1}'
+
+
+def test_large_bodies_are_compressed_with_negotiated_encoding():
+    data = {'value': 'x' * settings.RESPONSE_COMPRESSION_MIN_SIZE}
+
+    body, encoding = encode_response(data, encoding='gzip')
+
+    assert encoding == 'gzip'
+    assert json.loads(gzip.decompress(body)) == data
+
+
+def test_pretty_printing_reformats_stored_bytes():
+    body, _ = encode_response(b'{"a": 1}', pretty=True)
+
+    assert body == b'{\n  "a": 1\n}'
+
+
+def test_if_none_match_accepts_plain_and_encoded_variants():
+    handler = BaseHandler(None)
+
+    assert handler.etag_matches(make_request('"abc123"', 'gzip'), ETAG) == '"abc123"'
+    assert handler.etag_matches(make_request('"abc123-gzip"', 'gzip'), ETAG) == '"abc123-gzip"'
+    assert handler.etag_matches(make_request('W/"abc123-gzip"', 'gzip'), ETAG) == '"abc123-gzip"'
+
+
+def test_if_none_match_rejects_other_representations():
+    handler = BaseHandler(None)
+
+    assert handler.etag_matches(make_request('"abc123-gzip"'), ETAG) is None
+    assert handler.etag_matches(make_request('"abc123-pretty"'), ETAG) is None
+    assert handler.etag_matches(make_request('"abc123"', pretty=True), ETAG) is None
+    assert handler.etag_matches(make_request(), ETAG) is None
+
+
+def test_if_none_match_wildcard_matches_uncompressed_tag():
+    handler = BaseHandler(None)
+
+    assert handler.etag_matches(make_request('*', 'gzip', pretty=True), ETAG) == '"abc123-pretty"'
@@ -0,0 +1,35 @@
+import base64
+
+import pytest
+
+from src.services.configuration_service import ConfigService
+
+
+def test_cursor_round_trip():
+    params = {'limit': 20, 'before_version': 41, 'created_from': '2026-01-01T00:00:00'}
+
+    cursor = ConfigService.encode_history_cursor(params)
+
+    assert ConfigService.decode_history_cursor(cursor) == params
+
+
+def test_cursor_is_url_safe_and_unpadded():
+    cursor = ConfigService.encode_history_cursor({'before_version': 2 ** 31 - 1, 'limit': 1000})
+
+    assert '=' not in cursor
+    assert '+' not in cursor and '/' not in cursor
+
+
+def test_cursor_is_independent_of_key_order():
+    assert ConfigService.encode_history_cursor({'a': 1, 'b': 2}) == ConfigService.encode_history_cursor({'b': 2, 'a': 1})
+
+
+@pytest.mark.parametrize('cursor', [
+    'not-base64!',
+    base64.urlsafe_b64encode(b'{"unterminated').decode('ascii'),
+    base64.urlsafe_b64encode(b'[1, 2]').decode('ascii'),
+    base64.urlsafe_b64encode(b'\xff\xfe').decode('ascii')
+])
+def test_malformed_cursor_is_rejected(cursor):
+    with pytest.raises(ValueError, match="Invalid history cursor"):
+        ConfigService.decode_history_cursor(cursor)
@@ -0,0 +1,70 @@
+import json
+
+import pytest
+
+from src.services.import_service import (
+    build_import_report, detect_import_format, parse_import_body, split_import_stream, validate_import_record
+)
+
+
+VALID_CONFIG = {'version': 3, 'database': {'host': 'db', 'port': 5432}}
+
+
+def test_ndjson_stream_skips_blank_lines():
+    assert split_import_stream('{"a": 1}\n\n  \n{"b": 2}\n', 'ndjson') == ['{"a": 1}', '{"b": 2}']
+
+
+def test_yaml_stream_splits_on_document_separators():
+    texts = split_import_stream('service: a\n---\nservice: b\n--- \n', 'yaml')
+
+    assert [text.strip() for text in texts] == ['service: a', 'service: b']
+
+
+def test_format_is_detected_from_content_type_then_body():
+    assert detect_import_format('service: a', 'application/x-ndjson') == 'ndjson'
+    assert detect_import_format('{"service": "a"}', 'application/yaml') == 'yaml'
+    assert detect_import_format('  {"service": "a"}') == 'ndjson'
+    assert detect_import_format('service: a') == 'yaml'
+
+
+def test_parse_import_body_decodes_and_splits():
+    fmt, texts = parse_import_body(b'{"service": "a"}\n{"service": "b"}\n')
+
+    assert fmt == 'ndjson'
+    assert len(texts) == 2
+
+
+def test_parse_import_body_rejects_unknown_format_and_bad_encoding():
+    with pytest.raises(ValueError):
+        parse_import_body(b'{}', 'csv')
+    with pytest.raises(UnicodeDecodeError):
+        parse_import_body(b'\xff\xfe')
+
+
+def test_valid_record_is_normalized():
+    record = validate_import_record('ndjson', json.dumps({'service': 'svc-a', 'config': VALID_CONFIG}))
+
+    assert record['status'] == 'valid'
+    assert record['service'] == 'svc-a'
+    assert record['version'] == 3
+    assert json.loads(record['payload_json']) == VALID_CONFIG
+    assert len(record['content_hash']) == 64
+
+
+def test_invalid_records_carry_an_error():
+    assert validate_import_record('ndjson', '{not json')['status'] == 'invalid'
+    assert validate_import_record('ndjson', '[1, 2]')['error'] == "Record must be an object"
+    assert validate_import_record('ndjson', json.dumps({'service': 'svc-a'}))['status'] == 'invalid'
+
+
+def test_report_counts_statuses():
+    report = build_import_report([
+        {'status': 'inserted', 'service': 'a', 'version': 1},
+        {'status': 'unchanged', 'service': 'b', 'version': 4},
+        {'status': 'conflict', 'service': 'c', 'version': 2, 'error': 'exists'},
+        {'status': 'invalid', 'service': None, 'error': 'bad'}
+    ])
+
+    assert (report['total'], report['inserted'], report['unchanged'], report['conflicts'], report['invalid']) == \
+        (4, 1, 1, 1, 1)
+    assert report['records'][2] == {'index': 2, 'service': 'c', 'status': 'conflict', 'version': 2, 'error': 'exists'}
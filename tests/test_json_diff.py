@@ -0,0 +1,68 @@
+import copy
+
+import pytest
+
+from src.utils.json_diff import apply_json_diff, diff_json
+
+
+CASES = [
+    ({'a': 1}, {'a': 1}),
+    ({'a': 1}, {'a': 2}),
+    ({'a': 1, 'b': 2}, {'b': 2, 'c': 3}),
+    ({'nested': {'x': [1, 2, 3]}}, {'nested': {'x': [1, 5, 3]}}),
+    ({'items': [1, 2, 3]}, {'items': [1, 2]}),
+    ({'value': 1}, {'value': '1'}),
+    ({'value': 1}, {'value': True}),
+    ({'value': {'a': 1}}, {'value': [1]}),
+    ({'a/b': {'~c': 1}, '': 0}, {'a/b': {'~c': 2}, '': 1}),
+    ({'a': 1}, [1, 2]),
+    ([{'id': 1}, {'id': 2}], [{'id': 1}, {'id': 3}])
+]
+
+
+@pytest.mark.parametrize('source, target', CASES)
+def test_diff_applied_to_source_yields_target(source, target):
+    ops = diff_json(source, target)
+
+    assert apply_json_diff(source, ops) == target
+
+
+@pytest.mark.parametrize('source, target', CASES)
+def test_reverse_diff_restores_source(source, target):
+    # Так хранятся дельты: старая версия восстанавливается из более новой
+    assert apply_json_diff(target, diff_json(target, source)) == source
+
+
+def test_identical_documents_have_empty_diff():
+    assert diff_json({'a': [1, {'b': None}]}, {'a': [1, {'b': None}]}) == []
+
+
+def test_diff_is_minimal_for_nested_change():
+    assert diff_json({'a': {'b': 1, 'c': 2}}, {'a': {'b': 1, 'c': 3}}) == [
+        {'op': 'replace', 'path': '/a/c', 'value': 3}
+    ]
+
+
+def test_apply_copies_unless_in_place():
+    source = {'a': {'b': 1}}
+    original = copy.deepcopy(source)
+    ops = diff_json(source, {'a': {'b': 2}})
+
+    apply_json_diff(source, ops)
+    assert source == original
+
+    apply_json_diff(source, ops, in_place=True)
+    assert source == {'a': {'b': 2}}
+
+
+def test_applied_values_are_not_shared_with_the_diff():
+    ops = diff_json({}, {'a': {'b': 1}})
+    result = apply_json_diff({}, ops)
+    result['a']['b'] = 2
+
+    assert ops[0]['value'] == {'b': 1}
+
+
+def test_unknown_operation_is_rejected():
+    with pytest.raises(ValueError):
+        apply_json_diff({'a': 1}, [{'op': 'move', 'path': '/a', 'from': '/b'}])
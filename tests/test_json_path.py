@@ -0,0 +1,45 @@
+import pytest
+
+from src.utils.json_path import MISSING, extract_json_path, parse_json_path
+
+
+DOCUMENT = {'servers': [{'host': 'a'}, {'host': 'b'}, {'host': 'c'}], 'a/b': {'~key': 1}}
+
+
+def test_dotted_and_pointer_paths():
+    assert parse_json_path('servers.0.host') == ['servers', '0', 'host']
+    assert parse_json_path('/servers/0/host') == ['servers', '0', 'host']
+    assert parse_json_path('/a~1b/~0key') == ['a/b', '~key']
+
+
+@pytest.mark.parametrize('path', ['', '.', 'a..b', '/', '/a//b'])
+def test_empty_segments_are_rejected(path):
+    with pytest.raises(ValueError):
+        parse_json_path(path)
+
+
+def test_extracts_nested_values():
+    assert extract_json_path(DOCUMENT, ['servers', '1', 'host']) == 'b'
+    assert extract_json_path(DOCUMENT, ['a/b', '~key']) == 1
+
+
+def test_negative_indexes_count_from_the_end():
+    # Совпадает с оператором #> в Postgres
+    assert extract_json_path(DOCUMENT, ['servers', '-1', 'host']) == 'c'
+    assert extract_json_path(DOCUMENT, ['servers', '-3', 'host']) == 'a'
+    assert extract_json_path(DOCUMENT, ['servers', '-4']) is MISSING
+
+
+@pytest.mark.parametrize('segments', [
+    ['missing'],
+    ['servers', '3'],
+    ['servers', 'first'],
+    ['servers', '-'],
+    ['servers', '0', 'host', 'deeper']
+])
+def test_unresolvable_paths_are_missing(segments):
+    assert extract_json_path(DOCUMENT, segments) is MISSING
+
+
+def test_null_value_is_not_missing():
+    assert extract_json_path({'a': None}, ['a']) is None
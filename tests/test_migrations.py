@@ -0,0 +1,53 @@
+import os
+
+from src.utils.migrations import MigrationManager
+
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'migrations')
+
+
+def test_comment_before_statement_does_not_drop_it():
+    sql = """-- Migration 042: header
+CREATE TABLE t (id INTEGER);
+-- explain the index
+CREATE INDEX idx_t ON t (id);
+"""
+
+    assert MigrationManager.split_statements(sql) == [
+        'CREATE TABLE t (id INTEGER)',
+        'CREATE INDEX idx_t ON t (id)'
+    ]
+
+
+def test_comment_only_chunks_are_skipped():
+    assert MigrationManager.split_statements("-- nothing here\n;\n  ;\n-- trailing") == []
+
+
+def test_indented_comments_are_stripped():
+    sql = "CREATE TABLE t (\n    id INTEGER,\n    -- the owning service\n    service TEXT\n);"
+
+    assert MigrationManager.split_statements(sql) == ['CREATE TABLE t (\n    id INTEGER,\n    service TEXT\n)']
+
+
+def test_shipped_migrations_have_statements():
+    for name in sorted(os.listdir(MIGRATIONS_DIR)):
+        with open(os.path.join(MIGRATIONS_DIR, name), 'r', encoding='utf-8') as f:
+            statements = MigrationManager.split_statements(f.read())
+        assert statements, name
+        assert not any(statement.lstrip().startswith('--') for statement in statements), name
+
+
+def test_no_transaction_marker_is_detected():
+    assert MigrationManager.is_transactional("CREATE TABLE t (id INTEGER);")
+    assert not MigrationManager.is_transactional(
+        "-- Migration 042: index\n-- migration: no-transaction\nCREATE INDEX CONCURRENTLY idx ON t (id);"
+    )
+    assert MigrationManager.is_transactional("-- mentions -- migration: no-transaction inline\nSELECT 1;")
+
+
+def test_payload_search_index_is_built_outside_a_transaction():
+    with open(os.path.join(MIGRATIONS_DIR, '003_payload_search.sql'), 'r', encoding='utf-8') as f:
+        sql = f.read()
+
+    assert not MigrationManager.is_transactional(sql)
+    assert len(MigrationManager.split_statements(sql)) == 1
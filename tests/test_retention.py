@@ -0,0 +1,107 @@
+from twisted.internet import defer
+
+from src.config.settings import settings
+from src.repositories.configuration_repository import prune_steps
+from src.services.retention_service import RetentionService
+from tests.steps import drive
+
+
+def test_keep_last_skips_the_newest_versions():
+    statements, pruned = drive(prune_steps('svc', 5, 0, 100), [[(1,), (2,)], [], None])
+
+    select = statements[0]
+    assert 'OFFSET %s' in select.sql
+    assert select.params == ('svc', 'svc', 5, 100)
+    assert 'pinned_versions' in select.sql
+    assert pruned == [1, 2]
+    assert statements[-1].params == ('svc', [1, 2])
+
+
+def test_without_keep_last_the_latest_version_is_kept():
+    statements, _ = drive(prune_steps('svc', 0, 30, 100), [[]])
+
+    select = statements[0]
+    assert 'c.version < (SELECT max(version)' in select.sql
+    assert "INTERVAL '1 day'" in select.sql
+    assert select.params == ('svc', 'svc', 30, 100)
+
+
+def test_nothing_to_prune_issues_no_delete():
+    statements, pruned = drive(prune_steps('svc', 5, 0, 100), [[]])
+
+    assert pruned == []
+    assert len(statements) == 1
+
+
+def test_deltas_based_on_pruned_versions_are_expanded_first():
+    chain = [(7, 3, None, '{"a": 1}', None, 10)]
+    statements, pruned = drive(prune_steps('svc', 1, 0, 100), [[(3,)], [(2,)], chain, None, None])
+
+    assert pruned == [3]
+    update = statements[3]
+    assert update.sql.lstrip().startswith('UPDATE configurations SET payload')
+    assert update.params == ('{"a": 1}', 'svc', 2)
+    assert statements[4].sql.startswith('DELETE FROM configurations')
+
+
+class FakeRepository:
+
+    def __init__(self, policies, batches):
+        self.policies = policies
+        self.batches = batches
+        self.calls = []
+
+    def get_retention_policies(self, keep_last, max_age_days):
+        return defer.succeed(self.policies)
+
+    def prune_versions(self, service, keep_last, max_age_days, limit):
+        self.calls.append((service, keep_last, max_age_days, limit))
+        return defer.succeed(self.batches.pop(0))
+
+
+class FakeConfigService:
+
+    def __init__(self, repository):
+        self.repository = repository
+        self.evicted = []
+
+    def evict(self, service, versions):
+        self.evicted.append((service, versions))
+
+
+def run_retention(policies, batches, batch_size=2):
+    repository = FakeRepository(policies, batches)
+    config_service = FakeConfigService(repository)
+    service = RetentionService(config_service, interval=0, batch_size=batch_size)
+    results = []
+    service.run_once().addCallback(results.append)
+    return service, repository, config_service, results[0]
+
+
+def test_unlimited_policies_are_skipped(monkeypatch):
+    monkeypatch.setattr(settings, 'CONFIG_PAYLOAD_STORE_ENABLED', False)
+
+    _, repository, _, pruned = run_retention([('keep-all', 0, 0), ('svc', 3, 0)], [[1]])
+
+    assert pruned == 1
+    assert repository.calls == [('svc', 3, 0, 2)]
+
+
+def test_full_batches_are_repeated_and_evicted(monkeypatch):
+    monkeypatch.setattr(settings, 'CONFIG_PAYLOAD_STORE_ENABLED', False)
+
+    service, repository, config_service, pruned = run_retention([('svc', 1, 0)], [[1, 2], [3, 4], [5]])
+
+    assert pruned == 5
+    assert len(repository.calls) == 3
+    assert config_service.evicted == [('svc', [1, 2]), ('svc', [3, 4]), ('svc', [5])]
+    assert service.stats()['rows_pruned'] == 5
+
+
+def test_failed_run_is_recorded_and_does_not_raise(monkeypatch):
+    monkeypatch.setattr(settings, 'CONFIG_PAYLOAD_STORE_ENABLED', False)
+
+    service, _, _, pruned = run_retention([('svc', 1, 0)], [])
+
+    assert pruned == 0
+    assert service.stats()['last_error'] is not None
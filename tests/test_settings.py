@@ -0,0 +1,26 @@
+import pytest
+
+from src.config.settings import Settings
+
+
+@pytest.fixture
+def valid_settings(monkeypatch):
+    monkeypatch.setattr(Settings, 'POSTGRES_PASSWORD', 'secret')
+    monkeypatch.setattr(Settings, 'DB_BACKEND', 'adbapi')
+    monkeypatch.setattr(Settings, 'CONFIG_DELTA_ENABLED', False)
+    monkeypatch.setattr(Settings, 'CONFIG_PAYLOAD_STORE_ENABLED', False)
+    return Settings
+
+
+def test_delta_storage_alone_is_accepted(valid_settings):
+    valid_settings.CONFIG_DELTA_ENABLED = True
+
+    assert valid_settings.validate()
+
+
+def test_delta_storage_with_payload_store_is_rejected(valid_settings):
+    valid_settings.CONFIG_DELTA_ENABLED = True
+    valid_settings.CONFIG_PAYLOAD_STORE_ENABLED = True
+
+    with pytest.raises(ValueError, match="CONFIG_DELTA_ENABLED"):
+        valid_settings.validate()
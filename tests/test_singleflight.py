@@ -0,0 +1,83 @@
+from twisted.internet import defer
+
+from src.utils.singleflight import SingleFlight
+
+
+def collect(d):
+    results = []
+    d.addBoth(results.append)
+    return results
+
+
+def test_concurrent_calls_with_same_key_share_one_call():
+    flight = SingleFlight()
+    pending = defer.Deferred()
+    calls = []
+
+    def load(key):
+        calls.append(key)
+        return pending
+
+    first = collect(flight.run('a', load, 'a'))
+    second = collect(flight.run('a', load, 'a'))
+    assert calls == ['a']
+    assert len(flight) == 1
+
+    pending.callback('value')
+
+    assert first == ['value'] and second == ['value']
+    assert len(flight) == 0
+    assert flight.stats()['leaders'] == 1
+    assert flight.stats()['coalesced'] == 1
+
+
+def test_different_keys_are_not_coalesced():
+    flight = SingleFlight()
+    calls = []
+
+    flight.run('a', lambda: calls.append('a') or defer.Deferred())
+    flight.run('b', lambda: calls.append('b') or defer.Deferred())
+
+    assert calls == ['a', 'b']
+
+
+def test_errors_reach_every_waiter():
+    flight = SingleFlight()
+    pending = defer.Deferred()
+
+    first = collect(flight.run('a', lambda: pending))
+    second = collect(flight.run('a', lambda: pending))
+    pending.errback(RuntimeError('boom'))
+
+    assert first[0].check(RuntimeError)
+    assert second[0].check(RuntimeError)
+    assert len(flight) == 0
+
+
+def test_synchronous_exceptions_are_propagated():
+    flight = SingleFlight()
+
+    def fail():
+        raise ValueError('bad')
+
+    result = collect(flight.run('a', fail))
+
+    assert result[0].check(ValueError)
+    assert len(flight) == 0
+
+
+def test_key_is_released_before_waiters_resume():
+    flight = SingleFlight()
+    pending = defer.Deferred()
+    restarted = []
+
+    def on_result(value):
+        restarted.append(flight.run('a', lambda: defer.succeed('fresh')))
+        return value
+
+    flight.run('a', lambda: pending)
+    flight.run('a', lambda: pending).addCallback(on_result)
+    pending.callback('stale')
+
+    assert collect(restarted[0]) == ['fresh']
+    assert flight.stats()['leaders'] == 2
@@ -0,0 +1,68 @@
+import pytest
+
+from src.services.template_service import TemplateService
+
+
+CONFIG = {
+    'database': {'host': '{{ db_host }}', 'port': 5432},
+    'replicas': ['static', 'node-{{ index }}'],
+    'name': 'plain'
+}
+
+
+def test_leaf_mode_renders_string_leaves():
+    service = TemplateService(render_mode='leaves')
+
+    rendered = service.render_config(CONFIG, {'db_host': 'db.local', 'index': 2})
+
+    assert rendered == {
+        'database': {'host': 'db.local', 'port': 5432},
+        'replicas': ['static', 'node-2'],
+        'name': 'plain'
+    }
+
+
+def test_leaf_mode_does_not_modify_input():
+    service = TemplateService(render_mode='leaves')
+
+    service.render_config(CONFIG, {'db_host': 'db.local', 'index': 2})
+
+    assert CONFIG['database']['host'] == '{{ db_host }}'
+    assert CONFIG['replicas'][1] == 'node-{{ index }}'
+
+
+def test_leaf_mode_keeps_untemplated_branches_shared():
+    service = TemplateService(render_mode='leaves')
+    config = {'static': {'a': 1}, 'dynamic': {'b': '{{ value }}'}}
+
+    rendered = service.render_config(config, {'value': 'x'})
+
+    assert rendered['static'] is config['static']
+    assert rendered['dynamic'] is not config['dynamic']
+
+
+def test_leaf_mode_without_templates_returns_config_unchanged():
+    service = TemplateService(render_mode='leaves')
+    config = {'a': {'b': 'plain'}}
+
+    assert service.render_config(config, {}) is config
+
+
+def test_leaf_plan_is_cached_by_key():
+    service = TemplateService(render_mode='leaves')
+
+    assert service.render_config(CONFIG, {'db_host': 'a', 'index': 1}, cache_key=('svc', 1))['database']['host'] == 'a'
+    assert service.render_config(CONFIG, {'db_host': 'b', 'index': 1}, cache_key=('svc', 1))['database']['host'] == 'b'
+    assert service.stats()['hits'] == 1
+
+
+def test_leaf_mode_reports_undefined_variables():
+    service = TemplateService(render_mode='leaves')
+
+    with pytest.raises(ValueError):
+        service.render_config(CONFIG, {'db_host': 'db.local'})
+
+
+def test_unknown_render_mode_is_rejected():
+    with pytest.raises(ValueError):
+        TemplateService(render_mode='fragments')
@@ -0,0 +1,109 @@
+import json
+
+import pytest
+
+from src.repositories.configuration_repository import allocate_steps, version_steps
+from src.repositories.transaction import Statement, run_steps
+from src.utils.json_diff import diff_json
+from tests.steps import drive
+
+
+def test_auto_versions_follow_the_returned_counters():
+    records = [{'service': 'b'}, {'service': 'a'}, {'service': 'b'}]
+
+    statements, _ = drive(allocate_steps(records), [[('a', 7), ('b', 12)]])
+
+    assert len(statements) == 1
+    assert statements[0].params == [('a', 1), ('b', 2)]
+    assert statements[0].fetch == 'all'
+    assert [record['version'] for record in records] == [11, 7, 12]
+
+
+def test_explicit_versions_only_advance_the_counter():
+    records = [{'service': 'b', 'version': 4}, {'service': 'a', 'version': 9}, {'service': 'b', 'version': 6}]
+
+    statements, _ = drive(allocate_steps(records), [])
+
+    assert len(statements) == 1
+    assert 'GREATEST' in statements[0].sql
+    assert statements[0].params == [('a', 9), ('b', 6)]
+    assert [record['version'] for record in records] == [4, 9, 6]
+
+
+def test_mixed_records_lock_explicit_counters_first():
+    records = [{'service': 'a', 'version': 5}, {'service': 'a'}]
+
+    statements, _ = drive(allocate_steps(records), [None, [('a', 6)]])
+
+    assert len(statements) == 2
+    assert records[1]['version'] == 6
+
+
+def chain_row(row_id, version, delta=None, payload=None):
+    return row_id, version, json.dumps(delta) if delta is not None else None, payload, None, 10
+
+
+def test_full_copy_is_returned_as_stored():
+    statements, row = drive(version_steps('svc', 3), [[chain_row(1, 3, payload='{"a": 1}')]])
+
+    assert statements[0].params == ('svc', 3, 'svc')
+    assert row == (1, 3, '{"a": 1}', None, 10)
+
+
+def test_delta_chain_is_applied_from_the_snapshot():
+    v3 = {'a': 3, 'list': [1, 2, 3]}
+    v2 = {'a': 2, 'list': [1, 2]}
+    v1 = {'a': 1}
+    rows = [
+        chain_row(11, 1, delta=diff_json(v2, v1)),
+        chain_row(12, 2, delta=diff_json(v3, v2)),
+        chain_row(13, 3, payload=json.dumps(v3))
+    ]
+
+    _, row = drive(version_steps('svc', 1), [rows])
+
+    assert row[:2] == (11, 1)
+    assert json.loads(row[2]) == v1
+
+
+def test_missing_version_returns_none():
+    assert drive(version_steps('svc', 3), [[]])[1] is None
+
+
+def test_broken_delta_chain_is_reported():
+    with pytest.raises(RuntimeError, match="broken delta chain"):
+        drive(version_steps('svc', 1), [[chain_row(11, 1, delta=[])]])
+
+
+def test_prepared_statement_is_executed_by_name():
+    statements, _ = drive(version_steps('svc', 3, prepared=True), [[]])
+
+    assert statements[0].sql == 'EXECUTE config_version_chain(%s, %s, %s)'
+
+
+class FakeCursor:
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.executed = []
+
+    def execute(self, sql, params=None):
+        self.executed.append((sql, params))
+
+    def fetchone(self):
+        return self.rows[0]
+
+    def fetchall(self):
+        return self.rows
+
+
+def test_run_steps_feeds_results_back_into_the_generator():
+    def steps(service):
+        row = yield Statement("SELECT 1 WHERE service = %s", (service,), fetch='one')
+        yield Statement("UPDATE t SET v = %s", (row[0],))
+        return row[0] + 1
+
+    cursor = FakeCursor([(41,)])
+
+    assert run_steps(cursor, steps('svc')) == 42
+    assert cursor.executed == [("SELECT 1 WHERE service = %s", ('svc',)), ("UPDATE t SET v = %s", (41,))]